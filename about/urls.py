@@ -1,10 +1,16 @@
 from django.urls import path
 
+from posts.middleware import cache_for_anonymous
+
 from . import views
 
 app_name = 'about'
 
 urlpatterns = [
-    path('author/', views.AboutAuthorView.as_view(), name='author'),
-    path('tech/', views.AboutTechView.as_view(), name='tech'),
+    path('author/',
+         cache_for_anonymous()(views.AboutAuthorView.as_view()),
+         name='author'),
+    path('tech/',
+         cache_for_anonymous()(views.AboutTechView.as_view()),
+         name='tech'),
 ]
@@ -0,0 +1,52 @@
+"""
+Представление записей и комментариев в JSON.
+
+Поля берутся только из самой строки и связей из select_related, поэтому
+сериализация страницы не выполняет запросов на каждую запись.
+"""
+
+
+def isoformat(value):
+    return value.isoformat()
+
+
+POST_FIELDS = {
+    'id': lambda post: post.id,
+    'text': lambda post: post.text,
+    'pub_date': lambda post: isoformat(post.pub_date),
+    'author': lambda post: post.author.username,
+    'group': lambda post: post.group.slug if post.group_id else None,
+    'image': lambda post: post.image.url if post.image else None,
+    'image_variants': lambda post: post.get_image_variants(),
+    'comments_count': lambda post: post.comments_count,
+}
+
+COMMENT_FIELDS = {
+    'id': lambda comment: comment.id,
+    'post': lambda comment: comment.post_id,
+    'text': lambda comment: comment.text,
+    'created': lambda comment: isoformat(comment.created),
+    'author': lambda comment: comment.author.username,
+}
+
+
+class UnknownField(ValueError):
+    pass
+
+
+def select_fields(requested, available):
+    """Поля из параметра `fields=a,b`; без параметра — все."""
+    if not requested:
+        return list(available)
+    fields = [name.strip() for name in requested.split(',') if name.strip()]
+    unknown = [name for name in fields if name not in available]
+    if unknown:
+        raise UnknownField(', '.join(unknown))
+    return fields
+
+
+def serialize(objects, fields, available):
+    return [
+        {name: available[name](obj) for name in fields}
+        for obj in objects
+    ]
@@ -0,0 +1,128 @@
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post, User
+
+USERNAME = 'author'
+SLUG = 'test_group'
+POSTS_URL = reverse('api:posts')
+GROUP_URL = reverse('api:group_posts', args=[SLUG])
+PROFILE_URL = reverse('api:profile', args=[USERNAME])
+FOLLOW_URL = reverse('api:follow_index')
+SEARCH_URL = reverse('api:search')
+LOCMEM_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'api-tests',
+    }
+}
+
+
+@override_settings(CACHES=LOCMEM_CACHES, PAGE_CACHE_TIMEOUT=0)
+class ApiTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(USERNAME)
+        cls.user = User.objects.create_user(username='user')
+        cls.group = Group.objects.create(
+            title='Тестовое сообщество',
+            slug=SLUG,
+            description='Тестовое описание',
+        )
+        for i in range(5):
+            Post.objects.create(
+                text=f'Запись {i}', author=cls.author, group=cls.group
+            )
+        cls.post = Post.objects.first()
+        for i in range(3):
+            Comment.objects.create(
+                text=f'Комментарий {i}', author=cls.user, post=cls.post
+            )
+        Follow.objects.create(user=cls.user, author=cls.author)
+        cls.COMMENTS_URL = reverse('api:comments', args=[cls.post.id])
+
+    def setUp(self):
+        self.guest_client = Client()
+        self.user_authorized_client = Client()
+        self.user_authorized_client.force_login(self.user)
+
+    def walk(self, client, url, **params):
+        """Все элементы по ссылкам next."""
+        items = []
+        data = client.get(url, params).json()
+        items += data['results']
+        while data['next']:
+            data = client.get(data['next']).json()
+            items += data['results']
+        return items
+
+    def test_feeds_list_all_posts_newest_first(self):
+        """Ленты API отдают все записи по ссылкам next"""
+        expected = list(Post.objects.values_list('id', flat=True))
+        for client, url in [
+            (self.guest_client, POSTS_URL),
+            (self.guest_client, GROUP_URL),
+            (self.guest_client, PROFILE_URL),
+            (self.user_authorized_client, FOLLOW_URL),
+        ]:
+            with self.subTest(url=url):
+                items = self.walk(client, url, limit=2)
+                self.assertEqual([item['id'] for item in items], expected)
+
+    def test_comments_oldest_first(self):
+        """Комментарии идут от старых к новым"""
+        items = self.walk(self.guest_client, self.COMMENTS_URL, limit=2)
+        self.assertEqual(
+            [item['text'] for item in items],
+            [f'Комментарий {i}' for i in range(3)],
+        )
+
+    def test_search(self):
+        """Поиск листается по ключу и находит все подходящие записи"""
+        items = self.walk(
+            self.guest_client, SEARCH_URL, q='запись', limit=2, fields='id'
+        )
+        self.assertCountEqual(
+            [item['id'] for item in items],
+            list(self.author.posts.values_list('id', flat=True)),
+        )
+        items = self.walk(self.guest_client, SEARCH_URL, q='Запись 3')
+        self.assertEqual([item['text'] for item in items], ['Запись 3'])
+
+    def test_fields_selection(self):
+        """Параметр fields ограничивает поля"""
+        data = self.guest_client.get(
+            POSTS_URL, {'fields': 'id,author'}
+        ).json()
+        self.assertEqual(
+            data['results'][0], {'id': self.post.id, 'author': USERNAME}
+        )
+        response = self.guest_client.get(POSTS_URL, {'fields': 'password'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_errors(self):
+        """Ошибки возвращаются в JSON с кодом ответа"""
+        cases = [
+            (self.guest_client, FOLLOW_URL, {}, 401),
+            (self.guest_client, POSTS_URL, {'cursor': 'invalid'}, 400),
+            (self.guest_client, POSTS_URL, {'limit': 'many'}, 400),
+            (self.guest_client, reverse('api:profile', args=['nobody']),
+             {}, 404),
+        ]
+        for client, url, params, status in cases:
+            with self.subTest(url=url, params=params):
+                response = client.get(url, params)
+                self.assertEqual(response.status_code, status)
+                self.assertIn('detail', response.json())
+
+    def test_queries_do_not_depend_on_page_size(self):
+        """Число запросов не зависит от размера страницы"""
+        counts = []
+        for limit in (1, 5):
+            with CaptureQueriesContext(connection) as queries:
+                self.guest_client.get(POSTS_URL, {'limit': limit})
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
@@ -0,0 +1,26 @@
+from django.urls import path
+
+from . import views
+
+app_name = 'api'
+
+urlpatterns = [
+    path('posts/',
+         views.post_list,
+         name='posts'),
+    path('posts/<int:post_id>/comments/',
+         views.comments,
+         name='comments'),
+    path('search/',
+         views.search,
+         name='search'),
+    path('group/<slug:slug>/',
+         views.group_posts,
+         name='group_posts'),
+    path('follow/',
+         views.follow_index,
+         name='follow_index'),
+    path('<str:username>/',
+         views.profile,
+         name='profile'),
+]
@@ -0,0 +1,118 @@
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.http import JsonResponse
+
+from posts import feed_cache
+from posts.conditional import (conditional, follow_scopes, group_scopes,
+                               index_scopes, profile_scopes)
+from posts.models import Comment, Group, Post, User
+from posts.paginators import CommentPaginator, CursorPaginator, InvalidCursor
+from posts.search import SearchPaginator
+from posts.timeline import TimelinePaginator, follow_feed
+
+from .serializers import (COMMENT_FIELDS, POST_FIELDS, UnknownField,
+                          select_fields, serialize)
+
+
+def error(detail, status=400):
+    return JsonResponse({'detail': detail}, status=status)
+
+
+def page_url(request, cursor):
+    if cursor is None:
+        return None
+    query = request.GET.copy()
+    query['cursor'] = cursor
+    return request.build_absolute_uri(f'{request.path}?{urlencode(query)}')
+
+
+def page_response(request, paginator_class, object_list, available,
+                  **kwargs):
+    """
+    Страница по ключу: `?cursor=` из ссылок next/previous, `?limit=`
+    (не больше API_MAX_LIMIT) и `?fields=` для выбора полей.
+    """
+    try:
+        fields = select_fields(request.GET.get('fields'), available)
+    except UnknownField as unknown:
+        return error(f'Неизвестные поля: {unknown}')
+    try:
+        limit = int(request.GET.get('limit', settings.POSTS_PER_PAGE))
+    except ValueError:
+        return error('limit должен быть числом')
+    limit = min(max(limit, 1), settings.API_MAX_LIMIT)
+    paginator = paginator_class(object_list, limit, **kwargs)
+    try:
+        page = paginator.page(request.GET.get('cursor'))
+    except InvalidCursor:
+        return error('Неверный cursor')
+    return JsonResponse({
+        'next': page_url(request, page.next_cursor),
+        'previous': page_url(request, page.previous_cursor),
+        'results': serialize(page, fields, available),
+    })
+
+
+def comment_scopes(request, post_id):
+    author_id = Post.objects.filter(pk=post_id).values_list(
+        'author_id', flat=True
+    ).first()
+    if author_id is None:
+        return None
+    return [feed_cache.author_scope(author_id)]
+
+
+@conditional(index_scopes)
+def post_list(request):
+    return page_response(
+        request, CursorPaginator, Post.objects.feed(), POST_FIELDS
+    )
+
+
+@conditional(index_scopes)
+def search(request):
+    return page_response(
+        request, SearchPaginator, request.GET.get('q', ''), POST_FIELDS
+    )
+
+
+@conditional(group_scopes)
+def group_posts(request, slug):
+    group = Group.objects.filter(slug=slug).first()
+    if group is None:
+        return error('Сообщество не найдено', status=404)
+    return page_response(
+        request, CursorPaginator, group.posts.feed(), POST_FIELDS
+    )
+
+
+@conditional(profile_scopes)
+def profile(request, username):
+    author = User.objects.filter(username=username).first()
+    if author is None:
+        return error('Пользователь не найден', status=404)
+    return page_response(
+        request, CursorPaginator, author.posts.feed(), POST_FIELDS
+    )
+
+
+@conditional(follow_scopes)
+def follow_index(request):
+    if not request.user.is_authenticated:
+        return error('Требуется вход', status=401)
+    return page_response(
+        request, TimelinePaginator, follow_feed(request.user), POST_FIELDS,
+        user=request.user,
+    )
+
+
+@conditional(comment_scopes)
+def comments(request, post_id):
+    if not Post.objects.filter(pk=post_id).exists():
+        return error('Запись не найдена', status=404)
+    return page_response(
+        request, CommentPaginator,
+        Comment.objects.filter(post=post_id).select_related('author'),
+        COMMENT_FIELDS,
+    )
@@ -0,0 +1 @@
+"""Замеры производительности yatube. Запуск: python -m benchmarks.<модуль>."""
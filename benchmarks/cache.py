@@ -0,0 +1,114 @@
+"""
+Доля попаданий и задержка кэша при нескольких процессах сервера.
+
+Каждый процесс, как воркер gunicorn, читает «горячие» ключи с
+распределением Ципфа и при промахе записывает значение. Локальный кэш
+у каждого процесса свой, поэтому с ростом числа процессов доля попаданий
+падает; общий кэш (db, file, redis, memcached) этим не страдает.
+
+    python -m benchmarks.cache --workers 4 --backends locmem file db
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import statistics
+import tempfile
+import time
+
+VALUE = 'x' * 2048
+
+
+def setup_django(backend, location, database):
+    os.environ['YATUBE_CACHE'] = backend
+    if location:
+        os.environ['YATUBE_CACHE_LOCATION'] = location
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+    import django
+    from django.conf import settings
+    django.setup()
+    settings.DATABASES['default']['NAME'] = database
+
+
+def create_cache_table(backend, location, database):
+    setup_django(backend, location, database)
+    from django.core.management import call_command
+    call_command('createcachetable')
+
+
+def worker(backend, location, database, requests, keys, seed, results):
+    setup_django(backend, location, database)
+    from django.core.cache import cache
+    rng = random.Random(seed)
+    weights = [1 / rank for rank in range(1, keys + 1)]
+    hits = 0
+    latencies = []
+    for key in rng.choices(range(keys), weights, k=requests):
+        started = time.perf_counter()
+        value = cache.get(f'bench:{key}')
+        if value is None:
+            cache.set(f'bench:{key}', VALUE, 300)
+        else:
+            hits += 1
+        latencies.append(time.perf_counter() - started)
+    results.put((hits, latencies))
+
+
+def run(backend, workers, requests, keys):
+    context = multiprocessing.get_context('spawn')
+    with tempfile.TemporaryDirectory() as directory:
+        database = os.path.join(directory, 'bench.sqlite3')
+        location = None
+        if backend == 'file':
+            location = os.path.join(directory, 'cache')
+        if backend == 'db':
+            process = context.Process(
+                target=create_cache_table, args=(backend, location, database)
+            )
+            process.start()
+            process.join()
+        results = context.Queue()
+        processes = [
+            context.Process(target=worker, args=(
+                backend, location, database, requests, keys, seed, results
+            ))
+            for seed in range(workers)
+        ]
+        for process in processes:
+            process.start()
+        hits, latencies = 0, []
+        for _ in processes:
+            worker_hits, worker_latencies = results.get()
+            hits += worker_hits
+            latencies += worker_latencies
+        for process in processes:
+            process.join()
+    latencies.sort()
+    return {
+        'backend': backend,
+        'workers': workers,
+        'requests': len(latencies),
+        'hit_rate': round(hits / len(latencies), 4),
+        'p50_ms': round(statistics.median(latencies) * 1000, 3),
+        'p95_ms': round(latencies[int(len(latencies) * 0.95)] * 1000, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--keys', type=int, default=500)
+    parser.add_argument(
+        '--backends', nargs='+', default=['locmem', 'file', 'db']
+    )
+    options = parser.parse_args()
+    for backend in options.backends:
+        print(json.dumps(run(
+            backend, options.workers, options.requests, options.keys
+        )))
+
+
+if __name__ == '__main__':
+    main()
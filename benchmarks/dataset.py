@@ -0,0 +1,61 @@
+"""
+Набор данных для бенчмарков: posts.seeding (пользователи, сообщества,
+записи, подписки и комментарии с распределениями по Ципфу и Парето),
+часть записей с изображениями и их миниатюры.
+"""
+import io
+import random
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+IMAGE_FILES = 20
+
+
+def make_images(count):
+    """Имена небольших JPEG в хранилище файлов."""
+    from PIL import Image
+    names = []
+    for number in range(count):
+        buffer = io.BytesIO()
+        Image.new(
+            'RGB', (1200, 800), (number * 37 % 256, 120, 200)
+        ).save(buffer, 'JPEG', quality=80)
+        names.append(default_storage.save(
+            f'{settings.UPLOAD_FOLDER}bench{number}.jpg',
+            ContentFile(buffer.getvalue()),
+        ))
+    return names
+
+
+def add_images(fraction, rng):
+    """Изображения у доли записей; возвращает имена файлов."""
+    from posts.imports import batches
+    from posts.models import Post
+    names = make_images(IMAGE_FILES)
+    post_ids = list(Post.objects.values_list('id', flat=True))
+    chosen = rng.sample(post_ids, int(len(post_ids) * fraction))
+    for number, name in enumerate(names):
+        for batch in batches(chosen[number::len(names)], 500):
+            Post.objects.filter(id__in=batch).update(image=name)
+    return names
+
+
+def seed(users=200, groups=10, posts=5000, follows=20, comments=3,
+         images=0.2, random_seed=0):
+    """Заполняет пустую базу; возвращает описание набора."""
+    from posts import seeding, thumbnails
+    seeding.seed(
+        users=users, groups=groups, posts=posts,
+        follows_per_user=follows, comments_per_post=comments,
+        random_seed=random_seed,
+    )
+    if images:
+        for name in add_images(images, random.Random(random_seed)):
+            thumbnails.generate(name)
+    return {
+        'users': users, 'groups': groups, 'posts': posts,
+        'follows_per_user': follows, 'comments_per_post': comments,
+        'images': images,
+    }
@@ -0,0 +1,121 @@
+"""
+Запросы в секунду к публичным страницам с кэшем страниц и без него.
+
+Сервер — многопоточный WSGI-сервер в отдельном процессе на временной
+базе с тестовыми записями; нагрузку дают анонимные клиенты в потоках.
+
+    python -m benchmarks.pages --clients 8 --requests 2000
+"""
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import statistics
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from socketserver import ThreadingMixIn
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+URLS = ['/', '/group/bench/', '/bench0/', '/about/author/']
+
+
+class ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+def serve(database, page_cache_timeout, posts, ready):
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+    os.environ['YATUBE_CACHE'] = 'locmem'
+    from django.conf import settings
+    settings.DEBUG = False
+    settings.ALLOWED_HOSTS = ['*']
+    settings.PAGE_CACHE_TIMEOUT = page_cache_timeout
+    settings.DATABASES['default']['NAME'] = database
+    import django
+    django.setup()
+    from django.core.management import call_command
+    from django.core.wsgi import get_wsgi_application
+    call_command('migrate', verbosity=0)
+    from posts.models import Group, Post, User
+    group = Group.objects.create(title='bench', slug='bench')
+    authors = [User.objects.create_user(f'bench{i}') for i in range(10)]
+    Post.objects.bulk_create(
+        Post(text=f'Запись {i}', author=authors[i % 10], group=group)
+        for i in range(posts)
+    )
+    server = make_server(
+        '127.0.0.1', 0, get_wsgi_application(),
+        server_class=ThreadingWSGIServer, handler_class=QuietHandler,
+    )
+    ready.put(server.server_port)
+    server.serve_forever()
+
+
+def load(port, clients, requests):
+    local = threading.local()
+
+    def get(number):
+        if not hasattr(local, 'connection'):
+            local.connection = http.client.HTTPConnection('127.0.0.1', port)
+        started = time.perf_counter()
+        local.connection.request('GET', URLS[number % len(URLS)])
+        response = local.connection.getresponse()
+        response.read()
+        assert response.status == 200, response.status
+        return time.perf_counter() - started
+
+    with ThreadPoolExecutor(clients) as executor:
+        list(executor.map(get, range(clients)))
+        started = time.perf_counter()
+        latencies = list(executor.map(get, range(requests)))
+        elapsed = time.perf_counter() - started
+    return elapsed, sorted(latencies)
+
+
+def run(page_cache_timeout, clients, requests, posts):
+    context = multiprocessing.get_context('spawn')
+    with tempfile.TemporaryDirectory() as directory:
+        ready = context.Queue()
+        server = context.Process(target=serve, args=(
+            os.path.join(directory, 'bench.sqlite3'),
+            page_cache_timeout, posts, ready,
+        ))
+        server.start()
+        try:
+            elapsed, latencies = load(ready.get(), clients, requests)
+        finally:
+            server.terminate()
+            server.join()
+    return {
+        'page_cache': bool(page_cache_timeout),
+        'clients': clients,
+        'requests': requests,
+        'rps': round(requests / elapsed, 1),
+        'p50_ms': round(statistics.median(latencies) * 1000, 3),
+        'p95_ms': round(latencies[int(len(latencies) * 0.95)] * 1000, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--posts', type=int, default=1000)
+    options = parser.parse_args()
+    for page_cache_timeout in (0, 300):
+        print(json.dumps(run(
+            page_cache_timeout,
+            options.clients, options.requests, options.posts,
+        )))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,248 @@
+"""
+Задержка, запросы к базе и пропускная способность основных страниц.
+
+Каждый сценарий (index, group_posts, profile, post_view, follow_index,
+new_post, add_comment) выполняется вошедшим пользователем через
+тестовый клиент Django и через настоящий WSGI-сервер в потоке того же
+процесса. Число запросов к базе берётся из posts.metrics. Результаты
+сохраняются в JSON, и прошлый файл можно указать для сравнения.
+
+    python manage.py bench --posts 5000 --requests 200 --output base.json
+    python manage.py bench --compare base.json
+"""
+import http.client
+import itertools
+import json
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+from wsgiref.simple_server import make_server
+
+from .pages import QuietHandler, ThreadingWSGIServer
+
+# Сценарий → маршрут в posts.metrics; new_post и add_comment — POST
+SCENARIOS = {
+    'index': 'index',
+    'group_posts': 'group_posts',
+    'profile': 'profile',
+    'post_view': 'post',
+    'follow_index': 'follow_index',
+    'new_post': 'new_post',
+    'add_comment': 'add_comment',
+}
+DRIVERS = ['client', 'wsgi']
+
+
+class Targets:
+    """Адреса и данные запросов сценариев по кругу из набора данных."""
+
+    def __init__(self, sample=50):
+        from django.db.models import Count
+        from posts.models import Group, Post, User
+        self.groups = list(Group.objects.values_list('slug', flat=True))
+        self.authors = list(User.objects.annotate(
+            count=Count('posts')
+        ).order_by('-count').values_list('username', flat=True)[:sample])
+        self.posts = list(Post.objects.values_list(
+            'author__username', 'id'
+        )[:sample])
+        self.reader = User.objects.annotate(
+            count=Count('follower')
+        ).order_by('-count').first()
+        self.counter = itertools.count()
+
+    def request(self, scenario):
+        """(адрес, данные формы или None)."""
+        from django.urls import reverse
+        number = next(self.counter)
+        username, post_id = self.posts[number % len(self.posts)]
+        if scenario == 'index':
+            return reverse('index'), None
+        if scenario == 'group_posts':
+            slug = self.groups[number % len(self.groups)]
+            return reverse('group_posts', args=[slug]), None
+        if scenario == 'profile':
+            author = self.authors[number % len(self.authors)]
+            return reverse('profile', args=[author]), None
+        if scenario == 'post_view':
+            return reverse('post', args=[username, post_id]), None
+        if scenario == 'follow_index':
+            return reverse('follow_index'), None
+        if scenario == 'new_post':
+            return reverse('new_post'), {'text': f'Новая запись {number}'}
+        return (
+            reverse('add_comment', args=[username, post_id]),
+            {'text': f'Комментарий {number}'},
+        )
+
+
+class QueryLog:
+    """Число запросов к базе по маршрутам из posts.metrics."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.queries = {}
+
+    def __call__(self, view, metrics):
+        with self.lock:
+            self.queries.setdefault(view, []).append(metrics.queries)
+
+    def take(self, view):
+        with self.lock:
+            return self.queries.pop(view, [])
+
+
+class ClientDriver:
+    """Тестовый клиент Django: свой клиент с сессией у каждого потока."""
+
+    def __init__(self, user):
+        self.user = user
+        self.local = threading.local()
+
+    def send(self, path, data):
+        from django.test import Client
+        if not hasattr(self.local, 'client'):
+            self.local.client = Client()
+            self.local.client.force_login(self.user)
+        if data is None:
+            response = self.local.client.get(path)
+        else:
+            response = self.local.client.post(path, data)
+        return response.status_code
+
+    def close(self):
+        pass
+
+
+class WSGIDriver:
+    """Настоящий HTTP: многопоточный WSGI-сервер в потоке процесса."""
+
+    def __init__(self, user):
+        from django.core.wsgi import get_wsgi_application
+        from django.middleware.csrf import _get_new_csrf_token
+        from django.test import Client
+        client = Client()
+        client.force_login(user)
+        token = _get_new_csrf_token()
+        self.headers = {
+            'Cookie': f'sessionid={client.cookies["sessionid"].value}; '
+                      f'csrftoken={token}',
+            'X-CSRFToken': token,
+        }
+        self.server = make_server(
+            '127.0.0.1', 0, get_wsgi_application(),
+            server_class=ThreadingWSGIServer, handler_class=QuietHandler,
+        )
+        threading.Thread(
+            target=self.server.serve_forever, daemon=True
+        ).start()
+        self.local = threading.local()
+
+    def send(self, path, data):
+        if not hasattr(self.local, 'connection'):
+            self.local.connection = http.client.HTTPConnection(
+                '127.0.0.1', self.server.server_port
+            )
+        headers = dict(self.headers)
+        body = None
+        if data is not None:
+            body = urlencode(data)
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        self.local.connection.request(
+            'GET' if data is None else 'POST', path, body, headers
+        )
+        response = self.local.connection.getresponse()
+        response.read()
+        return response.status
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def percentile(latencies, fraction):
+    return latencies[min(int(len(latencies) * fraction), len(latencies) - 1)]
+
+
+def measure(driver, targets, log, scenario, view, requests, concurrency):
+    def send(_):
+        path, data = targets.request(scenario)
+        started = time.perf_counter()
+        status = driver.send(path, data)
+        elapsed = time.perf_counter() - started
+        if status >= 400:
+            raise RuntimeError(f'{scenario} {path}: {status}')
+        return elapsed
+
+    with ThreadPoolExecutor(concurrency) as executor:
+        # Прогрев: кэш, соединения, сессии потоков
+        list(executor.map(send, range(concurrency * 2)))
+        log.take(view)
+        started = time.perf_counter()
+        latencies = sorted(executor.map(send, range(requests)))
+        elapsed = time.perf_counter() - started
+    queries = log.take(view)
+    return {
+        'scenario': scenario,
+        'requests': requests,
+        'concurrency': concurrency,
+        'p50_ms': round(statistics.median(latencies) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+        'queries': round(statistics.mean(queries), 2) if queries else None,
+        'rps': round(requests / elapsed, 1),
+    }
+
+
+def run(scenarios, drivers, requests, concurrency):
+    from posts import metrics
+    targets = Targets()
+    log = QueryLog()
+    metrics.listeners.append(log)
+    driver_classes = {'client': ClientDriver, 'wsgi': WSGIDriver}
+    try:
+        for name in drivers:
+            driver = driver_classes[name](targets.reader)
+            try:
+                for scenario in scenarios:
+                    yield {'driver': name, **measure(
+                        driver, targets, log, scenario, SCENARIOS[scenario],
+                        requests, concurrency,
+                    )}
+            finally:
+                driver.close()
+    finally:
+        metrics.listeners.remove(log)
+
+
+def compare(results, baseline):
+    """Строки сравнения p95 и запросов с прошлым прогоном."""
+    previous = {
+        (result['driver'], result['scenario']): result
+        for result in baseline['results']
+    }
+    lines = []
+    for result in results:
+        old = previous.get((result['driver'], result['scenario']))
+        if old is None:
+            continue
+        ratio = result['p95_ms'] / old['p95_ms'] if old['p95_ms'] else 0
+        lines.append(
+            f'{result["driver"]:>6} {result["scenario"]:<13} '
+            f'p95 {old["p95_ms"]:.1f} → {result["p95_ms"]:.1f} мс '
+            f'(x{ratio:.2f}), запросов {old["queries"]} → '
+            f'{result["queries"]}'
+        )
+    return lines
+
+
+def save(path, dataset, results):
+    with open(path, 'w') as file:
+        json.dump({'dataset': dataset, 'results': results}, file, indent=2)
+
+
+def load(path):
+    with open(path) as file:
+        return json.load(file)
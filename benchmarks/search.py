@@ -0,0 +1,128 @@
+"""
+Задержка поиска записей: индекс FTS5 против LIKE.
+
+Во временной базе создаются записи из случайных слов с частотами по
+закону Ципфа; затем одни и те же запросы каждого вида (частое слово,
+редкое слово, два слова, префикс) выполняются каждым движком. LIKE
+просматривает таблицу, пока не наберёт страницу, поэтому редкие слова
+для него самые дорогие; FTS5 считает bm25 по всем совпадениям, поэтому
+дороже частые слова и короткие префиксы.
+
+    python -m benchmarks.search --posts 1000000 --queries 20
+"""
+import argparse
+import itertools
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+
+SYLLABLES = ['ka', 'lo', 'mi', 'ne', 'ru', 'sa', 'to', 'vi', 'zo', 'pe']
+WORDS = [
+    a + b + c + d
+    for a in SYLLABLES for b in SYLLABLES
+    for c in SYLLABLES for d in SYLLABLES
+]
+CUM_WEIGHTS = list(itertools.accumulate(
+    1 / rank for rank in range(1, len(WORDS) + 1)
+))
+BACKENDS = ['posts.search.SQLiteFTSBackend', 'posts.search.LikeBackend']
+
+
+def setup_django(database):
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+    os.environ['YATUBE_CACHE'] = 'locmem'
+    import django
+    from django.conf import settings
+    settings.DATABASES['default']['NAME'] = database
+    django.setup()
+
+
+def populate(posts, seed):
+    from django.core.management import call_command
+    from posts.imports import batches
+    from posts.models import Group, Post, User
+    call_command('migrate', verbosity=0)
+    rng = random.Random(seed)
+    groups = [
+        Group.objects.create(title=f'group {word}', slug=word)
+        for word in WORDS[-10:]
+    ]
+    authors = [User.objects.create_user(f'author{i}') for i in range(100)]
+    rows = (
+        Post(
+            text=' '.join(rng.choices(
+                WORDS, cum_weights=CUM_WEIGHTS, k=rng.randint(5, 40)
+            )),
+            author=rng.choice(authors),
+            group=rng.choice(groups),
+        )
+        for _ in range(posts)
+    )
+    for batch in batches(rows, 10000):
+        Post.objects.bulk_create(batch)
+
+
+def queries(count, seed):
+    """{вид запроса: [запросы]}."""
+    rng = random.Random(seed)
+
+    def frequent(k=1):
+        return rng.choices(WORDS, cum_weights=CUM_WEIGHTS, k=k)
+
+    kinds = {
+        'frequent': lambda: frequent()[0],
+        'rare': lambda: rng.choice(WORDS),
+        'two_words': lambda: ' '.join(frequent(2)),
+        'prefix': lambda: frequent()[0][:6],
+    }
+    return {
+        kind: [make() for _ in range(count)] for kind, make in kinds.items()
+    }
+
+
+def measure(backend, kind, terms):
+    from django.test import override_settings
+    from posts.search import search
+    latencies = []
+    with override_settings(SEARCH_BACKEND=backend):
+        for query in terms:
+            started = time.perf_counter()
+            page = search(query)
+            # Вторая страница проверяет переход по ключу
+            if page.next_cursor:
+                search(query, page.next_cursor)
+            latencies.append(time.perf_counter() - started)
+    latencies.sort()
+    return {
+        'backend': backend.rsplit('.', 1)[-1],
+        'kind': kind,
+        'queries': len(latencies),
+        'p50_ms': round(statistics.median(latencies) * 1000, 3),
+        'p95_ms': round(latencies[int(len(latencies) * 0.95)] * 1000, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--posts', type=int, default=1000000)
+    parser.add_argument('--queries', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=0)
+    options = parser.parse_args()
+    with tempfile.TemporaryDirectory() as directory:
+        setup_django(os.path.join(directory, 'bench.sqlite3'))
+        started = time.perf_counter()
+        populate(options.posts, options.seed)
+        print(json.dumps({
+            'posts': options.posts,
+            'populate_s': round(time.perf_counter() - started, 1),
+        }))
+        for kind, terms in queries(options.queries, options.seed).items():
+            for backend in BACKENDS:
+                print(json.dumps(measure(backend, kind, terms)))
+
+
+if __name__ == '__main__':
+    main()
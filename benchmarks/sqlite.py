@@ -0,0 +1,150 @@
+"""
+Чтение и запись SQLite под нагрузкой многих процессов: настройки SQLite
+по умолчанию против SQLITE_PRAGMAS (WAL, busy_timeout, ...).
+
+Каждый процесс, как воркер gunicorn, в течение --seconds читает первую
+страницу ленты автора и с долей --writes создаёт запись через ORM (с
+сигналами, в транзакции, как new_post). Набор данных — posts.seeding;
+у каждого профиля своя копия файла базы, потому что режим журнала
+сохраняется в файле.
+
+    python -m benchmarks.sqlite --workers 1 4 16 --seconds 10
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import statistics
+import tempfile
+import time
+
+PROFILES = ['default', 'tuned']
+
+
+def setup_django(database, profile):
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+    os.environ['YATUBE_CACHE'] = 'locmem'
+    from django.conf import settings
+    settings.DATABASES['default']['NAME'] = database
+    if profile == 'default':
+        settings.SQLITE_PRAGMAS = {}
+    import django
+    django.setup()
+
+
+def populate(database, posts):
+    setup_django(database, 'default')
+    from django.core.management import call_command
+    from posts import seeding
+    call_command('migrate', verbosity=0)
+    seeding.seed(users=posts // 20, posts=posts, comments_per_post=0)
+
+
+def worker(database, profile, seconds, writes, seed, start, results):
+    setup_django(database, profile)
+    from django.conf import settings
+    from django.db import OperationalError, transaction
+    from posts.models import Post, User
+    rng = random.Random(seed)
+    authors = list(User.objects.values_list('id', flat=True))
+    latencies = {'read': [], 'write': []}
+    locked = 0
+    start.wait()
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        kind = 'write' if rng.random() < writes else 'read'
+        author_id = rng.choice(authors)
+        started = time.perf_counter()
+        try:
+            if kind == 'write':
+                with transaction.atomic():
+                    Post.objects.create(
+                        text='Новая запись', author_id=author_id
+                    )
+            else:
+                list(Post.objects.feed().filter(
+                    author_id=author_id
+                )[:settings.POSTS_PER_PAGE])
+        except OperationalError:
+            locked += 1
+            continue
+        latencies[kind].append(time.perf_counter() - started)
+    results.put((latencies, locked))
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    values = sorted(values)
+    return round(values[int(len(values) * fraction)] * 1000, 3)
+
+
+def run(source, profile, workers, seconds, writes):
+    context = multiprocessing.get_context('spawn')
+    with tempfile.TemporaryDirectory() as directory:
+        database = os.path.join(directory, 'bench.sqlite3')
+        shutil.copy(source, database)
+        start = context.Barrier(workers)
+        results = context.Queue()
+        processes = [
+            context.Process(target=worker, args=(
+                database, profile, seconds, writes, seed, start, results
+            ))
+            for seed in range(workers)
+        ]
+        for process in processes:
+            process.start()
+        latencies = {'read': [], 'write': []}
+        locked = 0
+        for _ in processes:
+            worker_latencies, worker_locked = results.get()
+            for kind, values in worker_latencies.items():
+                latencies[kind] += values
+            locked += worker_locked
+        for process in processes:
+            process.join()
+    return {
+        'profile': profile,
+        'workers': workers,
+        'reads_per_s': round(len(latencies['read']) / seconds, 1),
+        'writes_per_s': round(len(latencies['write']) / seconds, 1),
+        'read_p50_ms': round(
+            statistics.median(latencies['read']) * 1000, 3
+        ) if latencies['read'] else None,
+        'read_p99_ms': percentile(latencies['read'], 0.99),
+        'write_p99_ms': percentile(latencies['write'], 0.99),
+        'locked': locked,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4, 16])
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument(
+        '--writes', type=float, default=0.1,
+        help='Доля операций записи.',
+    )
+    parser.add_argument('--posts', type=int, default=20000)
+    parser.add_argument('--profiles', nargs='+', default=PROFILES)
+    options = parser.parse_args()
+    context = multiprocessing.get_context('spawn')
+    with tempfile.TemporaryDirectory() as directory:
+        source = os.path.join(directory, 'source.sqlite3')
+        # Набор создаётся без прагм: файл остаётся в журнале отката
+        process = context.Process(
+            target=populate, args=(source, options.posts)
+        )
+        process.start()
+        process.join()
+        for workers in options.workers:
+            for profile in options.profiles:
+                print(json.dumps(run(
+                    source, profile, workers, options.seconds, options.writes
+                )), flush=True)
+
+
+if __name__ == '__main__':
+    main()
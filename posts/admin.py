@@ -1,14 +1,128 @@
+from datetime import datetime, timedelta
+
 from django.contrib import admin
+from django.db.models import Max, Min, Q, QuerySet
+from django.utils import timezone
+
+from .models import Comment, Follow, Group, Post, User
+from .paginators import EstimatedCountPaginator
+from .search import filter_posts
+
+
+def period_start(value, kind):
+    if isinstance(value, datetime):
+        if timezone.is_aware(value):
+            value = timezone.localtime(value)
+        value = value.replace(hour=0, minute=0, second=0, microsecond=0)
+    if kind in ("year", "month"):
+        value = value.replace(day=1)
+    if kind == "year":
+        value = value.replace(month=1)
+    return value
+
+
+def next_period(start, kind):
+    tzinfo = getattr(start, "tzinfo", None)
+    if tzinfo is not None:
+        start = start.replace(tzinfo=None)
+    if kind == "day":
+        start += timedelta(days=1)
+    elif kind == "month" and start.month < 12:
+        start = start.replace(month=start.month + 1)
+    else:
+        start = start.replace(year=start.year + 1, month=1)
+    if tzinfo is not None:
+        start = timezone.make_aware(start, tzinfo)
+    return start
+
 
-from .models import Comment, Follow, Group, Post
+class IndexedDatesQuerySet(QuerySet):
+    """
+    Запросы навигации по датам (date_hierarchy), которые база отвечает
+    по индексу даты, а не просмотром всей таблицы.
+    """
 
+    def aggregate(self, *args, **kwargs):
+        # SQLite берёт MIN и MAX из индекса, только если агрегат в
+        # запросе один; date_hierarchy просит оба сразу
+        if not args and len(kwargs) > 1 and all(
+            isinstance(value, (Min, Max)) for value in kwargs.values()
+        ):
+            result = {}
+            for name, value in kwargs.items():
+                result.update(super().aggregate(**{name: value}))
+            return result
+        return super().aggregate(*args, **kwargs)
 
-class PostAdmin(admin.ModelAdmin):
+    def dates(self, field_name, kind, order="ASC"):
+        """
+        Начала периодов с записями: вместо DISTINCT по всей таблице —
+        по одному MIN(поле) >= начала следующего периода (skip scan).
+        Границы периодов — в текущем часовом поясе, как у фильтров
+        __year и __month.
+        """
+        queryset = self.order_by()
+        dates = []
+        value = queryset.aggregate(first=Min(field_name))["first"]
+        while value is not None:
+            start = period_start(value, kind)
+            if isinstance(start, datetime):
+                dates.append(start.date())
+            else:
+                dates.append(start)
+            # Новая граница идёт в WHERE первой: из нескольких нижних
+            # границ одного столбца SQLite ищет по индексу от первой
+            value = (QuerySet(self.model, using=self.db).filter(**{
+                f"{field_name}__gte": next_period(start, kind)
+            }) & queryset).aggregate(first=Min(field_name))["first"]
+        if order == "DESC":
+            dates.reverse()
+        return dates
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """
+    Список большой таблицы: связанные объекты одним JOIN, выбор по id
+    вместо выпадающего списка всех строк, без COUNT(*) всей таблицы и
+    с навигацией по датам через индекс.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    # Поиск по точному имени пользователя (уникальный индекс) в этих
+    # полях вместо LIKE по связанной таблице
+    user_search_fields = ()
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        return IndexedDatesQuerySet(
+            queryset.model, queryset.query, queryset.db
+        )
+
+    def get_search_results(self, request, queryset, search_term):
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+        users = User.objects.filter(username=search_term)
+        condition = Q(pk__in=[])
+        for field in self.user_search_fields:
+            condition |= Q(**{f"{field}__in": users})
+        return queryset.filter(condition), False
+
+
+class PostAdmin(LargeTableAdmin):
     list_display = ("id", "text", "pub_date", "author", "group")
+    list_select_related = ("author", "group")
+    raw_id_fields = ("author",)
+    autocomplete_fields = ("group",)
     search_fields = ("text",)
     list_filter = ("pub_date",)
+    date_hierarchy = "pub_date"
     empty_value_display = "-пусто-"
 
+    def get_search_results(self, request, queryset, search_term):
+        # Поиск по индексу posts/search.py вместо LIKE по всей таблице
+        return filter_posts(queryset, search_term), False
+
 
 class GroupAdmin(admin.ModelAdmin):
     list_display = ("id", "slug", "title", "description")
@@ -16,14 +130,23 @@ class GroupAdmin(admin.ModelAdmin):
     prepopulated_fields = {"slug": ("title",)}
 
 
-class CommentAdmin(admin.ModelAdmin):
+class CommentAdmin(LargeTableAdmin):
     list_display = ("id", "text", "created", "author", "post")
-    search_fields = ("text", "author",)
+    list_select_related = ("author", "post__author", "post__group")
+    raw_id_fields = ("author", "post")
+    search_fields = ("author__username",)
+    user_search_fields = ("author",)
+    ordering = ("-created", "-id")
+    date_hierarchy = "created"
 
 
-class FollowAdmin(admin.ModelAdmin):
-    list_display = ("id", "user", "author")
-    search_fields = ("user", "author",)
+class FollowAdmin(LargeTableAdmin):
+    list_display = ("id", "user", "author", "pull")
+    list_select_related = ("user", "author")
+    raw_id_fields = ("user", "author")
+    search_fields = ("user__username", "author__username")
+    user_search_fields = ("user", "author")
+    list_filter = ("pull",)
 
 
 admin.site.register(Group, GroupAdmin)
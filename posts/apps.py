@@ -5,3 +5,12 @@ class PostsConfig(AppConfig):
     name = 'posts'
     verbose_name = 'Сообщества'
     verbose_name_plural = 'Сообщества'
+
+    def ready(self):
+        from django.core.signals import request_started
+        from django.db.backends.signals import connection_created
+
+        from . import signals  # noqa
+        from .db import configure_sqlite, reset_health_checks
+        connection_created.connect(configure_sqlite)
+        request_started.connect(reset_health_checks)
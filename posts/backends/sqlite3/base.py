@@ -0,0 +1,7 @@
+from django.db.backends.sqlite3 import base
+
+from posts.db import PersistentConnectionMixin
+
+
+class DatabaseWrapper(PersistentConnectionMixin, base.DatabaseWrapper):
+    pass
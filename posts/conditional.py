@@ -0,0 +1,96 @@
+"""
+Условные GET-запросы для лент и страницы записи.
+
+ETag строится из пользователя и версий областей кэша, которые выводит
+страница, Last-Modified — из самой свежей версии (posts/feed_cache.py).
+Проверка стоит одного обращения к кэшу, и ответ 304 возвращается до
+запросов к записям и отрисовки шаблона.
+"""
+import hashlib
+from datetime import datetime, timezone
+
+from django.views.decorators.http import condition
+from django.views.decorators.vary import vary_on_cookie
+
+from . import feed_cache
+from .middleware import cache_for_anonymous
+from .models import Group, User
+
+
+def validators(request, scopes_func, *args, **kwargs):
+    """(ETag, Last-Modified) страницы; вычисляются один раз на запрос."""
+    if not hasattr(request, '_validators'):
+        scopes = scopes_func(request, *args, **kwargs)
+        request._validators = (None, None)
+        if scopes is not None:
+            versions = feed_cache.get_versions(*scopes)
+            user = (
+                request.user.id if request.user.is_authenticated
+                else 'anonymous'
+            )
+            value = f'{user}:' + '.'.join(str(v) for v in versions)
+            request._validators = (
+                hashlib.md5(value.encode()).hexdigest(),
+                datetime.fromtimestamp(max(versions) / 1000, timezone.utc),
+            )
+    return request._validators
+
+
+def conditional(scopes_func, cache_pages=True):
+    """
+    Декоратор представления. scopes_func(request, *args, **kwargs)
+    возвращает области, от которых зависит страница, или None, если
+    страницы нет, — тогда представление выполняется как обычно.
+    По тем же областям страница кэшируется для анонимных посетителей
+    (posts/middleware.py), если не указано cache_pages=False.
+    """
+    def decorator(view):
+        def etag(request, *args, **kwargs):
+            return validators(request, scopes_func, *args, **kwargs)[0]
+
+        def last_modified(request, *args, **kwargs):
+            return validators(request, scopes_func, *args, **kwargs)[1]
+
+        view = vary_on_cookie(condition(etag, last_modified)(view))
+        if not cache_pages:
+            return view
+        return cache_for_anonymous(scopes_func)(view)
+    return decorator
+
+
+def user_scopes(request):
+    # Кэш страниц вычисляет области до AuthenticationMiddleware.
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return [feed_cache.follow_scope(request.user.id)]
+    return []
+
+
+def index_scopes(request):
+    return [feed_cache.INDEX]
+
+
+def follow_scopes(request):
+    return [feed_cache.INDEX, *user_scopes(request)]
+
+
+def group_scopes(request, slug):
+    group_id = Group.objects.filter(slug=slug).values_list(
+        'id', flat=True
+    ).first()
+    if group_id is None:
+        return None
+    return [feed_cache.group_scope(group_id)]
+
+
+def profile_scopes(request, username, post_id=None):
+    author_id = User.objects.filter(username=username).values_list(
+        'id', flat=True
+    ).first()
+    if author_id is None:
+        return None
+    return [
+        feed_cache.author_scope(author_id),
+        feed_cache.follow_scope(author_id),
+        *user_scopes(request),
+    ]
@@ -0,0 +1,66 @@
+"""
+Денормализованные счётчики: записи, подписчики и подписки пользователя,
+комментарии к записи. Изменяются сигналами в той же транзакции, что и
+сами записи; расхождение исправляет команда `recount`.
+"""
+from django.db.models import Count, F, IntegerField, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import Comment, Follow, Post, User, UserCounters
+
+
+def increment(queryset, **deltas):
+    queryset.update(**{
+        name: Greatest(F(name) + delta, 0)
+        for name, delta in deltas.items()
+    })
+
+
+def change_user(user_id, **deltas):
+    increment(UserCounters.objects.filter(user_id=user_id), **deltas)
+
+
+def change_post(post_id, **deltas):
+    increment(Post.objects.filter(pk=post_id), **deltas)
+
+
+def count_of(queryset, field):
+    return Coalesce(Subquery(
+        queryset.filter(**{field: OuterRef('pk')}).order_by().values(
+            field
+        ).annotate(count=Count('pk')).values('count'),
+        output_field=IntegerField(),
+    ), 0)
+
+
+def recount():
+    """Пересчитывает все счётчики; возвращает число исправленных строк."""
+    UserCounters.objects.bulk_create(
+        [
+            UserCounters(user_id=user_id)
+            for user_id in User.objects.filter(
+                counters__isnull=True
+            ).values_list('pk', flat=True)
+        ],
+        ignore_conflicts=True,
+    )
+    posts = Post.objects.annotate(
+        actual_comments=count_of(Comment.objects, 'post')
+    ).exclude(comments_count=F('actual_comments'))
+    users = UserCounters.objects.annotate(
+        actual_posts=count_of(Post.objects, 'author'),
+        actual_followers=count_of(Follow.objects, 'author'),
+        actual_following=count_of(Follow.objects, 'user'),
+    ).exclude(
+        Q(posts_count=F('actual_posts'))
+        & Q(followers_count=F('actual_followers'))
+        & Q(following_count=F('actual_following'))
+    )
+    drifted = posts.count() + users.count()
+    Post.objects.update(comments_count=count_of(Comment.objects, 'post'))
+    UserCounters.objects.update(
+        posts_count=count_of(Post.objects, 'author'),
+        followers_count=count_of(Follow.objects, 'author'),
+        following_count=count_of(Follow.objects, 'user'),
+    )
+    return drifted
@@ -0,0 +1,212 @@
+"""
+Настройка, проверка и пул соединений с базой.
+
+SQLite без настроек держит журнал отката: пишущая транзакция не пускает
+читателей, параллельный писатель сразу получает «database is locked»,
+а кэш страниц у каждого соединения свой и начинается пустым. Прагмы из
+SQLITE_PRAGMAS выполняются при каждом новом соединении (сигнал
+connection_created) прямо в соединении sqlite3, минуя обёртки запросов,
+поэтому не попадают ни в метрики, ни в бюджеты запросов страниц.
+
+Постоянные соединения (CONN_MAX_AGE) проверяются перед первым запросом
+страницы, а в многопоточном сервере могут переходить между потоками
+через пул процесса (PersistentConnectionMixin). Счётчики открытых,
+повторно использованных и закрытых соединений — на /metrics/.
+"""
+import sqlite3
+import threading
+import time
+
+from django.conf import settings
+from django.db import connections
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    for name, value in settings.SQLITE_PRAGMAS.items():
+        connection.connection.execute(f'PRAGMA {name} = {value}')
+    # FTS5 читает настройки индекса при первом обращении в соединении.
+    # Если это триггер новой записи, то чтение идёт внутри пишущей
+    # транзакции, и SQLite не ждёт занятую базу даже с busy_timeout:
+    # первая запись каждого соединения получает «database is locked».
+    try:
+        connection.connection.execute(
+            'SELECT rowid FROM posts_post_fts WHERE rowid = 0'
+        )
+    except sqlite3.OperationalError:
+        # База ещё без миграции 0027_post_search
+        pass
+
+
+class ConnectionStats:
+    """Счётчики соединений процесса по псевдонимам баз для /metrics/."""
+
+    FIELDS = ('opened', 'reused', 'closed', 'health_check_failures')
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.aliases = {}
+
+    def count(self, alias, field):
+        with self.lock:
+            totals = self.aliases.setdefault(
+                alias, dict.fromkeys(self.FIELDS, 0)
+            )
+            totals[field] += 1
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                alias: dict(totals) for alias, totals in self.aliases.items()
+            }
+
+    def reset(self):
+        with self.lock:
+            self.aliases.clear()
+
+    def prometheus(self):
+        lines = []
+        snapshot = self.snapshot()
+        for field in self.FIELDS:
+            name = f'yatube_db_connections_{field}_total'
+            lines.append(f'# TYPE {name} counter')
+            for alias, totals in sorted(snapshot.items()):
+                lines.append(f'{name}{{alias="{alias}"}} {totals[field]}')
+        lines.append('# TYPE yatube_db_pool_idle gauge')
+        for alias, idle in sorted(pool.idle_counts().items()):
+            lines.append(f'yatube_db_pool_idle{{alias="{alias}"}} {idle}')
+        return '\n'.join(lines) + '\n'
+
+
+class ConnectionPool:
+    """
+    Простаивающие соединения процесса, общие для всех потоков: у
+    многопоточного сервера поток живёт один запрос, и постоянное
+    соединение потока (CONN_MAX_AGE) умирает вместе с ним.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # (псевдоним, имя базы) → [(соединение, время открытия)]
+        self.idle = {}
+
+    def take(self, key):
+        with self.lock:
+            idle = self.idle.get(key)
+            # Последнее вернувшееся — с самым тёплым кэшем
+            return idle.pop() if idle else None
+
+    def put(self, key, item, size):
+        with self.lock:
+            idle = self.idle.setdefault(key, [])
+            if len(idle) >= size:
+                return False
+            idle.append(item)
+            return True
+
+    def idle_counts(self):
+        with self.lock:
+            counts = {}
+            for (alias, _), idle in self.idle.items():
+                counts[alias] = counts.get(alias, 0) + len(idle)
+            return counts
+
+    def clear(self):
+        with self.lock:
+            items = [item for idle in self.idle.values() for item in idle]
+            self.idle.clear()
+        for connection, _ in items:
+            connection.close()
+
+
+stats = ConnectionStats()
+pool = ConnectionPool()
+
+
+class PersistentConnectionMixin:
+    """
+    Обёртка соединения Django (posts/backends) с проверкой постоянных
+    соединений и необязательным пулом. Ключи в DATABASES:
+    CONN_HEALTH_CHECKS — соединение, пережившее прошлый запрос, перед
+    первым запросом к базе проверяется через SELECT 1 и при ошибке
+    открывается заново (как в Django 4.1); POOL_SIZE — сколько закрытых
+    соединений держать в пуле процесса, POOL_MAX_AGE — сколько секунд
+    соединение может жить в пуле.
+    """
+    health_check_done = False
+    opened_at = 0
+
+    def pool_key(self):
+        return self.alias, self.settings_dict['NAME']
+
+    def usable(self, connection):
+        try:
+            cursor = connection.cursor()
+            cursor.execute('SELECT 1')
+            cursor.close()
+        except self.Database.Error:
+            return False
+        return True
+
+    def get_new_connection(self, conn_params):
+        # Новое соединение в этом запросе проверять незачем
+        self.health_check_done = True
+        while True:
+            item = pool.take(self.pool_key())
+            if item is None:
+                break
+            connection, self.opened_at = item
+            if self.usable(connection):
+                stats.count(self.alias, 'reused')
+                return connection
+            stats.count(self.alias, 'health_check_failures')
+            self.discard(connection)
+        stats.count(self.alias, 'opened')
+        self.opened_at = time.monotonic()
+        return super().get_new_connection(conn_params)
+
+    def ensure_connection(self):
+        if (self.connection is not None and not self.health_check_done
+                and not self.in_atomic_block
+                and self.settings_dict.get('CONN_HEALTH_CHECKS')):
+            self.health_check_done = True
+            if not self.usable(self.connection):
+                stats.count(self.alias, 'health_check_failures')
+                # Не возвращать сломанное соединение в пул
+                self.errors_occurred = True
+                self.close()
+        super().ensure_connection()
+
+    def _close(self):
+        if self.connection is not None and self.release(self.connection):
+            return
+        stats.count(self.alias, 'closed')
+        super()._close()
+
+    def release(self, connection):
+        """Возвращает соединение в пул; False, если его надо закрыть."""
+        size = self.settings_dict.get('POOL_SIZE') or 0
+        max_age = self.settings_dict.get('POOL_MAX_AGE', 600)
+        if (not size or self.errors_occurred or self.in_atomic_block
+                or time.monotonic() - self.opened_at > max_age):
+            return False
+        try:
+            # Незавершённая транзакция не должна достаться другому потоку
+            connection.rollback()
+        except self.Database.Error:
+            return False
+        return pool.put(self.pool_key(), (connection, self.opened_at), size)
+
+    def discard(self, connection):
+        stats.count(self.alias, 'closed')
+        try:
+            connection.close()
+        except self.Database.Error:
+            pass
+
+
+def reset_health_checks(**kwargs):
+    """Перед каждым запросом к сайту соединения проверяются заново."""
+    for connection in connections.all():
+        connection.health_check_done = False
@@ -0,0 +1,104 @@
+"""
+Выгрузка таблиц для аналитики потоком строк.
+
+Каждая таблица читается через values_list(...).iterator(chunk_size) в
+порядке id: в памяти одновременно только одна пачка строк, а последний
+выгруженный id служит отметкой для следующей инкрементальной выгрузки.
+Авторы и сообщества выгружаются по имени и slug, чтобы файлы можно было
+загрузить обратно командой import_yatube.
+"""
+import csv
+import json
+
+from .models import Comment, Follow, Group, Post
+
+# Таблица → (модель, [(поле в файле, поле запроса)], поле даты)
+TABLES = {
+    'groups': (Group, [
+        ('id', 'id'),
+        ('title', 'title'),
+        ('slug', 'slug'),
+        ('description', 'description'),
+    ], None),
+    'posts': (Post, [
+        ('id', 'id'),
+        ('text', 'text'),
+        ('pub_date', 'pub_date'),
+        ('author', 'author__username'),
+        ('group', 'group__slug'),
+        ('image', 'image'),
+    ], 'pub_date'),
+    'comments': (Comment, [
+        ('id', 'id'),
+        ('post', 'post_id'),
+        ('text', 'text'),
+        ('created', 'created'),
+        ('author', 'author__username'),
+    ], 'created'),
+    'follows': (Follow, [
+        ('id', 'id'),
+        ('user', 'user__username'),
+        ('author', 'author__username'),
+    ], None),
+}
+
+
+def columns(table):
+    return [column for column, _ in TABLES[table][1]]
+
+
+def rows(table, after_id=None, since=None, chunk_size=2000):
+    """Строки таблицы по возрастанию id."""
+    model, fields, date_field = TABLES[table]
+    queryset = model.objects.order_by('id')
+    if after_id is not None:
+        queryset = queryset.filter(id__gt=after_id)
+    if since is not None and date_field is not None:
+        queryset = queryset.filter(**{f'{date_field}__gte': since})
+    return queryset.values_list(
+        *(lookup for _, lookup in fields)
+    ).iterator(chunk_size=chunk_size)
+
+
+def plain(value):
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value
+
+
+class JSONLinesWriter:
+    extension = 'jsonl'
+
+    def __init__(self, stream, columns):
+        self.stream = stream
+        self.columns = columns
+
+    def write(self, row):
+        self.stream.write(json.dumps(
+            dict(zip(self.columns, map(plain, row))), ensure_ascii=False
+        ))
+        self.stream.write('\n')
+
+
+class CSVWriter:
+    extension = 'csv'
+
+    def __init__(self, stream, columns):
+        self.writer = csv.writer(stream)
+        self.writer.writerow(columns)
+
+    def write(self, row):
+        self.writer.writerow(map(plain, row))
+
+
+WRITERS = {'jsonl': JSONLinesWriter, 'csv': CSVWriter}
+
+
+def export(table, stream, format='jsonl', **kwargs):
+    """Пишет строки таблицы в поток; возвращает (число строк, последний id)."""
+    writer = WRITERS[format](stream, columns(table))
+    count, last_id = 0, None
+    for row in rows(table, **kwargs):
+        writer.write(row)
+        count, last_id = count + 1, row[0]
+    return count, last_id
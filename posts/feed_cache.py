@@ -0,0 +1,88 @@
+"""
+Версионированные ключи кэша лент.
+
+Фрагмент ленты кэшируется под ключом из названия ленты, пользователя,
+страницы и версий затронутых областей. Сигналы Post, Comment и Follow
+увеличивают версии, и старые фрагменты просто перестают читаться.
+Версия — время последнего изменения области в миллисекундах, поэтому
+по ней же строится Last-Modified (posts/conditional.py).
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+INDEX = 'index'
+
+
+def group_scope(group_id):
+    return f'group:{group_id}'
+
+
+def author_scope(author_id):
+    return f'author:{author_id}'
+
+
+def follow_scope(user_id):
+    """Подписки пользователя и подписки на него."""
+    return f'follow:{user_id}'
+
+
+def version_key(scope):
+    return f'feed-version:{scope}'
+
+
+def now():
+    return int(time.time() * 1000)
+
+
+def get_versions(*scopes):
+    keys = [version_key(scope) for scope in scopes]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            # Начальная версия от времени: после вытеснения ключа версия
+            # не повторит прежнюю, и старые фрагменты не вернутся.
+            version = now()
+            cache.add(key, version, None)
+            # Ключ могли уже вытеснить (cull у кэша в базе)
+            versions[key] = cache.get(key, version)
+    return [versions[key] for key in keys]
+
+
+def bump(*scopes):
+    # Текущие версии читаются одним обращением к кэшу
+    versions = cache.get_many([version_key(scope) for scope in scopes])
+    missing = []
+    for scope in scopes:
+        key = version_key(scope)
+        version = versions.get(key)
+        if version is None:
+            missing.append(scope)
+            continue
+        # incr атомарен, поэтому версия всегда растёт; шаг доводит её
+        # до текущего времени.
+        try:
+            cache.incr(key, max(now() - version, 1))
+        except ValueError:
+            missing.append(scope)
+    if missing:
+        get_versions(*missing)
+
+
+def post_scopes(post):
+    scopes = [INDEX, author_scope(post.author_id)]
+    if post.group_id is not None:
+        scopes.append(group_scope(post.group_id))
+    return scopes
+
+
+def feed_cache(request, feed, *scopes):
+    """Контекст для {% cache feed_cache_timeout feed feed_cache_key %}."""
+    user = request.user.id if request.user.is_authenticated else 'anonymous'
+    versions = '.'.join(str(version) for version in get_versions(*scopes))
+    page = request.GET.get('cursor') or request.GET.get('page') or ''
+    return {
+        'feed_cache_key': f'{feed}:{user}:{page}:{versions}',
+        'feed_cache_timeout': settings.FEED_CACHE_TIMEOUT,
+    }
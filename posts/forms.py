@@ -1,5 +1,8 @@
 from django import forms
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import UploadedFile
 
+from .images import check_size, ingest
 from .models import Comment, Post
 
 
@@ -8,6 +11,33 @@ class PostForm(forms.ModelForm):
         model = Post
         fields = ['group', 'text', 'image']
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # От файла, приём которого прервал SizeLimitUploadHandler, остался
+        # только размер: Pillow его не откроет, поэтому ошибка размера
+        # сообщается в clean() вместо ошибки ImageField
+        self.image_error = None
+        image = self.files.get(self.add_prefix('image'))
+        if image is not None:
+            try:
+                check_size(image)
+            except ValidationError as error:
+                self.image_error = error
+                self.files = self.files.copy()
+                del self.files[self.add_prefix('image')]
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if self.image_error is not None:
+            self.add_error('image', self.image_error)
+        return cleaned_data
+
+    def clean_image(self):
+        image = self.cleaned_data['image']
+        if isinstance(image, UploadedFile):
+            return ingest(image)
+        return image
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
@@ -0,0 +1,148 @@
+"""
+Приём изображений записей.
+
+Загруженный файл проверяется по размеру до декодирования, уменьшается
+до IMAGE_MAX_DIMENSION по большей стороне и перекодируется без EXIF и
+прочих метаданных. В хранилище попадает только этот канонический файл,
+и миниатюры строятся уже из него.
+
+SizeLimitUploadHandler (FILE_UPLOAD_HANDLERS) перестаёт принимать файл,
+как только он превысил IMAGE_MAX_UPLOAD_SIZE: остаток не пишется ни
+в память, ни на диск, а форма получает пустой OversizeUpload с
+настоящим размером и отклоняет его до декодирования.
+"""
+import io
+import os
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile, UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler
+from django.template.defaultfilters import filesizeformat
+from PIL import Image, ImageOps
+
+EXTENSIONS = {'JPEG': 'jpg', 'PNG': 'png', 'WEBP': 'webp', 'GIF': 'gif'}
+
+
+class OversizeUpload(UploadedFile):
+    """Файл, приём которого прервал SizeLimitUploadHandler."""
+
+    def __init__(self, name, content_type, size):
+        super().__init__(io.BytesIO(), name, content_type, size)
+
+
+class SizeLimitUploadHandler(FileUploadHandler):
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.oversize = False
+
+    def receive_data_chunk(self, raw_data, start):
+        if start + len(raw_data) > settings.IMAGE_MAX_UPLOAD_SIZE:
+            self.oversize = True
+        # None не передаёт кусок следующим обработчикам
+        return None if self.oversize else raw_data
+
+    def file_complete(self, file_size):
+        if not self.oversize:
+            return None
+        return OversizeUpload(self.file_name, self.content_type, file_size)
+
+
+def check_size(upload):
+    if upload.size > settings.IMAGE_MAX_UPLOAD_SIZE:
+        raise ValidationError(
+            'Файл больше %(limit)s.',
+            code='file_too_large',
+            params={
+                'limit': filesizeformat(settings.IMAGE_MAX_UPLOAD_SIZE)
+            },
+        )
+
+
+def has_alpha(image):
+    if image.mode in ('RGBA', 'LA'):
+        return image.getchannel('A').getextrema()[0] < 255
+    return image.mode == 'P' and 'transparency' in image.info
+
+
+def target_format(image):
+    if image.format == 'GIF':
+        return 'GIF'
+    if settings.IMAGE_FORMAT == 'JPEG' and has_alpha(image):
+        return 'PNG'
+    return settings.IMAGE_FORMAT
+
+
+def save_options(image_format, icc_profile=None):
+    options = {'icc_profile': icc_profile} if icc_profile else {}
+    if image_format == 'JPEG':
+        return {
+            **options,
+            'quality': settings.IMAGE_QUALITY,
+            'optimize': True,
+            'progressive': True,
+        }
+    if image_format == 'WEBP':
+        return {**options, 'quality': settings.IMAGE_QUALITY, 'method': 6}
+    if image_format == 'PNG':
+        return {**options, 'optimize': True}
+    return options
+
+
+def encode(image, image_format):
+    if image_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    elif image_format == 'WEBP' and image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if has_alpha(image) else 'RGB')
+    buffer = io.BytesIO()
+    image.save(
+        buffer,
+        image_format,
+        **save_options(image_format, image.info.get('icc_profile')),
+    )
+    return buffer.getvalue()
+
+
+def ingest(upload):
+    """
+    Каноническая версия загруженного изображения. GIF без изменения
+    размера сохраняется как есть, чтобы не потерять анимацию.
+    """
+    check_size(upload)
+    try:
+        return canonical(upload)
+    except (OSError, ValueError, Image.DecompressionBombError):
+        # Обрезанный или испорченный файл проходит проверку ImageField
+        # и ломается только при декодировании
+        raise ValidationError(
+            'Не удалось прочитать изображение: файл повреждён.',
+            code='invalid_image',
+        )
+
+
+def canonical(upload):
+    limit = settings.IMAGE_MAX_DIMENSION
+    upload.seek(0)
+    image = Image.open(upload)
+    if image.format == 'GIF' and max(image.size) <= limit:
+        upload.seek(0)
+        return upload
+    if getattr(image, 'is_animated', False):
+        raise ValidationError(
+            'Анимация больше %(limit)s пикселей по стороне.',
+            code='animation_too_large',
+            params={'limit': limit},
+        )
+    # JPEG декодируется сразу в уменьшенном масштабе (1/2, 1/4, 1/8).
+    image.draft(image.mode, (limit, limit))
+    image_format = target_format(image)
+    icc_profile = image.info.get('icc_profile')
+    image = ImageOps.exif_transpose(image)
+    image.thumbnail((limit, limit), Image.LANCZOS)
+    image.info = {'icc_profile': icc_profile} if icc_profile else {}
+    name = os.path.splitext(os.path.basename(upload.name))[0]
+    return SimpleUploadedFile(
+        f'{name}.{EXTENSIONS[image_format]}',
+        encode(image, image_format),
+        content_type=Image.MIME[image_format],
+    )
@@ -0,0 +1,223 @@
+"""
+Загрузка выгрузок export_yatube (JSON Lines) пачками.
+
+Строки читаются потоком и сохраняются через bulk_create по пачке в
+транзакции. Авторы и сообщества ищутся одним запросом на пачку;
+недостающие пользователи создаются без пароля. bulk_create не вызывает
+сигналы, поэтому счётчики, ленты подписок и версии кэша лент
+восстанавливаются один раз после загрузки (rebuild). Записи и
+комментарии сохраняют id из файла, поэтому повторная загрузка того же
+файла пропускает уже загруженные строки.
+"""
+import copy
+import json
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.color import no_style
+from django.db import connections, router, transaction
+from django.db.models import AutoField
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from users.validators import is_reserved
+
+from . import counters, feed_cache, timeline
+from .models import Comment, Follow, Group, Post, User
+
+
+class ImportFailed(ValueError):
+    pass
+
+
+def batches(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def read_lines(stream):
+    for number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            raise ImportFailed(f'Строка {number}: неверный JSON')
+
+
+def dated_fields(model):
+    """
+    Поля модели для INSERT с датами из объектов. auto_now_add заменил бы
+    их текущим временем и в bulk_create; флаг снимается на копиях полей,
+    потому что сами поля модели общие для всех потоков процесса.
+    """
+    fields = []
+    for field in model._meta.concrete_fields:
+        if getattr(field, 'auto_now_add', False):
+            field = copy.copy(field)
+            field.auto_now_add = False
+        fields.append(field)
+    return fields
+
+
+def bulk_insert(model, objs, ignore_conflicts=False):
+    """bulk_create, который сохраняет даты создания из объектов."""
+    queryset = model.objects.using(router.db_for_write(model))
+    fields = dated_fields(model)
+    with_pk = [obj for obj in objs if obj.pk is not None]
+    without_pk = [obj for obj in objs if obj.pk is None]
+    # Как в bulk_create: размер пачки INSERT выбирает база
+    if with_pk:
+        queryset._batched_insert(with_pk, fields, None, ignore_conflicts)
+    if without_pk:
+        queryset._batched_insert(without_pk, [
+            field for field in fields if not isinstance(field, AutoField)
+        ], None, ignore_conflicts)
+
+
+def reset_sequences(*models):
+    """
+    После вставки явных id следующий id должен быть больше них: иначе
+    на PostgreSQL новая запись получит занятый id.
+    """
+    connection = connections[router.db_for_write(models[0])]
+    statements = connection.ops.sequence_reset_sql(no_style(), models)
+    if statements:
+        with connection.cursor() as cursor:
+            for statement in statements:
+                cursor.execute(statement)
+
+
+def parse_date(value):
+    date = parse_datetime(value or '')
+    if date is None:
+        raise ImportFailed(f'Неверная дата: {value}')
+    if timezone.is_naive(date):
+        date = timezone.make_aware(date, timezone.utc)
+    return date
+
+
+class Importer:
+    def __init__(self, batch_size=1000):
+        self.batch_size = batch_size
+        self.scopes = {feed_cache.INDEX}
+
+    def users(self, names):
+        """Имя → id; недостающие пользователи создаются."""
+        names = set(names)
+        found = dict(User.objects.filter(username__in=names).values_list(
+            'username', 'id'
+        ))
+        missing = names - set(found)
+        reserved = sorted(filter(is_reserved, missing))
+        if reserved:
+            raise ImportFailed(
+                f'Имена заняты адресами сайта: {", ".join(reserved)}'
+            )
+        if missing:
+            password = make_password(None)
+            User.objects.bulk_create(
+                [User(username=name, password=password) for name in missing],
+                ignore_conflicts=True,
+            )
+            found.update(User.objects.filter(
+                username__in=missing
+            ).values_list('username', 'id'))
+        return found
+
+    def groups(self, slugs):
+        slugs = {slug for slug in slugs if slug}
+        found = dict(Group.objects.filter(slug__in=slugs).values_list(
+            'slug', 'id'
+        ))
+        missing = slugs - set(found)
+        if missing:
+            raise ImportFailed(
+                f'Нет сообществ: {", ".join(sorted(missing))}'
+            )
+        return found
+
+    def build_groups(self, rows):
+        return [
+            Group(
+                title=row['title'],
+                slug=row['slug'],
+                description=row.get('description', ''),
+            )
+            for row in rows
+        ]
+
+    def build_posts(self, rows):
+        users = self.users(row['author'] for row in rows)
+        groups = self.groups(row.get('group') for row in rows)
+        posts = []
+        for row in rows:
+            post = Post(
+                id=row['id'],
+                text=row['text'],
+                pub_date=parse_date(row['pub_date']),
+                author_id=users[row['author']],
+                group_id=groups.get(row.get('group')),
+                image=row.get('image') or '',
+            )
+            self.scopes.update(feed_cache.post_scopes(post))
+            posts.append(post)
+        return posts
+
+    def build_comments(self, rows):
+        users = self.users(row['author'] for row in rows)
+        for row in Post.objects.filter(
+            id__in={row['post'] for row in rows}
+        ).values('author_id', 'group_id'):
+            self.scopes.update(feed_cache.post_scopes(Post(**row)))
+        return [
+            Comment(
+                id=row.get('id'),
+                post_id=row['post'],
+                text=row['text'],
+                created=parse_date(row['created']),
+                author_id=users[row['author']],
+            )
+            for row in rows
+        ]
+
+    def build_follows(self, rows):
+        users = self.users(
+            name for row in rows for name in (row['user'], row['author'])
+        )
+        self.scopes.update(
+            feed_cache.follow_scope(user_id) for user_id in users.values()
+        )
+        return [
+            Follow(user_id=users[row['user']], author_id=users[row['author']])
+            for row in rows
+            if row['user'] != row['author']
+        ]
+
+    def load(self, table, rows):
+        """Загружает строки таблицы; возвращает их число."""
+        model = {
+            'groups': Group, 'posts': Post,
+            'comments': Comment, 'follows': Follow,
+        }[table]
+        build = getattr(self, f'build_{table}')
+        count = 0
+        for batch in batches(rows, self.batch_size):
+            with transaction.atomic():
+                # Строки, которые уже есть (та же выгрузка второй раз),
+                # пропускаются
+                bulk_insert(model, build(batch), ignore_conflicts=True)
+            count += len(batch)
+        if table in ('posts', 'comments'):
+            reset_sequences(model)
+        return count
+
+    def rebuild(self):
+        """Счётчики, ленты подписок и версии кэша после загрузки."""
+        counters.recount()
+        timeline.rebuild()
+        feed_cache.bump(*self.scopes)
@@ -0,0 +1,100 @@
+import os
+import tempfile
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import override_settings
+
+from benchmarks import dataset, paths
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет временную базу набором данных и замеряет задержку '
+        '(p50/p95/p99), запросы к базе и RPS основных страниц через '
+        'тестовый клиент и WSGI-сервер. Рабочая база не затрагивается.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--groups', type=int, default=10)
+        parser.add_argument('--posts', type=int, default=5000)
+        parser.add_argument(
+            '--follows', type=int, default=20,
+            help='Подписок у каждого пользователя.',
+        )
+        parser.add_argument(
+            '--comments', type=int, default=3,
+            help='Комментариев к каждой записи.',
+        )
+        parser.add_argument(
+            '--images', type=float, default=0.2,
+            help='Доля записей с изображением.',
+        )
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--concurrency', type=int, default=4)
+        parser.add_argument(
+            '--scenarios', nargs='+', choices=list(paths.SCENARIOS),
+            default=list(paths.SCENARIOS),
+        )
+        parser.add_argument(
+            '--drivers', nargs='+', choices=paths.DRIVERS,
+            default=paths.DRIVERS,
+        )
+        parser.add_argument(
+            '--output', help='Сохранить результаты в этот JSON-файл.',
+        )
+        parser.add_argument(
+            '--compare',
+            help='JSON-файл прошлого прогона для сравнения p95 и запросов.',
+        )
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['compare']:
+            baseline = paths.load(options['compare'])
+        with tempfile.TemporaryDirectory() as directory:
+            connection.settings_dict.setdefault('TEST', {})['NAME'] = (
+                os.path.join(directory, 'bench.sqlite3')
+            )
+            old_name = connection.creation.create_test_db(
+                verbosity=0, autoclobber=True, serialize=False
+            )
+            try:
+                with override_settings(
+                    DEBUG=False,
+                    ALLOWED_HOSTS=['*'],
+                    MEDIA_ROOT=os.path.join(directory, 'media'),
+                ):
+                    results = self.run(options)
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+        if options['output']:
+            paths.save(options['output'], self.dataset, results)
+            self.stdout.write(f'Результаты сохранены в {options["output"]}')
+        if baseline is not None:
+            for line in paths.compare(results, baseline):
+                self.stdout.write(line)
+
+    def run(self, options):
+        self.dataset = dataset.seed(
+            users=options['users'],
+            groups=options['groups'],
+            posts=options['posts'],
+            follows=options['follows'],
+            comments=options['comments'],
+            images=options['images'],
+        )
+        results = []
+        for result in paths.run(
+            options['scenarios'], options['drivers'],
+            options['requests'], options['concurrency'],
+        ):
+            self.stdout.write(
+                f'{result["driver"]:>6} {result["scenario"]:<13} '
+                f'p50 {result["p50_ms"]:7.1f}  p95 {result["p95_ms"]:7.1f}  '
+                f'p99 {result["p99_ms"]:7.1f} мс  '
+                f'запросов {result["queries"]}  {result["rps"]} rps'
+            )
+            results.append(result)
+        return results
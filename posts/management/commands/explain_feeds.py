@@ -0,0 +1,114 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from posts.models import Comment, Post
+from posts.paginators import NEXT, PREVIOUS, CursorPaginator, encode_cursor
+from posts.timeline import (NumberedTimelinePaginator, TimelinePaginator,
+                            follow_feed)
+
+
+def feed_querysets(user_id, group_id, post_id):
+    """Запросы, которые выполняют страницы ленты."""
+    per_page = settings.POSTS_PER_PAGE
+    return {
+        'index': CursorPaginator(Post.objects.feed(), per_page),
+        'group': CursorPaginator(
+            Post.objects.feed().filter(group_id=group_id), per_page
+        ),
+        'profile': CursorPaginator(
+            Post.objects.feed().filter(author_id=user_id), per_page
+        ),
+        'follow': TimelinePaginator(
+            follow_feed(user_id), per_page, user=user_id
+        ),
+        # Одна часть UNION ALL записей авторов с `pull`
+        'follow_pulled': TimelinePaginator(
+            follow_feed(user_id), per_page, user=user_id
+        ).get_author_queryset(user_id),
+        # Первая нумерованная страница ленты (без записей с `pull`)
+        'follow_numbered': NumberedTimelinePaginator(
+            follow_feed(user_id), per_page, user=user_id
+        ).entries().order_by('-pub_date', '-post_id')[:per_page],
+        'follow_posts': Post.objects.feed().filter(
+            id__in=range(per_page)
+        ).order_by(),
+        'comments': Comment.objects.filter(
+            post_id=post_id
+        ).select_related('author')[:per_page],
+    }
+
+
+def explain(queryset):
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def plan_problems(plan):
+    # "SCAN table USING INDEX" — обход индекса в нужном порядке до LIMIT,
+    # а "SCAN table" без индекса читает всю таблицу.
+    return [
+        detail for detail in plan
+        if detail.startswith('SCAN ') and ' USING ' not in detail
+        or detail.startswith('USE TEMP B-TREE')
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        'Выполняет EXPLAIN QUERY PLAN для запросов лент и завершается '
+        'с ошибкой, если какой-то из них читает таблицу целиком или '
+        'сортирует во временном B-дереве. COUNT(*) нумерованной '
+        'навигации не проверяется: навигация по ключу его не выполняет.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'feeds', nargs='*',
+            help='Какие ленты проверять (по умолчанию — все).',
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError(
+                'EXPLAIN QUERY PLAN поддерживается только для SQLite.'
+            )
+        querysets = feed_querysets(user_id=1, group_id=1, post_id=1)
+        feeds = options['feeds'] or list(querysets)
+        unknown = set(feeds) - set(querysets)
+        if unknown:
+            raise CommandError(
+                f'Неизвестные ленты: {", ".join(sorted(unknown))}'
+            )
+        anchor = Post(id=1, pub_date=timezone.now())
+        failed = []
+        for name in feeds:
+            paginator = querysets[name]
+            if isinstance(paginator, CursorPaginator):
+                variants = {
+                    'first': paginator.get_queryset(),
+                    'next': paginator.get_queryset(
+                        encode_cursor(NEXT, anchor)
+                    ),
+                    'previous': paginator.get_queryset(
+                        encode_cursor(PREVIOUS, anchor)
+                    ),
+                }
+            else:
+                variants = {'first': paginator}
+            for variant, page_queryset in variants.items():
+                plan = explain(page_queryset)
+                problems = plan_problems(plan)
+                status = 'FAIL' if problems else 'OK'
+                self.stdout.write(f'{name} ({variant}): {status}')
+                for detail in plan:
+                    self.stdout.write(f'    {detail}')
+                if problems:
+                    failed.append(f'{name} ({variant})')
+        if failed:
+            raise CommandError(
+                f'Неэффективные планы запросов: {", ".join(failed)}'
+            )
@@ -0,0 +1,78 @@
+import json
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_datetime
+
+from posts.exports import TABLES, WRITERS, export
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает сообщества, записи, комментарии и подписки в JSON Lines '
+        'или CSV потоком, по файлу на таблицу. С --watermark выгружаются '
+        'только строки, добавленные после прошлой выгрузки.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'tables', nargs='*',
+            help=f'Какие таблицы выгружать: {", ".join(TABLES)} '
+                 '(по умолчанию — все).',
+        )
+        parser.add_argument(
+            '--format', choices=list(WRITERS), default='jsonl',
+        )
+        parser.add_argument(
+            '--output', default='.',
+            help='Каталог для файлов <таблица>.<формат>.',
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=2000,
+            help='Сколько строк читать из базы за раз.',
+        )
+        parser.add_argument(
+            '--since',
+            help='Только записи и комментарии не раньше этого момента '
+                 '(ISO 8601).',
+        )
+        parser.add_argument(
+            '--watermark',
+            help='JSON-файл с последним выгруженным id каждой таблицы; '
+                 'читается перед выгрузкой и обновляется после неё.',
+        )
+
+    def handle(self, *args, **options):
+        tables = options['tables'] or list(TABLES)
+        unknown = set(tables) - set(TABLES)
+        if unknown:
+            raise CommandError(
+                f'Неизвестные таблицы: {", ".join(sorted(unknown))}'
+            )
+        since = None
+        if options['since']:
+            since = parse_datetime(options['since'])
+            if since is None:
+                raise CommandError(f'Неверная дата: {options["since"]}')
+        watermark = {}
+        if options['watermark'] and os.path.exists(options['watermark']):
+            with open(options['watermark']) as file:
+                watermark = json.load(file)
+        os.makedirs(options['output'], exist_ok=True)
+        for table in tables:
+            path = os.path.join(
+                options['output'], f'{table}.{options["format"]}'
+            )
+            with open(path, 'w', encoding='utf-8', newline='') as stream:
+                count, last_id = export(
+                    table, stream, options['format'],
+                    after_id=watermark.get(table),
+                    since=since,
+                    chunk_size=options['chunk_size'],
+                )
+            if last_id is not None:
+                watermark[table] = last_id
+            self.stdout.write(f'{table}: {count} строк → {path}')
+        if options['watermark']:
+            with open(options['watermark'], 'w') as file:
+                json.dump(watermark, file)
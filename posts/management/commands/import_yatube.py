@@ -0,0 +1,64 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError
+
+from posts.exports import TABLES
+from posts.imports import Importer, ImportFailed, read_lines
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает файлы JSON Lines в формате export_yatube через '
+        'bulk_create пачками. Таблица определяется по имени файла '
+        '(posts.jsonl) или --table; id записей сохраняются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('files', nargs='+')
+        parser.add_argument(
+            '--table', choices=list(TABLES),
+            help='Таблица для всех файлов вместо имени файла.',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Строк в одной пачке и транзакции.',
+        )
+        parser.add_argument(
+            '--no-rebuild', action='store_true',
+            help='Не пересчитывать счётчики и ленты подписок после '
+                 'загрузки (например, если дальше загружаются ещё файлы; '
+                 'затем запустите recount и rebuild_timelines).',
+        )
+
+    def handle(self, *args, **options):
+        files = []
+        for path in options['files']:
+            table = options['table'] or os.path.basename(path).split('.')[0]
+            if table not in TABLES:
+                raise CommandError(f'Неизвестная таблица для {path}')
+            files.append((table, path))
+        # Сообщества и записи раньше комментариев и подписок
+        order = list(TABLES)
+        files.sort(key=lambda file: order.index(file[0]))
+        importer = Importer(batch_size=options['batch_size'])
+        for table, path in files:
+            started = time.perf_counter()
+            try:
+                with open(path, encoding='utf-8') as stream:
+                    count = importer.load(table, read_lines(stream))
+            except (ImportFailed, IntegrityError, KeyError) as error:
+                raise CommandError(f'{path}: {error!r}')
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f'{table}: {count} строк за {elapsed:.1f} с '
+                f'({count / max(elapsed, 1e-6):.0f} строк/с)'
+            )
+        if not options['no_rebuild']:
+            started = time.perf_counter()
+            importer.rebuild()
+            self.stdout.write(
+                f'Счётчики и ленты восстановлены за '
+                f'{time.perf_counter() - started:.1f} с'
+            )
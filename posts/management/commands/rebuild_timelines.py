@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from posts import feed_cache, timeline
+from posts.models import TimelineEntry
+
+
+class Command(BaseCommand):
+    help = (
+        'Восстанавливает ленты подписок по подпискам и записям: помечает '
+        'подписки на популярных авторов и дополняет ленты остальных. '
+        'Нужна после import_yatube и seed_yatube с --no-rebuild.'
+    )
+
+    def handle(self, *args, **options):
+        before = TimelineEntry.objects.count()
+        timeline.rebuild()
+        # Лента подписок входит в область INDEX (posts/conditional.py)
+        feed_cache.bump(feed_cache.INDEX)
+        added = TimelineEntry.objects.count() - before
+        self.stdout.write(f'Добавлено записей в ленты: {added}')
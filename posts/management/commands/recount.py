@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from posts.counters import recount
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает счётчики записей, подписчиков, подписок '
+        'и комментариев по исходным таблицам.'
+    )
+
+    def handle(self, *args, **options):
+        drifted = recount()
+        self.stdout.write(f'Исправлено строк со счётчиками: {drifted}')
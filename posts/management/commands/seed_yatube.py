@@ -0,0 +1,70 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.seeding import Seeder
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет базу синтетическими пользователями, сообществами, '
+        'записями, подписками и комментариями через bulk_create пачками. '
+        'Популярность авторов и число подписчиков распределены по закону '
+        'Ципфа, число комментариев — по Парето.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=50)
+        parser.add_argument('--posts', type=int, default=100000)
+        parser.add_argument('--follows-per-user', type=int, default=20)
+        parser.add_argument(
+            '--comments-per-post', type=float, default=3,
+            help='Среднее число комментариев к записи.',
+        )
+        parser.add_argument(
+            '--days', type=int, default=365,
+            help='Записи равномерно заполняют столько последних дней.',
+        )
+        parser.add_argument(
+            '--password',
+            help='Пароль всех пользователей; без него войти нельзя.',
+        )
+        parser.add_argument(
+            '--workers', type=int, default=1,
+            help='Процессов, которые строят строки (пишет в базу один).',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--no-rebuild', action='store_true',
+            help='Не пересчитывать счётчики и ленты подписок (затем '
+                 'запустите recount и rebuild_timelines).',
+        )
+
+    def handle(self, *args, **options):
+        seeder = Seeder(
+            users=options['users'],
+            groups=options['groups'],
+            posts=options['posts'],
+            follows_per_user=options['follows_per_user'],
+            comments_per_post=options['comments_per_post'],
+            days=options['days'],
+            password=options['password'],
+            workers=options['workers'],
+            random_seed=options['seed'],
+        )
+        for table in ('users', 'groups', 'posts', 'follows', 'comments'):
+            started = time.perf_counter()
+            count = getattr(seeder, table)()
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f'{table}: {count} строк за {elapsed:.1f} с '
+                f'({count / max(elapsed, 1e-6):.0f} строк/с)'
+            )
+        if not options['no_rebuild']:
+            started = time.perf_counter()
+            seeder.rebuild()
+            self.stdout.write(
+                f'Счётчики и ленты восстановлены за '
+                f'{time.perf_counter() - started:.1f} с'
+            )
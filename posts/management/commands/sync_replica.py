@@ -0,0 +1,49 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class Command(BaseCommand):
+    help = (
+        'Копирует основную базу SQLite в реплики REPLICA_DATABASES. '
+        'С --interval повторяет копирование и так изображает '
+        'отстающую реплику на одной машине.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=float,
+            help='Копировать каждые столько секунд, пока не прервут.',
+        )
+
+    def handle(self, *args, **options):
+        if not settings.REPLICA_DATABASES:
+            raise CommandError(
+                'Реплик нет: укажите файл в YATUBE_DB_REPLICA.'
+            )
+        primary = connections[DEFAULT_DB_ALIAS]
+        if primary.vendor != 'sqlite':
+            raise CommandError('Копировать можно только базу SQLite.')
+        while True:
+            started = time.perf_counter()
+            primary.ensure_connection()
+            for alias in settings.REPLICA_DATABASES:
+                self.copy(primary, connections[alias].settings_dict['NAME'])
+            self.stdout.write(
+                f'Реплики обновлены за '
+                f'{time.perf_counter() - started:.2f} с'
+            )
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
+
+    def copy(self, primary, name):
+        # Backup API копирует согласованный снимок, не мешая писателям
+        target = sqlite3.connect(name)
+        try:
+            primary.connection.backup(target)
+        finally:
+            target.close()
@@ -0,0 +1,30 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from posts import thumbnails
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = (
+        'Создаёт недостающие варианты миниатюр изображений записей '
+        'параллельно.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=4,
+            help='Число параллельных потоков.',
+        )
+
+    def handle(self, *args, **options):
+        # Список читается целиком: потоки сразу пишут в ту же таблицу.
+        missing = list(Post.objects.exclude(image='').exclude(
+            image__isnull=True
+        ).filter(image_variants='').values_list(
+            'image', flat=True
+        ).order_by().distinct())
+        with ThreadPoolExecutor(options['workers']) as executor:
+            created = sum(executor.map(thumbnails.generate, missing))
+        self.stdout.write(f'Изображений с новыми миниатюрами: {created}')
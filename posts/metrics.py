@@ -0,0 +1,289 @@
+"""
+Число запросов к базе, время базы и шаблонов и попадания в кэш по
+именам маршрутов (index, profile, post, ...).
+
+QueryMetricsMiddleware считает запросы через execute_wrapper, без
+DEBUG и без хранения SQL, поэтому годится для боевого сервера. Запросы
+самого кэша (DatabaseCache) считаются отдельно и в бюджет не входят:
+они зависят от движка кэша, а не от страницы. Итоги
+копятся в памяти процесса и вместе со счётчиками соединений с базой
+(posts/db.py) отдаются страницей /metrics/ в текстовом формате
+Prometheus. Запросы сверх бюджета представления
+(QUERY_BUDGETS, иначе QUERY_BUDGET) пишутся в журнал yatube.queries.
+"""
+import logging
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+from django.template.backends.django import DjangoTemplates
+from django.urls import Resolver404, resolve
+
+from . import db
+
+logger = logging.getLogger('yatube.queries')
+
+current = ContextVar('request_metrics', default=None)
+# Подписчики на итоги каждого запроса (assert_query_budget)
+listeners = []
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.queries = 0
+        self.cache_queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        # Вложенные вызовы (get_many через get, шаблон внутри шаблона)
+        # не считаются второй раз
+        self.in_cache = False
+        self.in_template = False
+
+
+class Registry:
+    """Суммы метрик процесса по именам маршрутов."""
+
+    FIELDS = (
+        'requests', 'queries', 'cache_queries', 'db_seconds',
+        'template_seconds', 'cache_hits', 'cache_misses', 'over_budget',
+    )
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.views = {}
+
+    def record(self, view, metrics, over_budget):
+        with self.lock:
+            totals = self.views.setdefault(
+                view, dict.fromkeys(self.FIELDS, 0)
+            )
+            totals['requests'] += 1
+            totals['queries'] += metrics.queries
+            totals['cache_queries'] += metrics.cache_queries
+            totals['db_seconds'] += metrics.db_time
+            totals['template_seconds'] += metrics.template_time
+            totals['cache_hits'] += metrics.cache_hits
+            totals['cache_misses'] += metrics.cache_misses
+            totals['over_budget'] += over_budget
+
+    def snapshot(self):
+        with self.lock:
+            return {view: dict(totals) for view, totals in self.views.items()}
+
+    def reset(self):
+        with self.lock:
+            self.views.clear()
+
+    def prometheus(self):
+        lines = []
+        for field in self.FIELDS:
+            name = f'yatube_view_{field}_total'
+            lines.append(f'# TYPE {name} counter')
+            for view, totals in sorted(self.snapshot().items()):
+                lines.append(f'{name}{{view="{view}"}} {totals[field]}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+def prometheus():
+    """Все метрики процесса: маршруты и соединения с базой."""
+    return registry.prometheus() + db.stats.prometheus()
+
+
+def count_query(execute, sql, params, many, context):
+    metrics = current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        if metrics.in_cache:
+            metrics.cache_queries += 1
+        else:
+            metrics.queries += 1
+        metrics.db_time += time.perf_counter() - started
+
+
+def count_cache(method, hits):
+    """
+    Оборачивает чтение из кэша; hits(результат, args, kwargs) возвращает
+    (попаданий, ключей).
+    """
+    @wraps(method)
+    def wrapper(*args, **kwargs):
+        metrics = current.get()
+        if metrics is None or metrics.in_cache:
+            return method(*args, **kwargs)
+        metrics.in_cache = True
+        try:
+            result = method(*args, **kwargs)
+        finally:
+            metrics.in_cache = False
+        found, total = hits(result, args, kwargs)
+        metrics.cache_hits += found
+        metrics.cache_misses += total - found
+        return result
+    wrapper.counted = True
+    return wrapper
+
+
+def mark_cache(method):
+    """Запросы к базе внутри метода относятся к кэшу."""
+    @wraps(method)
+    def wrapper(*args, **kwargs):
+        metrics = current.get()
+        if metrics is None or metrics.in_cache:
+            return method(*args, **kwargs)
+        metrics.in_cache = True
+        try:
+            return method(*args, **kwargs)
+        finally:
+            metrics.in_cache = False
+    return wrapper
+
+
+def get_hits(result, args, kwargs):
+    default = args[1] if len(args) > 1 else kwargs.get('default')
+    return int(result is not default), 1
+
+
+def get_many_hits(result, args, kwargs):
+    keys = args[0] if args else kwargs['keys']
+    return len(result), len(keys)
+
+
+CACHE_WRITES = (
+    'add', 'set', 'set_many', 'touch', 'incr', 'decr', 'delete',
+    'delete_many', 'has_key', 'clear',
+)
+
+
+def instrument_cache(cache):
+    """
+    Считает попадания get и get_many у экземпляра кэша потока и
+    отделяет запросы к базе всех методов кэша от запросов страницы.
+    """
+    if getattr(cache.get, 'counted', False):
+        return
+    for name in CACHE_WRITES:
+        setattr(cache, name, mark_cache(getattr(cache, name)))
+    cache.get = count_cache(cache.get, get_hits)
+    cache.get_many = count_cache(cache.get_many, get_many_hits)
+
+
+class InstrumentedTemplate:
+    def __init__(self, template):
+        self.template = template
+
+    def __getattr__(self, name):
+        return getattr(self.template, name)
+
+    def render(self, context=None, request=None):
+        metrics = current.get()
+        if metrics is None or metrics.in_template:
+            return self.template.render(context, request)
+        metrics.in_template = True
+        started = time.perf_counter()
+        try:
+            return self.template.render(context, request)
+        finally:
+            metrics.in_template = False
+            metrics.template_time += time.perf_counter() - started
+
+
+class InstrumentedDjangoTemplates(DjangoTemplates):
+    """Движок шаблонов Django, который замеряет время отрисовки."""
+
+    def from_string(self, template_code):
+        return InstrumentedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return InstrumentedTemplate(super().get_template(template_name))
+
+
+def view_name(request):
+    match = request.resolver_match
+    if match is None:
+        # Ответ из кэша страниц отдаётся до разбора адреса
+        try:
+            match = resolve(request.path_info)
+        except Resolver404:
+            return 'unresolved'
+    return match.view_name or 'unresolved'
+
+
+def query_budget(view):
+    return settings.QUERY_BUDGETS.get(view, settings.QUERY_BUDGET)
+
+
+class QueryMetricsMiddleware:
+    """Стоит первым, чтобы учитывать и ответы из кэша страниц."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        metrics = RequestMetrics()
+        token = current.set(metrics)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(count_query)
+                    )
+                for alias in settings.CACHES:
+                    instrument_cache(caches[alias])
+                response = self.get_response(request)
+        finally:
+            current.reset(token)
+        view = view_name(request)
+        budget = query_budget(view)
+        over_budget = metrics.queries > budget
+        if over_budget:
+            logger.warning(
+                '%s %s (%s): %d запросов к базе при бюджете %d',
+                request.method, request.get_full_path(), view,
+                metrics.queries, budget,
+            )
+        registry.record(view, metrics, over_budget)
+        for listener in list(listeners):
+            listener(view, metrics)
+        return response
+
+
+@contextmanager
+def assert_query_budget(**budgets):
+    """
+    Проверяет, что каждый запрос к сайту внутри блока укладывается в
+    бюджет своего представления: из аргументов (index=5) или настроек.
+    Возвращает список (имя маршрута, число запросов к базе).
+    """
+    observed = []
+
+    def listener(view, metrics):
+        observed.append((view, metrics.queries))
+
+    listeners.append(listener)
+    try:
+        yield observed
+    finally:
+        listeners.remove(listener)
+    over = [
+        f'{view}: {queries} > {budgets.get(view, query_budget(view))}'
+        for view, queries in observed
+        if queries > budgets.get(view, query_budget(view))
+    ]
+    if over:
+        raise AssertionError(
+            'Превышен бюджет запросов к базе: ' + ', '.join(over)
+        )
@@ -0,0 +1,98 @@
+"""
+Кэш целых страниц для анонимных посетителей.
+
+Анонимный GET-запрос без cookie сессии к представлению с `page_scopes`
+обслуживается из кэша по ключу из хоста, пути, параметров CACHED_PARAMS
+и версий областей страницы (posts/feed_cache.py): сигналы записей, комментариев
+и подписок меняют версии, и устаревшие страницы перестают читаться.
+Middleware стоит сразу после SecurityMiddleware, поэтому попадание
+не затрагивает сессию, аутентификацию, CSRF и шаблоны.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.urls import Resolver404, resolve
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe, urlencode
+
+from . import feed_cache
+
+# Параметры, от которых зависит кэшируемая страница. Запросы с другими
+# параметрами (метки ссылок, ?comments=) идут мимо кэша: иначе каждая
+# новая строка запроса занимала бы место в нём.
+CACHED_PARAMS = ('page', 'cursor')
+
+
+def static_scopes(request, *args, **kwargs):
+    return []
+
+
+def cache_for_anonymous(scopes_func=static_scopes):
+    """Разрешает кэшировать страницу представления для анонимных."""
+    def decorator(view):
+        view.page_scopes = scopes_func
+        return view
+    return decorator
+
+
+class AnonymousPageCacheMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        key = self.cache_key(request)
+        if key is None:
+            return self.get_response(request)
+        response = cache.get(key)
+        if response is not None:
+            return get_conditional_response(
+                request,
+                etag=response.get('ETag'),
+                last_modified=parse_http_date_safe(
+                    response.get('Last-Modified', '')
+                ),
+                response=response,
+            )
+        response = self.get_response(request)
+        if self.is_cacheable(response):
+            cache.set(key, response, settings.PAGE_CACHE_TIMEOUT)
+        return response
+
+    def cache_key(self, request):
+        if (
+            not settings.PAGE_CACHE_TIMEOUT
+            or request.method != 'GET'
+            or settings.SESSION_COOKIE_NAME in request.COOKIES
+            or set(request.GET) - set(CACHED_PARAMS)
+        ):
+            return None
+        try:
+            match = resolve(request.path_info)
+        except Resolver404:
+            return None
+        scopes_func = getattr(match.func, 'page_scopes', None)
+        if scopes_func is None:
+            return None
+        scopes = scopes_func(request, *match.args, **match.kwargs)
+        if scopes is None:
+            return None
+        versions = '.'.join(
+            str(version) for version in feed_cache.get_versions(*scopes)
+        )
+        params = urlencode([
+            (name, request.GET.getlist(name))
+            for name in CACHED_PARAMS if name in request.GET
+        ], doseq=True)
+        # Один сайт может отвечать на нескольких хостах: абсолютные
+        # ссылки страницы зависят от хоста
+        url = f'{request.get_host()}{request.path}?{params}'
+        path = hashlib.md5(url.encode()).hexdigest()
+        return f'page:{path}:{versions}'
+
+    def is_cacheable(self, response):
+        return (
+            response.status_code == 200
+            and not response.streaming
+            and not response.cookies
+        )
@@ -0,0 +1,94 @@
+# Generated by Django 2.2.6 on 2026-10-18 04:10
+
+from django.db import migrations
+
+# Полнотекстовый индекс SQLite FTS5 по тексту записи, названию
+# сообщества и имени автора. Триггеры поддерживают его при любой записи
+# в таблицы, включая bulk_create и UPDATE без сигналов.
+CREATE_SQL = [
+    """
+    CREATE VIRTUAL TABLE posts_post_fts USING fts5(
+        text, group_title, author_name,
+        tokenize = 'unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER posts_post_fts_insert AFTER INSERT ON posts_post BEGIN
+        INSERT INTO posts_post_fts (rowid, text, group_title, author_name)
+        VALUES (
+            new.id, new.text,
+            (SELECT title FROM posts_group WHERE id = new.group_id),
+            (SELECT username FROM auth_user WHERE id = new.author_id)
+        );
+    END
+    """,
+    """
+    CREATE TRIGGER posts_post_fts_update
+    AFTER UPDATE OF text, group_id, author_id ON posts_post BEGIN
+        DELETE FROM posts_post_fts WHERE rowid = old.id;
+        INSERT INTO posts_post_fts (rowid, text, group_title, author_name)
+        VALUES (
+            new.id, new.text,
+            (SELECT title FROM posts_group WHERE id = new.group_id),
+            (SELECT username FROM auth_user WHERE id = new.author_id)
+        );
+    END
+    """,
+    """
+    CREATE TRIGGER posts_post_fts_delete AFTER DELETE ON posts_post BEGIN
+        DELETE FROM posts_post_fts WHERE rowid = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER posts_group_fts_update
+    AFTER UPDATE OF title ON posts_group BEGIN
+        UPDATE posts_post_fts SET group_title = new.title
+        WHERE rowid IN (SELECT id FROM posts_post WHERE group_id = new.id);
+    END
+    """,
+    """
+    CREATE TRIGGER auth_user_fts_update
+    AFTER UPDATE OF username ON auth_user BEGIN
+        UPDATE posts_post_fts SET author_name = new.username
+        WHERE rowid IN (SELECT id FROM posts_post WHERE author_id = new.id);
+    END
+    """,
+    """
+    INSERT INTO posts_post_fts (rowid, text, group_title, author_name)
+    SELECT posts_post.id, posts_post.text, posts_group.title,
+           auth_user.username
+    FROM posts_post
+    JOIN auth_user ON auth_user.id = posts_post.author_id
+    LEFT JOIN posts_group ON posts_group.id = posts_post.group_id
+    """,
+]
+
+DROP_SQL = [
+    'DROP TRIGGER IF EXISTS auth_user_fts_update',
+    'DROP TRIGGER IF EXISTS posts_group_fts_update',
+    'DROP TRIGGER IF EXISTS posts_post_fts_delete',
+    'DROP TRIGGER IF EXISTS posts_post_fts_update',
+    'DROP TRIGGER IF EXISTS posts_post_fts_insert',
+    'DROP TABLE IF EXISTS posts_post_fts',
+]
+
+
+def run(statements):
+    def operation(apps, schema_editor):
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0011_update_proxy_permissions'),
+        ('posts', '0026_post_image_variants'),
+    ]
+
+    operations = [
+        migrations.RunPython(run(CREATE_SQL), run(DROP_SQL)),
+    ]
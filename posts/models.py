@@ -1,3 +1,5 @@
+import json
+
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.db import models
@@ -28,6 +30,12 @@ class Group(models.Model):
         return self.title
 
 
+class PostQuerySet(models.QuerySet):
+    def feed(self):
+        """Записи для ленты вместе с автором и сообществом."""
+        return self.select_related('author', 'group')
+
+
 class Post(models.Model):
     text = models.TextField(
         verbose_name="ваш текст",
@@ -58,12 +66,50 @@ class Post(models.Model):
         blank=True,
         null=True,
     )
+    image_variants = models.TextField(
+        verbose_name="варианты изображения",
+        blank=True,
+        default="",
+        editable=False,
+        help_text="адреса готовых миниатюр по ширине в JSON",
+    )
+    comments_count = models.PositiveIntegerField(
+        verbose_name="число комментариев",
+        default=0,
+        editable=False,
+    )
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
-        ordering = ["-pub_date"]
+        ordering = ["-pub_date", "-id"]
+        indexes = [
+            models.Index(
+                fields=["-pub_date", "-id"],
+                name="post_pub_date_idx",
+            ),
+            models.Index(
+                fields=["group", "-pub_date", "-id"],
+                name="post_group_pub_date_idx",
+            ),
+            models.Index(
+                fields=["author", "-pub_date", "-id"],
+                name="post_author_pub_date_idx",
+            ),
+        ]
         verbose_name = "запись"
         verbose_name_plural = "записи"
 
+    def get_image_variants(self):
+        """Адреса миниатюр изображения по ширине, от меньшей к большей."""
+        if not self.image_variants:
+            return {}
+        variants = json.loads(self.image_variants)
+        return {
+            int(width): variants[width]
+            for width in sorted(variants, key=int)
+        }
+
     def __str__(self):
         OUTPUT = ('Текст: {text} | автор: {author} | сообщество: {group} | '
                   'дата публикации: {pub_date:%d.%m.%Y %H:%M}')
@@ -94,6 +140,16 @@ class Comment(models.Model):
 
     class Meta:
         ordering = ["created"]
+        indexes = [
+            models.Index(
+                fields=["post", "created"],
+                name="comment_post_created_idx",
+            ),
+            models.Index(
+                fields=["-created", "-id"],
+                name="comment_created_idx",
+            ),
+        ]
         verbose_name = "комментарий"
         verbose_name_plural = "комментарии"
 
@@ -116,6 +172,11 @@ class Follow(models.Model):
         verbose_name="автор",
         related_name="following",
     )
+    pull = models.BooleanField(
+        verbose_name="читать ленту автора напрямую",
+        default=False,
+        help_text="у автора слишком много подписчиков для рассылки записей",
+    )
 
     class Meta:
         verbose_name = "подписка"
@@ -125,8 +186,94 @@ class Follow(models.Model):
                 fields=['author', 'user'], name='unique_follower'
             )
         ]
+        indexes = [
+            models.Index(
+                fields=["user", "author"],
+                name="follow_user_author_idx",
+            ),
+        ]
 
     def __str__(self):
         OUTPUT = 'Пользователь: {user} | автор: {author}'
         return OUTPUT.format(user=self.user.username,
                              author=self.author.username)
+
+
+class UserCounters(models.Model):
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        verbose_name="пользователь",
+        related_name="counters",
+    )
+    posts_count = models.PositiveIntegerField(
+        verbose_name="число записей",
+        default=0,
+    )
+    followers_count = models.PositiveIntegerField(
+        verbose_name="число подписчиков",
+        default=0,
+    )
+    following_count = models.PositiveIntegerField(
+        verbose_name="число подписок",
+        default=0,
+    )
+
+    class Meta:
+        verbose_name = "счётчики пользователя"
+        verbose_name_plural = "счётчики пользователей"
+
+    def __str__(self):
+        OUTPUT = ('Пользователь: {user} | записей: {posts} | '
+                  'подписчиков: {followers} | подписок: {following}')
+        return OUTPUT.format(user=self.user_id, posts=self.posts_count,
+                             followers=self.followers_count,
+                             following=self.following_count)
+
+
+class TimelineEntry(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name="подписчик",
+        related_name="timeline",
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        verbose_name="запись",
+        related_name="timeline_entries",
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name="автор",
+        related_name="+",
+    )
+    pub_date = models.DateTimeField(
+        verbose_name="дата публикации",
+    )
+
+    class Meta:
+        verbose_name = "запись ленты подписок"
+        verbose_name_plural = "записи ленты подписок"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "post"], name="unique_timeline_entry"
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=["user", "-pub_date", "-post"],
+                name="timeline_user_pub_date_idx",
+            ),
+            models.Index(
+                fields=["user", "author"],
+                name="timeline_user_author_idx",
+            ),
+        ]
+
+    def __str__(self):
+        OUTPUT = 'Подписчик: {user} | запись: {post}'
+        return OUTPUT.format(user=self.user_id, post=self.post_id)
@@ -0,0 +1,220 @@
+import base64
+import binascii
+
+from django.conf import settings
+from django.core.paginator import Page, Paginator
+from django.db import connections
+from django.db.models import Max, Q
+from django.utils.functional import cached_property
+from django.utils.dateparse import parse_datetime
+
+NEXT = 'n'
+PREVIOUS = 'p'
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(direction, post, keys=('pub_date', 'id')):
+    date_key, id_key = keys
+    value = (
+        f'{direction}|{getattr(post, date_key).isoformat()}'
+        f'|{getattr(post, id_key)}'
+    )
+    return base64.urlsafe_b64encode(value.encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        value = base64.urlsafe_b64decode(cursor.encode()).decode()
+        direction, pub_date, post_id = value.split('|')
+        pub_date = parse_datetime(pub_date)
+        post_id = int(post_id)
+    except (binascii.Error, UnicodeError, ValueError):
+        raise InvalidCursor(cursor)
+    if direction not in (NEXT, PREVIOUS) or pub_date is None:
+        raise InvalidCursor(cursor)
+    return direction, pub_date, post_id
+
+
+class CursorPage(Page):
+    def __init__(self, object_list, paginator, cursor=None,
+                 next_cursor=None, previous_cursor=None):
+        super().__init__(object_list, None, paginator)
+        self.cursor = cursor
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return f'<Page {self.cursor or "first"}>'
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+
+def seek(queryset, direction, pub_date=None, post_id=None,
+         keys=('pub_date', 'id')):
+    """
+    Фильтр и порядок для страницы после (NEXT) или до (PREVIOUS)
+    позиции (pub_date, post_id).
+    """
+    date_key, id_key = keys
+    if direction == NEXT:
+        lookup, ordering = 'lt', (f'-{date_key}', f'-{id_key}')
+    else:
+        lookup, ordering = 'gt', (date_key, id_key)
+    if pub_date is not None:
+        # Условие {date_key}__lte/gte избыточно, но только его SQLite
+        # может использовать как диапазон индекса: без него OR
+        # проверяется для каждой строки от начала ленты.
+        queryset = queryset.filter(
+            Q(**{f'{date_key}__{lookup}e': pub_date}),
+            Q(**{f'{date_key}__{lookup}': pub_date})
+            | Q(**{date_key: pub_date, f'{id_key}__{lookup}': post_id}),
+        )
+    return queryset.order_by(*ordering)
+
+
+class CursorPaginator(Paginator):
+    """
+    Постраничная навигация по ключу (pub_date, id): без COUNT(*) и OFFSET,
+    поэтому любая страница стоит столько же, сколько первая.
+    """
+    keys = ('pub_date', 'id')
+    # Следующая страница — более старые записи
+    descending = True
+
+    def get_queryset(self, cursor=None):
+        """Запрос одной страницы: на одну запись больше размера страницы."""
+        direction, pub_date, post_id = self.position(cursor)
+        if not self.descending:
+            direction = PREVIOUS if direction == NEXT else NEXT
+        return seek(
+            self.object_list, direction, pub_date, post_id, keys=self.keys
+        )[:self.per_page + 1]
+
+    def position(self, cursor):
+        if cursor is None:
+            return NEXT, None, None
+        return decode_cursor(cursor)
+
+    def get_posts(self, cursor):
+        return list(self.get_queryset(cursor))
+
+    def page(self, cursor=None):
+        direction = self.position(cursor)[0]
+        posts = self.get_posts(cursor)
+        has_more = len(posts) > self.per_page
+        posts = posts[:self.per_page]
+        if direction == PREVIOUS:
+            if not posts:
+                return self.page()
+            posts.reverse()
+        if direction == NEXT:
+            has_next, has_previous = has_more, cursor is not None
+        else:
+            has_next, has_previous = True, has_more
+        return CursorPage(
+            posts,
+            self,
+            cursor=cursor,
+            next_cursor=(
+                encode_cursor(NEXT, posts[-1], self.keys)
+                if posts and has_next else None
+            ),
+            previous_cursor=(
+                encode_cursor(PREVIOUS, posts[0], self.keys)
+                if posts and has_previous else None
+            ),
+        )
+
+    def get_page(self, cursor=None):
+        try:
+            return self.page(cursor)
+        except InvalidCursor:
+            return self.page()
+
+
+class CommentPaginator(CursorPaginator):
+    """Комментарии по ключу (created, id) от старых к новым."""
+    keys = ('created', 'id')
+    descending = False
+
+
+def paginate(request, post_list, paginator_class=CursorPaginator,
+             numbered_class=Paginator, **kwargs):
+    """
+    Возвращает страницу ленты. `?cursor=` всегда включает навигацию
+    по ключу (paginator_class), `?page=N` — нумерованную
+    (numbered_class); без параметров режим выбирается настройкой
+    FEED_PAGINATION. kwargs получают оба пагинатора.
+    """
+    cursor = request.GET.get('cursor')
+    page_number = request.GET.get('page')
+    if cursor is not None or (
+        page_number is None and settings.FEED_PAGINATION == 'cursor'
+    ):
+        paginator = paginator_class(
+            post_list, settings.POSTS_PER_PAGE, **kwargs
+        )
+        return paginator.get_page(cursor)
+    paginator = numbered_class(post_list, settings.POSTS_PER_PAGE, **kwargs)
+    return paginator.get_page(page_number)
+
+
+def estimate_count(model, using='default'):
+    """
+    Приблизительное число строк таблицы без COUNT(*): статистика
+    PostgreSQL или наибольший id в SQLite (дырки от удалённых строк
+    завышают оценку). None, если база оценок не даёт.
+    """
+    vendor = connections[using].vendor
+    if vendor == 'postgresql':
+        with connections[using].cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples FROM pg_class WHERE oid = %s::regclass',
+                [model._meta.db_table],
+            )
+            row = cursor.fetchone()
+        return int(row[0]) if row and row[0] >= 0 else None
+    if vendor == 'sqlite':
+        return model._default_manager.using(using).aggregate(
+            count=Max('pk')
+        )['count'] or 0
+    return None
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Нумерованные страницы админки для больших таблиц: число строк всей
+    таблицы берётся из оценки, если она не меньше
+    ADMIN_EXACT_COUNT_LIMIT; с фильтром или поиском считается точно.
+    Дальние страницы сначала пропускают OFFSET строк по одному индексу
+    (только id), а затем читают строки страницы с JOIN.
+    """
+
+    def page(self, number):
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        if not bottom:
+            return super().page(number)
+        top = bottom + self.per_page
+        if top + self.orphans >= self.count:
+            top = self.count
+        queryset = self.object_list
+        ids = list(queryset.values_list('pk', flat=True)[bottom:top])
+        return self._get_page(queryset.filter(pk__in=ids), number, self)
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimate_count(queryset.model, queryset.db)
+            if (estimate is not None
+                    and estimate >= settings.ADMIN_EXACT_COUNT_LIMIT):
+                return estimate
+        return super().count
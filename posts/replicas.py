@@ -0,0 +1,114 @@
+"""
+Чтение лент с реплик базы.
+
+ReplicaMiddleware отправляет чтения безопасных запросов к представлениям
+из REPLICA_VIEWS на случайную реплику из REPLICA_DATABASES, всё остальное
+(формы, подписки, админка, команды) читает и пишет в основную базу.
+Реплика отстаёт от основной базы, поэтому:
+
+* после записи в том же запросе чтения возвращаются в основную базу,
+  а ответ ставит cookie REPLICA_PIN_COOKIE на REPLICA_LAG_SECONDS
+  секунд — следующие страницы автор записи читает из основной базы;
+* страница, области которой (posts/feed_cache.py) менялись последние
+  REPLICA_LAG_SECONDS секунд, тоже читается из основной базы: иначе
+  устаревшая отрисовка попала бы в кэш под новой версией.
+
+Сессии и кэш в базе всегда в основной базе: в REPLICA_APPS их нет.
+"""
+import random
+from contextvars import ContextVar
+from datetime import datetime, timedelta, timezone
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+from .conditional import validators
+from .metrics import view_name
+
+_routing = ContextVar('yatube_db_routing', default=None)
+
+
+class Routing:
+    """Состояние маршрутизации одного запроса."""
+
+    def __init__(self):
+        self.replica = None
+        self.wrote = False
+
+
+def is_replicated(model):
+    return model._meta.app_label in settings.REPLICA_APPS
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        routing = _routing.get()
+        if (
+            routing is None
+            or routing.replica is None
+            or routing.wrote
+            or not is_replicated(model)
+        ):
+            return None
+        return routing.replica
+
+    def db_for_write(self, model, **hints):
+        routing = _routing.get()
+        if routing is not None and is_replicated(model):
+            routing.wrote = True
+        # Объект, прочитанный с реплики, сохраняется в основную базу
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        aliases = {DEFAULT_DB_ALIAS, *settings.REPLICA_DATABASES}
+        if {obj1._state.db, obj2._state.db} <= aliases:
+            return True
+        return None
+
+
+class ReplicaMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.REPLICA_DATABASES:
+            return self.get_response(request)
+        routing = Routing()
+        token = _routing.set(routing)
+        try:
+            response = self.get_response(request)
+        finally:
+            _routing.reset(token)
+        if routing.wrote:
+            response.set_cookie(
+                settings.REPLICA_PIN_COOKIE, '1',
+                max_age=settings.REPLICA_LAG_SECONDS,
+                httponly=True, samesite='Lax',
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        routing = _routing.get()
+        if routing is not None and self.can_use_replica(
+            request, view_func, view_args, view_kwargs
+        ):
+            routing.replica = random.choice(settings.REPLICA_DATABASES)
+
+    def can_use_replica(self, request, view_func, view_args, view_kwargs):
+        if (
+            request.method not in ('GET', 'HEAD')
+            or settings.REPLICA_PIN_COOKIE in request.COOKIES
+            or view_name(request) not in settings.REPLICA_VIEWS
+        ):
+            return False
+        scopes_func = getattr(view_func, 'page_scopes', None)
+        if scopes_func is None:
+            return True
+        # Те же версии, что у ETag и Last-Modified: вычисляются один раз
+        last_modified = validators(
+            request, scopes_func, *view_args, **view_kwargs
+        )[1]
+        if last_modified is None:
+            return True
+        lag = timedelta(seconds=settings.REPLICA_LAG_SECONDS)
+        return datetime.now(timezone.utc) - last_modified >= lag
@@ -0,0 +1,198 @@
+"""
+Поиск записей по тексту, названию сообщества и имени автора.
+
+Движок задаётся настройкой SEARCH_BACKEND. SQLiteFTSBackend ищет по
+индексу FTS5 (posts_post_fts, миграция 0027) и упорядочивает результаты
+по bm25; LikeBackend — запасной вариант для других баз, он просматривает
+таблицу через LIKE и упорядочивает по дате.
+
+bm25 зависит от всей таблицы и меняется с каждой новой записью, поэтому
+страницы листаются не по рангу, а по снимку: первая страница запоминает
+в кэше упорядоченные id найденных записей (не больше SEARCH_RESULTS_LIMIT),
+а ключ следующей страницы — наибольший id на момент поиска и смещение
+в снимке. Если снимок вытеснен из кэша, поиск повторяется только среди
+записей с id не больше запомненного.
+"""
+import base64
+import binascii
+import hashlib
+import re
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+
+from .models import Post
+from .paginators import InvalidCursor
+
+# Вес текста записи, названия сообщества и имени автора в bm25
+WEIGHTS = (1.0, 0.5, 0.5)
+
+
+class InvalidSearchCursor(InvalidCursor):
+    pass
+
+
+def terms(query):
+    return re.findall(r'\w+', query.lower())
+
+
+def encode_cursor(upto, offset):
+    value = f'{upto}|{offset}'
+    return base64.urlsafe_b64encode(value.encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        upto, offset = map(int, base64.urlsafe_b64decode(
+            cursor.encode()
+        ).decode().split('|'))
+    except (binascii.Error, UnicodeError, ValueError):
+        raise InvalidSearchCursor(cursor)
+    if upto < 0 or offset < 0:
+        raise InvalidSearchCursor(cursor)
+    return upto, offset
+
+
+class SearchPage(list):
+    """Записи страницы поиска и ключ следующей страницы."""
+
+    previous_cursor = None
+
+    def __init__(self, posts, next_cursor=None):
+        super().__init__(posts)
+        self.next_cursor = next_cursor
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+
+class SearchBackend:
+    def filter(self, queryset, terms):
+        """Записи queryset, подходящие под все слова, без упорядочивания."""
+        raise NotImplementedError
+
+    def ranked_ids(self, terms, limit, upto=None):
+        """id подходящих записей (с id не больше upto) от лучших."""
+        raise NotImplementedError
+
+    def snapshot_key(self, terms, upto):
+        words = hashlib.md5(' '.join(terms).encode()).hexdigest()
+        return f'search:{type(self).__name__}:{words}:{upto}'
+
+    def snapshot(self, terms, upto=None):
+        """(upto, id найденных записей) — снимок результатов поиска."""
+        limit = settings.SEARCH_RESULTS_LIMIT
+        if upto is None:
+            ids = self.ranked_ids(terms, limit)
+            # Записи, добавленные после поиска, получат id больше этого
+            upto = max(ids, default=0)
+        else:
+            ids = cache.get(self.snapshot_key(terms, upto))
+            if ids is not None:
+                return upto, ids
+            ids = self.ranked_ids(terms, limit, upto)
+        cache.set(
+            self.snapshot_key(terms, upto), ids,
+            settings.SEARCH_SNAPSHOT_TIMEOUT,
+        )
+        return upto, ids
+
+    def search(self, query, cursor=None, limit=None):
+        limit = limit or settings.POSTS_PER_PAGE
+        upto, offset = decode_cursor(cursor) if cursor else (None, 0)
+        words = terms(query)
+        if not words:
+            return SearchPage([])
+        upto, ids = self.snapshot(words, upto)
+        page_ids = ids[offset:offset + limit]
+        has_next = len(ids) > offset + limit
+        posts = Post.objects.feed().filter(
+            id__in=page_ids
+        ).order_by().in_bulk()
+        # Удалённые после поиска записи пропускаются
+        return SearchPage(
+            [posts[post_id] for post_id in page_ids if post_id in posts],
+            encode_cursor(upto, offset + limit) if has_next else None,
+        )
+
+
+class SQLiteFTSBackend(SearchBackend):
+    def match(self, terms):
+        # Каждое слово — отдельная фраза в кавычках: пользовательский
+        # ввод не разбирается как синтаксис FTS5; последнее — префикс.
+        phrases = [f'"{term}"' for term in terms]
+        phrases[-1] += '*'
+        return ' '.join(phrases)
+
+    def filter(self, queryset, terms):
+        return queryset.filter(id__in=RawSQL(
+            'SELECT rowid FROM posts_post_fts WHERE posts_post_fts MATCH %s',
+            [self.match(terms)],
+        ))
+
+    def ranked_ids(self, terms, limit, upto=None):
+        rank = 'bm25(posts_post_fts, {}, {}, {})'.format(*WEIGHTS)
+        sql = (
+            'SELECT rowid FROM posts_post_fts '
+            'WHERE posts_post_fts MATCH %s'
+        )
+        params = [self.match(terms)]
+        if upto is not None:
+            sql += ' AND rowid <= %s'
+            params.append(upto)
+        sql += f' ORDER BY {rank}, rowid LIMIT %s'
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params + [limit])
+            return [post_id for post_id, in cursor.fetchall()]
+
+
+class LikeBackend(SearchBackend):
+    """Поиск подстрок через LIKE без индекса; сначала новые записи."""
+
+    def filter(self, queryset, terms):
+        for term in terms:
+            queryset = queryset.filter(
+                Q(text__icontains=term)
+                | Q(group__title__icontains=term)
+                | Q(author__username__icontains=term)
+            )
+        return queryset
+
+    def ranked_ids(self, terms, limit, upto=None):
+        queryset = self.filter(Post.objects.all(), terms)
+        if upto is not None:
+            queryset = queryset.filter(id__lte=upto)
+        return list(queryset.order_by('-pub_date', '-id').values_list(
+            'id', flat=True
+        )[:limit])
+
+
+def get_backend():
+    return import_string(settings.SEARCH_BACKEND)()
+
+
+def search(query, cursor=None, limit=None):
+    return get_backend().search(query, cursor, limit)
+
+
+def filter_posts(queryset, query):
+    """Сужает queryset записей до найденных по запросу."""
+    words = terms(query)
+    if not words:
+        return queryset
+    return get_backend().filter(queryset, words)
+
+
+class SearchPaginator:
+    """Поиск с интерфейсом CursorPaginator.page() для JSON API."""
+
+    def __init__(self, query, per_page):
+        self.query = query
+        self.per_page = per_page
+
+    def page(self, cursor=None):
+        return search(self.query, cursor, self.per_page)
@@ -0,0 +1,280 @@
+"""
+Синтетический набор данных в объёмах боевого сервера.
+
+Популярность пользователей распределена по закону Ципфа, и от неё
+зависят и число записей автора, и число его подписчиков; слова текстов
+тоже по Ципфу, число комментариев к записи — по Парето. Даты записей
+равномерно заполняют последние `days` дней.
+
+Строки строятся пачками (при workers > 1 — в дочерних процессах) и
+сохраняются через bulk_create по пачке в транзакции. bulk_create
+не вызывает сигналы, поэтому, как и после import_yatube, счётчики и
+ленты подписок восстанавливаются один раз в конце (rebuild).
+"""
+import itertools
+import random
+from contextlib import nullcontext
+from datetime import timedelta
+from multiprocessing import Lock, Pool
+
+from django.contrib.auth.hashers import make_password
+from django.db import connection, connections, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from . import counters, feed_cache, timeline
+from .imports import bulk_insert
+from .models import Comment, Follow, Group, Post, User
+
+SYLLABLES = ['ка', 'ло', 'ми', 'не', 'ру', 'са', 'то', 'ви', 'зо', 'пе']
+WORDS = [
+    a + b + c
+    for a in SYLLABLES for b in SYLLABLES for c in SYLLABLES
+]
+# Показатель закона Ципфа для популярности пользователей и слов
+ZIPF = 1.0
+# Показатель Парето для числа комментариев: чем меньше, тем длиннее хвост
+PARETO = 2.0
+# Записей без сообщества
+UNGROUPED = 0.3
+# Строк в одном задании и в одной транзакции
+CHUNK = 2000
+
+
+def zipf_weights(count, exponent=ZIPF):
+    """Накопленные веса рангов 1..count для random.choices."""
+    return list(itertools.accumulate(
+        1 / rank ** exponent for rank in range(1, count + 1)
+    ))
+
+
+WORD_WEIGHTS = zipf_weights(len(WORDS))
+
+
+def chunks(start, stop, size=CHUNK):
+    """(начало, число) отрезков [start, stop)."""
+    for first in range(start, stop, size):
+        yield first, min(size, stop - first)
+
+
+def max_id(model):
+    return model.objects.aggregate(last=Max('id'))['last'] or 0
+
+
+class Seeder:
+    def __init__(self, users=1000, groups=50, posts=100000,
+                 follows_per_user=20, comments_per_post=3, days=365,
+                 password=None, workers=1, random_seed=0):
+        self.counts = {'users': users, 'groups': groups, 'posts': posts}
+        self.follows_per_user = min(follows_per_user, max(users - 1, 0))
+        self.comments_per_post = comments_per_post
+        self.days = days
+        self.password = password
+        self.workers = workers
+        self.random_seed = random_seed
+        self.user_ids = []
+        self.user_weights = []
+        self.group_ids = []
+        self.group_weights = []
+        self.end = timezone.now()
+
+    def rng(self, *key):
+        # Свой генератор у каждого отрезка: набор не зависит от workers
+        return random.Random(':'.join(map(str, (self.random_seed,) + key)))
+
+    def text(self, rng, low, high):
+        return ' '.join(rng.choices(
+            WORDS, cum_weights=WORD_WEIGHTS, k=rng.randint(low, high)
+        )).capitalize()
+
+    def popular_user(self, rng, k=1):
+        return rng.choices(self.user_ids, cum_weights=self.user_weights, k=k)
+
+    # Строки отрезков; строятся и сохраняются и в дочерних процессах
+
+    def post_rows(self, first, count):
+        rng = self.rng('posts', first)
+        total = self.counts['posts']
+        span = timedelta(days=self.days)
+        start = self.end - span
+        authors = self.popular_user(rng, count)
+        rows = []
+        for number, author_id in zip(range(first, first + count), authors):
+            group_id = None
+            if self.group_ids and rng.random() >= UNGROUPED:
+                group_id = rng.choices(
+                    self.group_ids, cum_weights=self.group_weights
+                )[0]
+            rows.append(Post(
+                text=self.text(rng, 5, 60),
+                pub_date=start + span * (number / total),
+                author_id=author_id,
+                group_id=group_id,
+            ))
+        return rows
+
+    def follow_rows(self, first, count):
+        rng = self.rng('follows', first)
+        rows = []
+        for user_id in self.user_ids[first:first + count]:
+            authors = set()
+            while len(authors) < self.follows_per_user:
+                authors.update(self.popular_user(
+                    rng, self.follows_per_user - len(authors)
+                ))
+                authors.discard(user_id)
+            rows.extend(
+                Follow(user_id=user_id, author_id=author_id)
+                for author_id in authors
+            )
+        return rows
+
+    def comment_rows(self, posts):
+        rng = self.rng('comments', posts[0][0])
+        # Среднее Парето с x_min = 1 — PARETO / (PARETO - 1)
+        scale = self.comments_per_post * (PARETO - 1) / PARETO
+        rows = []
+        for post_id, pub_date in posts:
+            count = int(scale * rng.paretovariate(PARETO) + 0.5)
+            for author_id in self.popular_user(rng, count):
+                created = pub_date + timedelta(
+                    seconds=rng.expovariate(1 / 3600)
+                )
+                rows.append(Comment(
+                    post_id=post_id,
+                    text=self.text(rng, 1, 20),
+                    created=min(created, self.end),
+                    author_id=author_id,
+                ))
+        return rows
+
+    def save(self, method, jobs):
+        """
+        Строит и сохраняет строки заданий; возвращает их число. Дочерние
+        процессы пишут в базу своими соединениями. SQLite пускает одного
+        писателя, а параллельные отложенные транзакции получают
+        «database is locked», поэтому вставки на SQLite идут по очереди
+        под общим замком, а строки строятся параллельно.
+        """
+        if self.workers <= 1:
+            set_seeder(self)
+            return sum(run((method, job)) for job in jobs)
+        lock = Lock() if connection.vendor == 'sqlite' else None
+        # Открытое соединение нельзя наследовать при fork
+        connections.close_all()
+        with Pool(
+            self.workers, initializer=set_seeder, initargs=(self, lock)
+        ) as pool:
+            return sum(pool.imap_unordered(
+                run, ((method, job) for job in jobs)
+            ))
+
+    # Таблицы по порядку
+
+    def users(self):
+        first = max_id(User)
+        password = make_password(self.password)
+        for start, count in chunks(first, first + self.counts['users']):
+            with transaction.atomic():
+                User.objects.bulk_create(
+                    # Имена user<N> не совпадают с RESERVED_USERNAMES
+                    # (users/validators.py)
+                    User(username=f'user{number}', password=password)
+                    for number in range(start, start + count)
+                )
+        self.user_ids = list(User.objects.filter(
+            id__gt=first
+        ).values_list('id', flat=True))
+        # Ранг популярности не совпадает с порядком id
+        self.rng('users').shuffle(self.user_ids)
+        self.user_weights = zipf_weights(len(self.user_ids))
+        return len(self.user_ids)
+
+    def groups(self):
+        first = max_id(Group)
+        Group.objects.bulk_create(
+            Group(
+                title=f'Сообщество {number}', slug=f'group-{number}',
+                description=self.text(self.rng('groups', number), 5, 30),
+            )
+            for number in range(first, first + self.counts['groups'])
+        )
+        self.group_ids = list(Group.objects.filter(
+            id__gt=first
+        ).values_list('id', flat=True))
+        self.group_weights = zipf_weights(len(self.group_ids))
+        return len(self.group_ids)
+
+    def posts(self):
+        self.first_post = max_id(Post)
+        return self.save('post_rows', chunks(0, self.counts['posts']))
+
+    def follows(self):
+        return self.save(
+            'follow_rows', chunks(
+                0, len(self.user_ids),
+                max(CHUNK // max(self.follows_per_user, 1), 1),
+            )
+        )
+
+    def comments(self):
+        if not self.comments_per_post:
+            return 0
+
+        def jobs():
+            # Записи этого запуска читаются отрезками id, а не списком
+            last = max_id(Post)
+            size = max(int(CHUNK / self.comments_per_post), 1)
+            for first, count in chunks(self.first_post, last, size):
+                posts = list(Post.objects.filter(
+                    id__gt=first, id__lte=first + count
+                ).values_list('id', 'pub_date'))
+                if posts:
+                    yield (posts,)
+
+        return self.save('comment_rows', jobs())
+
+    def rebuild(self):
+        """Счётчики, ленты подписок и версии кэша лент после загрузки."""
+        counters.recount()
+        timeline.rebuild()
+        # Новые записи есть только в общей ленте и в лентах новых
+        # пользователей и сообществ; остальной кэш (миниатюры, сессии,
+        # страницы других областей) не трогается
+        feed_cache.bump(
+            feed_cache.INDEX,
+            *map(feed_cache.group_scope, self.group_ids),
+            *map(feed_cache.author_scope, self.user_ids),
+            *map(feed_cache.follow_scope, self.user_ids),
+        )
+
+
+_seeder = None
+_lock = None
+
+
+def set_seeder(seeder, lock=None):
+    global _seeder, _lock
+    _seeder = seeder
+    _lock = lock
+
+
+def run(job):
+    method, args = job
+    rows = getattr(_seeder, method)(*args)
+    if rows:
+        with _lock or nullcontext(), transaction.atomic():
+            bulk_insert(type(rows[0]), rows)
+    return len(rows)
+
+
+def seed(rebuild=True, **options):
+    """Заполняет базу целиком; возвращает {таблица: строк}."""
+    seeder = Seeder(**options)
+    counts = {
+        table: getattr(seeder, table)()
+        for table in ('users', 'groups', 'posts', 'follows', 'comments')
+    }
+    if rebuild:
+        seeder.rebuild()
+    return counts
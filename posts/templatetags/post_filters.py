@@ -0,0 +1,42 @@
+from django import template
+from django.conf import settings
+
+from posts import thumbnails
+
+register = template.Library()
+
+
+@register.filter
+def nearby_pages(page):
+    delta = settings.PAGINATOR_NEARBY_PAGES
+    first = max(page.number - delta, 1)
+    last = min(page.number + delta, page.paginator.num_pages)
+    return range(first, last + 1)
+
+
+@register.simple_tag
+def attach_thumbnails(page):
+    """Адреса изображений всей страницы ленты одним обращением."""
+    thumbnails.attach(page)
+    return ''
+
+
+@register.filter
+def feed_image_url(post):
+    """
+    Адрес изображения записи в ленте; без {% attach_thumbnails %}
+    определяется для каждой записи отдельно.
+    """
+    if not post.image:
+        return ''
+    if not hasattr(post, 'thumbnail_url'):
+        thumbnails.attach([post])
+    return post.thumbnail_url
+
+
+@register.filter
+def feed_image_srcset(post):
+    return ', '.join(
+        f'{url} {width}w'
+        for width, url in post.get_image_variants().items()
+    )
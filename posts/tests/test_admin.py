@@ -0,0 +1,108 @@
+import datetime as dt
+
+from django.core.paginator import Paginator
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from posts.admin import IndexedDatesQuerySet
+from posts.models import Comment, Follow, Group, Post, User
+from posts.paginators import EstimatedCountPaginator
+
+POSTS_URL = reverse('admin:posts_post_changelist')
+COMMENTS_URL = reverse('admin:posts_comment_changelist')
+FOLLOWS_URL = reverse('admin:posts_follow_changelist')
+
+
+class AdminChangelistTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password'
+        )
+        cls.author = User.objects.create_user('author')
+        cls.group = Group.objects.create(title='Сообщество', slug='group')
+        for year in (2017, 2019, 2020):
+            post = Post.objects.create(
+                text=f'Запись {year}', author=cls.author, group=cls.group
+            )
+            # В UTC это ещё предыдущий год
+            Post.objects.filter(id=post.id).update(
+                pub_date=timezone.make_aware(dt.datetime(year, 1, 1, 0, 30))
+            )
+            Comment.objects.create(text='Ответ', author=cls.admin, post=post)
+        Follow.objects.create(user=cls.admin, author=cls.author)
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.admin)
+
+    def add_rows(self):
+        user = User.objects.create_user(f'user{User.objects.count()}')
+        post = Post.objects.create(text='Ещё', author=user)
+        # Навигация по датам делает по запросу на год с записями
+        Post.objects.filter(id=post.id).update(
+            pub_date=timezone.make_aware(dt.datetime(2020, 6, 1))
+        )
+        Comment.objects.create(text='Ещё', author=user, post=post)
+        Follow.objects.create(user=user, author=self.author)
+
+    def test_queries_do_not_depend_on_rows(self):
+        """Число запросов списка не зависит от числа строк"""
+        for url in (POSTS_URL, COMMENTS_URL, FOLLOWS_URL):
+            counts = []
+            for _ in range(2):
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                counts.append(len(queries))
+                self.add_rows()
+            with self.subTest(url=url):
+                self.assertEqual(counts[0], counts[1])
+
+    def test_date_hierarchy(self):
+        """Годы и месяцы навигации — в часовом поясе сайта"""
+        queryset = IndexedDatesQuerySet(Post)
+        self.assertEqual(
+            [date.year for date in queryset.dates('pub_date', 'year')],
+            [2017, 2019, 2020],
+        )
+        self.assertEqual(
+            queryset.filter(pub_date__year=2019).dates(
+                'pub_date', 'month', order='DESC'
+            ),
+            [dt.date(2019, 1, 1)],
+        )
+        response = self.client.get(POSTS_URL, {'pub_date__year': 2019})
+        self.assertEqual(len(response.context['cl'].result_list), 1)
+
+    def test_search(self):
+        """Поиск записей по индексу и комментариев по имени автора"""
+        response = self.client.get(POSTS_URL, {'q': '2019'})
+        self.assertEqual(
+            [post.text for post in response.context['cl'].result_list],
+            ['Запись 2019'],
+        )
+        response = self.client.get(COMMENTS_URL, {'q': 'admin'})
+        self.assertEqual(len(response.context['cl'].result_list), 3)
+        response = self.client.get(COMMENTS_URL, {'q': 'adm'})
+        self.assertEqual(len(response.context['cl'].result_list), 0)
+
+    @override_settings(ADMIN_EXACT_COUNT_LIMIT=1)
+    def test_estimated_count(self):
+        """Число строк всей таблицы оценивается, страницы совпадают"""
+        Post.objects.filter(text='Запись 2017').delete()
+        queryset = Post.objects.order_by('-pub_date', '-id')
+        paginator = EstimatedCountPaginator(queryset, 1)
+        self.assertEqual(paginator.count, 3)
+        filtered = queryset.filter(group=self.group)
+        self.assertEqual(EstimatedCountPaginator(filtered, 1).count, 2)
+        for number in (1, 2):
+            with self.subTest(page=number):
+                self.assertEqual(
+                    list(paginator.page(number)),
+                    list(Paginator(queryset, 1).page(number)),
+                )
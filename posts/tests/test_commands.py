@@ -0,0 +1,288 @@
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db.models import F, Sum
+from django.test import TestCase
+
+from posts import feed_cache, seeding
+from posts.imports import Importer
+from posts.management.commands.explain_feeds import plan_problems
+from posts.models import (Comment, Follow, Group, Post, TimelineEntry, User,
+                          UserCounters)
+
+
+class ExplainFeedsCommandTest(TestCase):
+    def test_feed_plans_use_indexes(self):
+        """Запросы лент используют индексы и не сортируют во временных
+        B-деревьях"""
+        call_command('explain_feeds', stdout=StringIO())
+
+    def test_plan_problems(self):
+        """Полный просмотр таблицы и временная сортировка — ошибки плана"""
+        plans = [
+            [['SCAN posts_post'], 1],
+            [['SCAN posts_post USING INDEX post_pub_date_idx'], 0],
+            [['SEARCH posts_post USING INDEX post_author_pub_date_idx '
+              '(author_id=?)', 'USE TEMP B-TREE FOR ORDER BY'], 1],
+        ]
+        for plan, problems in plans:
+            with self.subTest(plan=plan):
+                self.assertEqual(len(plan_problems(plan)), problems)
+
+    def test_unknown_feed(self):
+        """Неизвестная лента — ошибка команды"""
+        with self.assertRaises(CommandError):
+            call_command('explain_feeds', 'unknown')
+
+
+class RecountCommandTest(TestCase):
+    def test_recount_repairs_drift(self):
+        """recount исправляет разошедшиеся счётчики"""
+        author = User.objects.create_user('author')
+        post = Post.objects.create(text='Тестовая публикация', author=author)
+        Comment.objects.create(text='Комментарий', author=author, post=post)
+        UserCounters.objects.filter(user=author).update(posts_count=5)
+        Post.objects.filter(pk=post.pk).update(comments_count=0)
+        out = StringIO()
+        call_command('recount', stdout=out)
+        self.assertIn('2', out.getvalue())
+        self.assertEqual(
+            UserCounters.objects.get(user=author).posts_count, 1
+        )
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+
+
+class ExportCommandTest(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user('author')
+        self.post = Post.objects.create(text='Запись 1', author=self.author)
+        Comment.objects.create(
+            text='Комментарий', author=self.author, post=self.post
+        )
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.output = directory.name
+
+    def read(self, name):
+        with open(os.path.join(self.output, name), encoding='utf-8') as file:
+            return file.read().splitlines()
+
+    def test_incremental_jsonl_export(self):
+        """С отметкой повторная выгрузка содержит только новые строки"""
+        watermark = os.path.join(self.output, 'watermark.json')
+        options = {
+            'output': self.output, 'watermark': watermark,
+            'stdout': StringIO(),
+        }
+        call_command('export_yatube', 'posts', 'comments', **options)
+        [line] = self.read('posts.jsonl')
+        self.assertEqual(json.loads(line), {
+            'id': self.post.id,
+            'text': 'Запись 1',
+            'pub_date': self.post.pub_date.isoformat(),
+            'author': 'author',
+            'group': None,
+            'image': '',
+        })
+        post = Post.objects.create(text='Запись 2', author=self.author)
+        call_command('export_yatube', 'posts', 'comments', **options)
+        self.assertEqual(
+            [json.loads(line)['id'] for line in self.read('posts.jsonl')],
+            [post.id],
+        )
+        self.assertEqual(self.read('comments.jsonl'), [])
+
+    def test_csv_export(self):
+        """CSV начинается с заголовка"""
+        call_command(
+            'export_yatube', 'follows', 'comments', format='csv',
+            output=self.output, stdout=StringIO(),
+        )
+        self.assertEqual(self.read('follows.csv'), ['id,user,author'])
+        self.assertEqual(
+            self.read('comments.csv')[0], 'id,post,text,created,author'
+        )
+
+
+class RebuildTimelinesCommandTest(TestCase):
+    def test_rebuild_fills_missing_timelines(self):
+        """rebuild_timelines заполняет ленты подписок без записей"""
+        author = User.objects.create_user('author')
+        reader = User.objects.create_user('reader')
+        post = Post.objects.create(text='Запись', author=author)
+        Follow.objects.bulk_create([Follow(user=reader, author=author)])
+        out = StringIO()
+        call_command('rebuild_timelines', stdout=out)
+        self.assertIn('1', out.getvalue())
+        self.assertEqual(
+            list(TimelineEntry.objects.values_list('user', 'post')),
+            [(reader.id, post.id)],
+        )
+
+
+class ImportCommandTest(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.output = directory.name
+
+    def test_export_import_round_trip(self):
+        """Выгрузка загружается обратно вместе со счётчиками и лентами"""
+        author = User.objects.create_user('author')
+        reader = User.objects.create_user('reader')
+        group = Group.objects.create(
+            title='Сообщество', slug='group', description='Описание'
+        )
+        Follow.objects.create(user=reader, author=author)
+        posts = [
+            Post.objects.create(text=f'Запись {i}', author=author, group=group)
+            for i in range(3)
+        ]
+        Comment.objects.create(
+            text='Комментарий', author=reader, post=posts[0]
+        )
+        call_command('export_yatube', output=self.output, stdout=StringIO())
+        expected = list(Post.objects.values_list(
+            'id', 'text', 'pub_date', 'author__username', 'group__slug'
+        ))
+        Group.objects.all().delete()
+        User.objects.all().delete()
+        stdout = StringIO()
+        call_command(
+            'import_yatube',
+            *(os.path.join(self.output, f'{table}.jsonl') for table in (
+                'follows', 'comments', 'posts', 'groups'
+            )),
+            batch_size=2, stdout=stdout,
+        )
+        self.assertIn('posts: 3 строк', stdout.getvalue())
+        self.assertEqual(list(Post.objects.values_list(
+            'id', 'text', 'pub_date', 'author__username', 'group__slug'
+        )), expected)
+        author = User.objects.get(username='author')
+        reader = User.objects.get(username='reader')
+        self.assertEqual(
+            UserCounters.objects.values_list(
+                'posts_count', 'followers_count'
+            ).get(user=author),
+            (3, 1),
+        )
+        self.assertEqual(
+            Post.objects.get(id=posts[0].id).comments_count, 1
+        )
+        self.assertEqual(TimelineEntry.objects.filter(user=reader).count(), 3)
+
+    def test_import_twice_skips_loaded_rows(self):
+        """Повторная загрузка не дублирует записи и комментарии"""
+        author = User.objects.create_user('author')
+        post = Post.objects.create(text='Запись', author=author)
+        Comment.objects.create(text='Комментарий', author=author, post=post)
+        call_command('export_yatube', output=self.output, stdout=StringIO())
+        files = [
+            os.path.join(self.output, f'{table}.jsonl')
+            for table in ('posts', 'comments')
+        ]
+        for _ in range(2):
+            call_command('import_yatube', *files, stdout=StringIO())
+        self.assertEqual(Post.objects.count(), 1)
+        self.assertEqual(Comment.objects.count(), 1)
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+
+    def test_import_does_not_change_model_fields(self):
+        """Во время загрузки записи других потоков получают дату"""
+        author = User.objects.create_user('author')
+        path = os.path.join(self.output, 'posts.jsonl')
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(json.dumps({
+                'id': 100, 'text': 'Старая запись',
+                'pub_date': '2020-01-01T00:00:00+00:00', 'author': 'author',
+            }))
+        build_posts = Importer.build_posts
+
+        def create_meanwhile(importer, rows):
+            Post.objects.create(text='Новая запись', author=author)
+            return build_posts(importer, rows)
+
+        with mock.patch.object(Importer, 'build_posts', create_meanwhile):
+            call_command('import_yatube', path, stdout=StringIO())
+        self.assertEqual(
+            Post.objects.get(id=100).pub_date.year, 2020
+        )
+        self.assertGreater(
+            Post.objects.get(text='Новая запись').pub_date.year, 2020
+        )
+
+    def test_missing_group_fails(self):
+        """Запись с неизвестным сообществом — ошибка команды"""
+        path = os.path.join(self.output, 'posts.jsonl')
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(json.dumps({
+                'id': 1, 'text': 'Запись',
+                'pub_date': '2020-01-01T00:00:00+00:00',
+                'author': 'author', 'group': 'unknown',
+            }))
+        with self.assertRaises(CommandError):
+            call_command('import_yatube', path, stdout=StringIO())
+        self.assertFalse(Post.objects.exists())
+
+    def test_reserved_author_fails(self):
+        """Автор с именем, занятым адресом сайта, не создаётся"""
+        path = os.path.join(self.output, 'posts.jsonl')
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(json.dumps({
+                'id': 1, 'text': 'Запись',
+                'pub_date': '2020-01-01T00:00:00+00:00',
+                'author': 'search',
+            }))
+        with self.assertRaisesMessage(CommandError, 'search'):
+            call_command('import_yatube', path, stdout=StringIO())
+        self.assertFalse(User.objects.filter(username='search').exists())
+
+
+class SeedCommandTest(TestCase):
+    def test_seed_skewed_dataset(self):
+        """Набор нужного размера, популярные авторы, счётчики и ленты"""
+        stdout = StringIO()
+        call_command(
+            'seed_yatube', users=50, groups=3, posts=500,
+            follows_per_user=5, comments_per_post=2, stdout=stdout,
+        )
+        self.assertIn('posts: 500 строк', stdout.getvalue())
+        self.assertEqual(User.objects.count(), 50)
+        self.assertEqual(Follow.objects.count(), 250)
+        self.assertFalse(Follow.objects.filter(
+            user=F('author')
+        ).exists())
+        posts = sorted(UserCounters.objects.values_list(
+            'posts_count', flat=True
+        ))
+        self.assertGreater(posts[-1], 5 * posts[len(posts) // 2])
+        self.assertEqual(sum(posts), 500)
+        self.assertEqual(
+            Comment.objects.count(),
+            Post.objects.aggregate(total=Sum('comments_count'))['total'],
+        )
+        follow = Follow.objects.filter(pull=False).first()
+        self.assertEqual(
+            TimelineEntry.objects.filter(
+                user=follow.user_id, author=follow.author_id
+            ).count(),
+            Post.objects.filter(author=follow.author_id).count(),
+        )
+
+    def test_seed_keeps_unrelated_cache(self):
+        """Заполнение сбрасывает версии лент, а не весь кэш"""
+        cache.set('thumbnail-key', 'value')
+        [index] = feed_cache.get_versions(feed_cache.INDEX)
+        seeding.seed(users=5, groups=1, posts=10, comments_per_post=0)
+        self.assertEqual(cache.get('thumbnail-key'), 'value')
+        self.assertGreater(
+            feed_cache.get_versions(feed_cache.INDEX)[0], index
+        )
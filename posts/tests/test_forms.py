@@ -1,11 +1,16 @@
+import io
 import shutil
 import tempfile
+from unittest import mock
 
 from django import forms
 from django.conf import settings
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.files.uploadhandler import (FileUploadHandler,
+                                             MemoryFileUploadHandler)
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from PIL import Image
 
 from posts.forms import CommentForm, PostForm
 from posts.models import Comment, Group, Post, User
@@ -49,6 +54,17 @@ IMAGE_2 = SimpleUploadedFile(
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
 
+def make_photo(size=(400, 100)):
+    image = Image.new('RGB', size, (200, 30, 30))
+    exif = image.getexif()
+    exif[0x010F] = 'Camera'
+    buffer = io.BytesIO()
+    image.save(buffer, 'JPEG', exif=exif.tobytes())
+    return SimpleUploadedFile(
+        'photo.jpeg', buffer.getvalue(), content_type='image/jpeg'
+    )
+
+
 @override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
 class PostFormTests(TestCase):
     @classmethod
@@ -146,6 +162,72 @@ class PostFormTests(TestCase):
             f"{settings.UPLOAD_FOLDER}{form_edit_data['image'].name}"
         )
 
+    @override_settings(IMAGE_MAX_DIMENSION=100)
+    def test_image_is_downscaled_and_reencoded(self):
+        """Изображение уменьшается и сохраняется без EXIF"""
+        form = PostForm(
+            data={'text': POST_TEXT_2}, files={'image': make_photo()}
+        )
+        self.assertTrue(form.is_valid(), form.errors)
+        image = form.cleaned_data['image']
+        self.assertEqual(image.name, 'photo.jpg')
+        with Image.open(image) as stored:
+            self.assertEqual(stored.size, (100, 25))
+            self.assertEqual(stored.format, 'JPEG')
+            self.assertTrue(stored.info.get('progressive'))
+            self.assertNotIn('exif', stored.info)
+
+    @override_settings(IMAGE_MAX_UPLOAD_SIZE=10)
+    def test_oversize_image_is_rejected(self):
+        """Слишком большой файл отклоняется формой"""
+        form = PostForm(
+            data={'text': POST_TEXT_2}, files={'image': make_photo()}
+        )
+        self.assertFalse(form.is_valid())
+        self.assertEqual(
+            form.errors.as_data()['image'][0].code, 'file_too_large'
+        )
+
+    def test_truncated_image_is_rejected(self):
+        """Обрезанный файл — ошибка формы, а не ошибка сервера"""
+        content = make_photo(size=(1200, 800)).read()
+        response = self.author_authorized_client.post(NEW_POST_URL, {
+            'text': POST_TEXT_2,
+            'image': SimpleUploadedFile(
+                'photo.jpeg', content[:len(content) // 2],
+                content_type='image/jpeg',
+            ),
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.context['form'].errors.as_data()['image'][0].code,
+            'invalid_image',
+        )
+        self.assertFalse(Post.objects.filter(text=POST_TEXT_2).exists())
+
+    @override_settings(IMAGE_MAX_UPLOAD_SIZE=1000)
+    def test_oversize_upload_is_stopped(self):
+        """Приём слишком большого файла прерывается на границе размера"""
+        received = []
+        receive = MemoryFileUploadHandler.receive_data_chunk
+
+        def record(handler, raw_data, start):
+            received.append(len(raw_data))
+            return receive(handler, raw_data, start)
+
+        with mock.patch.object(
+            MemoryFileUploadHandler, 'receive_data_chunk', record
+        ), mock.patch.object(FileUploadHandler, 'chunk_size', 256):
+            response = self.author_authorized_client.post(NEW_POST_URL, {
+                'text': POST_TEXT_2,
+                'image': make_photo(size=(1200, 800)),
+            })
+        self.assertLessEqual(sum(received), 1000)
+        self.assertEqual(
+            response.context['form'].errors.as_data()['image'][0].code,
+            'file_too_large',
+        )
+
     def test_guest_cant_create_post(self):
         """Гость не может создать пост"""
         posts_count = Post.objects.count()
@@ -0,0 +1,47 @@
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TransactionTestCase, override_settings
+
+BEFORE = [('posts', '0023_feed_indexes')]
+AFTER = [('posts', '0024_timeline')]
+
+
+class TimelineMigrationTest(TransactionTestCase):
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        self.migrate(MigrationExecutor(connection).loader.graph.leaf_nodes())
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_existing_follows_get_timelines(self):
+        """Миграция заполняет ленты существующих подписок"""
+        apps = self.migrate(BEFORE)
+        User = apps.get_model('auth', 'User')
+        Post = apps.get_model('posts', 'Post')
+        Follow = apps.get_model('posts', 'Follow')
+        author, popular, first, second = [
+            User.objects.create(username=name)
+            for name in ['author', 'popular', 'first', 'second']
+        ]
+        post = Post.objects.create(text='Запись', author=author)
+        Post.objects.create(text='Популярная', author=popular)
+        Follow.objects.create(user=first, author=author)
+        for user in [first, second]:
+            Follow.objects.create(user=user, author=popular)
+        apps = self.migrate(AFTER)
+        TimelineEntry = apps.get_model('posts', 'TimelineEntry')
+        Follow = apps.get_model('posts', 'Follow')
+        self.assertEqual(
+            list(TimelineEntry.objects.values_list('user_id', 'post_id')),
+            [(first.id, post.id)],
+        )
+        self.assertEqual(
+            set(Follow.objects.filter(pull=True).values_list(
+                'author_id', flat=True
+            )),
+            {popular.id},
+        )
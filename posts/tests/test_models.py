@@ -1,5 +1,11 @@
-from django.test import TestCase
+import os
+import tempfile
 
+from django.db import connection, connections
+from django.test import TestCase, override_settings
+
+from posts.db import configure_sqlite, pool, reset_health_checks, stats
+from posts.metrics import prometheus
 from posts.models import Comment, Follow, Group, Post, User
 
 
@@ -158,3 +164,86 @@ class FollowModelTest(TestCase):
         expected = (f'Пользователь: {self.follow.user.username} | '
                     f'автор: {self.follow.author.username}')
         self.assertEqual(expected, str(self.follow))
+
+
+class SQLitePragmasTest(TestCase):
+    def pragma(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_pragmas_from_settings(self):
+        """Новое соединение с SQLite получает прагмы из настроек"""
+        self.assertEqual(self.pragma('busy_timeout'), 5000)
+        self.assertEqual(self.pragma('temp_store'), 2)
+        # synchronous и journal_mode нельзя менять внутри транзакции теста
+        for timeout in (1234, 5000):
+            with override_settings(SQLITE_PRAGMAS={'busy_timeout': timeout}):
+                configure_sqlite(None, connection)
+            self.assertEqual(self.pragma('busy_timeout'), timeout)
+
+
+class ConnectionPoolTest(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.settings_dict = {
+            **connection.settings_dict,
+            'NAME': os.path.join(directory.name, 'pool.sqlite3'),
+            'POOL_SIZE': 1,
+        }
+        stats.reset()
+        self.addCleanup(pool.clear)
+
+    def wrapper(self):
+        wrapper = type(connections['default'])(
+            self.settings_dict, alias='pool'
+        )
+        self.addCleanup(wrapper.close)
+        return wrapper
+
+    def query(self, wrapper):
+        with wrapper.cursor() as cursor:
+            cursor.execute('SELECT 1')
+            return cursor.fetchone()[0]
+
+    def test_pool_reuses_connections(self):
+        """Закрытое соединение достаётся следующему потоку из пула"""
+        first = self.wrapper()
+        self.query(first)
+        raw = first.connection
+        first.close()
+        second = self.wrapper()
+        self.query(second)
+        self.assertIs(second.connection, raw)
+        # Пул полон: лишнее соединение закрывается
+        third = self.wrapper()
+        self.query(third)
+        second.close()
+        third.close()
+        self.assertEqual(stats.snapshot()['pool'], {
+            'opened': 2, 'reused': 1, 'closed': 1,
+            'health_check_failures': 0,
+        })
+
+    def test_health_checks(self):
+        """Сломанное соединение из пула или прошлого запроса заменяется"""
+        first = self.wrapper()
+        self.query(first)
+        raw = first.connection
+        first.close()
+        raw.close()
+        second = self.wrapper()
+        self.assertEqual(self.query(second), 1)
+        second.connection.close()
+        # Следующий запрос к сайту
+        reset_health_checks()
+        second.health_check_done = False
+        self.assertEqual(self.query(second), 1)
+        self.assertEqual(
+            stats.snapshot()['pool']['health_check_failures'], 2
+        )
+        self.assertIn(
+            'yatube_db_connections_reused_total{alias="pool"} 0',
+            prometheus(),
+        )
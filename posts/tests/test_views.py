@@ -1,13 +1,25 @@
+import os
 import shutil
 import tempfile
+from io import StringIO
+from unittest import mock
 
 from django.conf import settings
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.paginator import Page
+from django.db import connection, connections
 from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
-from posts.models import Follow, Group, Post, User
+from posts import thumbnails
+from posts.forms import PostForm
+from posts.metrics import assert_query_budget, registry
+from posts.models import (Comment, Follow, Group, Post, TimelineEntry, User,
+                          UserCounters)
+from posts.search import search
 
 
 USERNAME = 'author'
@@ -25,6 +37,7 @@ INDEX_URL = reverse('index')
 NEW_POST_URL = reverse('new_post')
 PROFILE_URL = reverse('profile', args=[USERNAME])
 FOLLOW_URL = reverse('follow_index')
+SEARCH_URL = reverse('search')
 PROFILE_FOLLOW_URL = reverse('profile_follow', args=[USERNAME])
 PROFILE_UNFOLLOW_URL = reverse('profile_unfollow', args=[USERNAME])
 IMAGE = (
@@ -42,6 +55,11 @@ file = SimpleUploadedFile(
     content_type='image/gif'
 )
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+LOCMEM_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
 
 
 @override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
@@ -80,6 +98,7 @@ class PostPagesTests(TestCase):
         super().tearDownClass()
 
     def setUp(self):
+        cache.clear()
         self.guest_client = Client()
         self.author_authorized_client = Client()
         self.author_authorized_client.force_login(self.author)
@@ -112,6 +131,67 @@ class PostPagesTests(TestCase):
                     f'{settings.UPLOAD_FOLDER}{FILE_NAME}'
                 )
 
+    def test_feed_queues_missing_thumbnail(self):
+        """Пока миниатюры нет, лента показывает исходное изображение"""
+        with mock.patch.object(thumbnails, 'schedule') as schedule:
+            response = self.guest_client.get(INDEX_URL)
+        self.assertContains(response, self.post.image.url)
+        schedule.assert_called_once_with(self.post.image)
+
+    @override_settings(PAGE_CACHE_TIMEOUT=0, FEED_CACHE_TIMEOUT=0)
+    def test_feed_checks_missing_thumbnail_once(self):
+        """Отрисовка не проверяет файл без вариантов при каждом запросе"""
+        with mock.patch.object(
+            thumbnails, 'source_exists', return_value=False
+        ) as source_exists:
+            for _ in range(2):
+                self.guest_client.get(INDEX_URL)
+        source_exists.assert_called_once_with(self.post.image)
+
+    def test_feed_shows_stored_image_variants(self):
+        """Готовые варианты миниатюры выводятся в srcset без очереди"""
+        self.guest_client.get(INDEX_URL)
+        thumbnails.store(self.post.image.name, {
+            320: '/media/cache/small.gif',
+            960: '/media/cache/large.gif',
+        })
+        with mock.patch.object(thumbnails, 'schedule') as schedule:
+            response = self.guest_client.get(INDEX_URL)
+        self.assertContains(response, 'src="/media/cache/large.gif"')
+        self.assertContains(
+            response,
+            'srcset="/media/cache/small.gif 320w, /media/cache/large.gif 960w"'
+        )
+        schedule.assert_not_called()
+
+    def test_edit_keeps_variants_stored_meanwhile(self):
+        """Правка текста не затирает миниатюры, сохранённые во время неё"""
+        variants = {320: '/media/cache/small.gif'}
+        clean = PostForm.clean
+
+        def store_meanwhile(form):
+            thumbnails.store(self.post.image.name, variants)
+            return clean(form)
+
+        with mock.patch.object(PostForm, 'clean', store_meanwhile):
+            self.author_authorized_client.post(self.POST_EDIT_URL, {
+                'text': POST_TEXT_2, 'group': self.group_1.id,
+            })
+        post = Post.objects.get(pk=self.post.pk)
+        self.assertEqual(post.text, POST_TEXT_2)
+        self.assertEqual(post.get_image_variants(), variants)
+        # Новое изображение сбрасывает варианты
+        with mock.patch.object(thumbnails, 'schedule'):
+            self.author_authorized_client.post(self.POST_EDIT_URL, {
+                'text': POST_TEXT_2,
+                'image': SimpleUploadedFile(
+                    'new.gif', IMAGE, content_type='image/gif'
+                ),
+            })
+        post.refresh_from_db()
+        self.assertNotEqual(post.image.name, self.post.image.name)
+        self.assertEqual(post.get_image_variants(), {})
+
     def test_post_not_in_group_2(self):
         """Созданный пост не попал в чужую группу"""
         response = self.author_authorized_client.get(GROUP_URL_2)
@@ -126,24 +206,53 @@ class PostPagesTests(TestCase):
                 self.assertEqual(response.context['author'].username, USERNAME)
 
     def test_new_post_creates_new_post(self):
-        """Главная страница кэширует информацию"""
+        """Главная страница кэширует информацию до изменения записей"""
         response = self.guest_client.get(INDEX_URL)
+        Post.objects.filter(pk=self.post.pk).update(text=POST_TEXT_2)
+        response_after_silent_update = self.guest_client.get(INDEX_URL)
+        self.assertEqual(
+            response.content,
+            response_after_silent_update.content
+        )
         Post.objects.create(
             text=POST_TEXT_2,
             author=self.author,
             group=self.group_1
         )
         response_after_adding_post = self.guest_client.get(INDEX_URL)
-        self.assertEqual(
+        self.assertNotEqual(
             response.content,
             response_after_adding_post.content
         )
-        cache.clear()
-        response_after_cache_clear = self.guest_client.get(INDEX_URL)
-        self.assertNotEqual(
-            response.content,
-            response_after_cache_clear.content
+
+    def test_feed_cache_is_per_view_and_user(self):
+        """Кэш ленты не смешивает ленты и пользователей"""
+        Follow.objects.create(
+            author=self.author,
+            user=self.user
+        )
+        self.author_authorized_client.get(INDEX_URL)
+        response = self.user_authorized_client.get(INDEX_URL)
+        self.assertNotContains(response, self.POST_EDIT_URL)
+        self.user_authorized_client.get(FOLLOW_URL)
+        response = self.author_authorized_client.get(FOLLOW_URL)
+        self.assertNotContains(response, self.POST_URL)
+
+    def test_comment_invalidates_feeds(self):
+        """Новый комментарий сразу виден в лентах"""
+        urls = [INDEX_URL, GROUP_URL_1, PROFILE_URL]
+        for url in urls:
+            self.guest_client.get(url)
+        Comment.objects.create(
+            text=POST_TEXT,
+            author=self.user,
+            post=self.post
         )
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertContains(
+                    self.guest_client.get(url), 'Комментариев: 1'
+                )
 
     def test_authorized_user_can_follow(self):
         """Возможность подписываться на других пользователей"""
@@ -196,6 +305,11 @@ class PaginatorViewsTest(TestCase):
             for i in range(cls.DELTA + settings.POSTS_PER_PAGE)]
         )
 
+    def setUp(self):
+        # Кэш в памяти или в файлах (YATUBE_CACHE) переживает откат
+        # транзакции теста
+        cache.clear()
+
     def test_first_page(self):
         """Тест paginator 1-я страница"""
         self.assertEqual(
@@ -209,3 +323,734 @@ class PaginatorViewsTest(TestCase):
             len(self.client.get(f'{INDEX_URL}?page=2').context['page']),
             self.DELTA
         )
+
+    @override_settings(FEED_PAGINATION='cursor')
+    def test_cursor_pages(self):
+        """Навигация по ключу возвращает те же записи, что и по номеру"""
+        first_page = self.client.get(INDEX_URL).context['page']
+        self.assertEqual(len(first_page), settings.POSTS_PER_PAGE)
+        self.assertFalse(first_page.has_previous())
+        second_page = self.client.get(
+            INDEX_URL, {'cursor': first_page.next_cursor}
+        ).context['page']
+        self.assertEqual(len(second_page), self.DELTA)
+        self.assertFalse(second_page.has_next())
+        self.assertEqual(
+            list(second_page),
+            list(self.client.get(f'{INDEX_URL}?page=2').context['page'])
+        )
+        previous_page = self.client.get(
+            INDEX_URL, {'cursor': second_page.previous_cursor}
+        ).context['page']
+        self.assertEqual(list(previous_page), list(first_page))
+
+    @override_settings(FEED_PAGINATION='cursor', CACHES=LOCMEM_CACHES)
+    def test_cursor_pages_do_not_count(self):
+        """Навигация по ключу не считает записи и не зависит от глубины"""
+        cache.clear()
+        with CaptureQueriesContext(connection) as first_queries:
+            page = self.client.get(INDEX_URL).context['page']
+        with CaptureQueriesContext(connection) as next_queries:
+            self.client.get(INDEX_URL, {'cursor': page.next_cursor})
+        self.assertEqual(len(first_queries), len(next_queries))
+        for query in first_queries.captured_queries:
+            self.assertNotIn('COUNT(*)', query['sql'])
+
+    def test_invalid_cursor(self):
+        """Некорректный курсор открывает первую страницу"""
+        page = self.client.get(
+            INDEX_URL, {'cursor': 'invalid'}
+        ).context['page']
+        self.assertEqual(len(page), settings.POSTS_PER_PAGE)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class FeedQueriesTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(USERNAME)
+        cls.user = User.objects.create_user(username='user')
+        cls.group = Group.objects.create(
+            title=GROUP_TITLE_1,
+            slug=SLUG_1,
+            description=GROUP_DESCRIPTION_1
+        )
+        Post.objects.bulk_create([Post(
+            text=f'Тестовая публикация{i}',
+            author=cls.author,
+            group=cls.group,
+            image=f'{settings.UPLOAD_FOLDER}image{i}.gif')
+            for i in range(2 * settings.POSTS_PER_PAGE)]
+        )
+        Comment.objects.bulk_create([Comment(
+            text=f'Комментарий{post.id}',
+            author=cls.user,
+            post=post)
+            for post in Post.objects.all()]
+        )
+        Follow.objects.create(author=cls.author, user=cls.user)
+
+    def setUp(self):
+        self.user_authorized_client = Client()
+        self.user_authorized_client.force_login(self.user)
+
+    def count_queries(self, url, per_page):
+        cache.clear()
+        with self.settings(POSTS_PER_PAGE=per_page):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.user_authorized_client.get(url)
+        self.assertEqual(len(response.context['page']), per_page)
+        return len(queries)
+
+    def test_feed_queries_do_not_depend_on_page_size(self):
+        """Число запросов ленты не зависит от числа записей на странице"""
+        urls = [INDEX_URL, GROUP_URL_1, PROFILE_URL, FOLLOW_URL]
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(
+                    self.count_queries(url, 1),
+                    self.count_queries(url, 2 * settings.POSTS_PER_PAGE)
+                )
+
+    def test_pages_fit_query_budget(self):
+        """Страницы укладываются в бюджет запросов QUERY_BUDGETS"""
+        post = Post.objects.first()
+        urls = [
+            INDEX_URL, GROUP_URL_1, PROFILE_URL, FOLLOW_URL,
+            reverse('post', args=[USERNAME, post.id]),
+        ]
+        cache.clear()
+        with assert_query_budget() as observed:
+            for url in urls:
+                self.user_authorized_client.get(url)
+        self.assertEqual(
+            [view for view, _ in observed],
+            ['index', 'group_posts', 'profile', 'follow_index', 'post'],
+        )
+        with self.assertRaises(AssertionError):
+            with assert_query_budget(index=0):
+                self.user_authorized_client.get(INDEX_URL)
+
+
+class TimelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(USERNAME)
+        cls.user = User.objects.create_user(username='user')
+        cls.post = Post.objects.create(text=POST_TEXT, author=cls.author)
+
+    def setUp(self):
+        self.user_authorized_client = Client()
+        self.user_authorized_client.force_login(self.user)
+
+    def test_follow_backfills_and_unfollow_prunes_timeline(self):
+        """Подписка добавляет записи автора в ленту, отписка — удаляет"""
+        self.user_authorized_client.get(PROFILE_FOLLOW_URL)
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.user, post=self.post
+        ).exists())
+        self.user_authorized_client.get(PROFILE_UNFOLLOW_URL)
+        self.assertFalse(
+            TimelineEntry.objects.filter(user=self.user).exists()
+        )
+
+    def test_new_post_fans_out_to_followers(self):
+        """Новая запись попадает в ленту подписчиков"""
+        Follow.objects.create(author=self.author, user=self.user)
+        author_client = Client()
+        author_client.force_login(self.author)
+        author_client.post(NEW_POST_URL, {'text': POST_TEXT_2})
+        post = Post.objects.get(text=POST_TEXT_2)
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.user, post=post
+        ).exists())
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=0)
+    def test_popular_author_posts_are_pulled(self):
+        """Записи автора с большим числом подписчиков читаются напрямую"""
+        Follow.objects.create(author=self.author, user=self.user)
+        post = Post.objects.create(text=POST_TEXT_2, author=self.author)
+        self.assertFalse(
+            TimelineEntry.objects.filter(post=post).exists()
+        )
+        self.assertTrue(Follow.objects.get(user=self.user).pull)
+        for params in [{}, {'cursor': ''}]:
+            with self.subTest(params=params):
+                page = self.user_authorized_client.get(
+                    FOLLOW_URL, params
+                ).context['page']
+                self.assertEqual(list(page), [post, self.post])
+
+    @override_settings(POSTS_PER_PAGE=2, FEED_PAGINATION='cursor')
+    def test_timeline_cursor_pages(self):
+        """Навигация по ключу в ленте подписок"""
+        Follow.objects.create(author=self.author, user=self.user)
+        for i in range(3):
+            Post.objects.create(text=f'{POST_TEXT}{i}', author=self.author)
+        posts = list(Post.objects.filter(author=self.author))
+        first_page = self.user_authorized_client.get(
+            FOLLOW_URL
+        ).context['page']
+        second_page = self.user_authorized_client.get(
+            FOLLOW_URL, {'cursor': first_page.next_cursor}
+        ).context['page']
+        self.assertEqual(list(first_page) + list(second_page), posts)
+        self.assertFalse(second_page.has_next())
+
+    @override_settings(
+        POSTS_PER_PAGE=2, TIMELINE_FANOUT_LIMIT=0, CACHES=LOCMEM_CACHES
+    )
+    def test_pulled_authors_are_read_in_one_query(self):
+        """Записи авторов с `pull` читаются одним запросом на страницу"""
+        authors = [self.author] + [
+            User.objects.create_user(f'author{i}') for i in range(3)
+        ]
+        for author in authors:
+            Follow.objects.create(author=author, user=self.user)
+        for i in range(2):
+            for author in authors:
+                Post.objects.create(text=f'{POST_TEXT}{i}', author=author)
+        posts = list(Post.objects.filter(author__in=authors))
+        for param in ['cursor', 'page']:
+            with self.subTest(param=param):
+                pages = []
+                position = ''
+                while True:
+                    cache.clear()
+                    with CaptureQueriesContext(connection) as queries:
+                        page = self.user_authorized_client.get(
+                            FOLLOW_URL, {param: position}
+                        ).context['page']
+                    self.assertEqual(sum(
+                        'UNION ALL' in query['sql']
+                        for query in queries.captured_queries
+                    ), 1)
+                    pages.extend(page)
+                    if not page.has_next():
+                        break
+                    position = (
+                        page.next_cursor if param == 'cursor'
+                        else page.next_page_number()
+                    )
+                self.assertEqual(pages, posts)
+
+    @override_settings(POSTS_PER_PAGE=2, FEED_PAGINATION='numbered')
+    def test_numbered_timeline_pages(self):
+        """Нумерованные страницы сливают ленту и записи авторов с `pull`"""
+        popular = User.objects.create_user('popular')
+        Follow.objects.create(author=self.author, user=self.user)
+        Follow.objects.create(author=popular, user=self.user, pull=True)
+        for i in range(2):
+            Post.objects.create(text=f'{POST_TEXT}{i}', author=self.author)
+            Post.objects.create(text=f'{POST_TEXT}{i}', author=popular)
+        posts = list(Post.objects.filter(author__in=[self.author, popular]))
+        pages = [
+            self.user_authorized_client.get(
+                FOLLOW_URL, {'page': number}
+            ).context['page']
+            for number in range(1, 4)
+        ]
+        self.assertIs(type(pages[0]), Page)
+        self.assertEqual(pages[0].paginator.count, len(posts))
+        self.assertEqual(pages[0].paginator.num_pages, 3)
+        self.assertEqual(sum((list(page) for page in pages), []), posts)
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(USERNAME)
+        cls.user = User.objects.create_user(username='user')
+        cls.post = Post.objects.create(text=POST_TEXT, author=cls.author)
+        cls.ADD_COMMENT_URL = reverse('add_comment', args=[
+            cls.author, cls.post.id
+        ])
+
+    def setUp(self):
+        self.user_authorized_client = Client()
+        self.user_authorized_client.force_login(self.user)
+
+    def counters(self, user):
+        return UserCounters.objects.values_list(
+            'posts_count', 'followers_count', 'following_count'
+        ).get(user=user)
+
+    def test_counters_follow_changes(self):
+        """Счётчики меняются при записи, комментарии и подписке"""
+        self.assertEqual(self.counters(self.author), (1, 0, 0))
+        self.user_authorized_client.get(PROFILE_FOLLOW_URL)
+        self.user_authorized_client.post(NEW_POST_URL, {'text': POST_TEXT_2})
+        self.user_authorized_client.post(
+            self.ADD_COMMENT_URL, {'text': POST_TEXT_2}
+        )
+        self.assertEqual(self.counters(self.author), (1, 1, 0))
+        self.assertEqual(self.counters(self.user), (1, 0, 1))
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 1)
+        self.user_authorized_client.get(PROFILE_UNFOLLOW_URL)
+        self.assertEqual(self.counters(self.author), (1, 0, 0))
+        self.assertEqual(self.counters(self.user), (1, 0, 0))
+
+    def test_edit_keeps_concurrent_comments(self):
+        """Правка записи не затирает комментарии, добавленные во время неё"""
+        author_client = Client()
+        author_client.force_login(self.author)
+        clean = PostForm.clean
+
+        def comment_meanwhile(form):
+            # Комментарий появляется после того, как правка прочла запись
+            Comment.objects.create(
+                post=self.post, author=self.user, text=POST_TEXT_2
+            )
+            return clean(form)
+
+        with mock.patch.object(PostForm, 'clean', comment_meanwhile):
+            author_client.post(
+                reverse('post_edit', args=[USERNAME, self.post.id]),
+                {'text': POST_TEXT_2},
+            )
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.text, POST_TEXT_2)
+        self.assertEqual(self.post.comments_count, 1)
+
+    @override_settings(FEED_PAGINATION='cursor', CACHES=LOCMEM_CACHES)
+    def test_profile_does_not_count(self):
+        """Профиль показывает счётчики без COUNT(*)"""
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.user_authorized_client.get(PROFILE_URL)
+        self.assertContains(response, 'Записей: 1')
+        for query in queries.captured_queries:
+            self.assertNotIn('COUNT(', query['sql'])
+
+
+class ConditionalGetTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(USERNAME)
+        cls.user = User.objects.create_user(username='user')
+        cls.post = Post.objects.create(text=POST_TEXT, author=cls.author)
+        cls.POST_URL = reverse('post', args=[cls.author, cls.post.id])
+
+    def setUp(self):
+        self.guest_client = Client()
+        self.user_authorized_client = Client()
+        self.user_authorized_client.force_login(self.user)
+
+    def test_unchanged_page_is_not_modified(self):
+        """Повторный запрос с ETag или Last-Modified получает 304"""
+        for url in [INDEX_URL, PROFILE_URL, self.POST_URL]:
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertEqual(response['Vary'], 'Cookie')
+                with CaptureQueriesContext(connection) as queries:
+                    not_modified = self.guest_client.get(
+                        url, HTTP_IF_NONE_MATCH=response['ETag']
+                    )
+                self.assertEqual(not_modified.status_code, 304)
+                for query in queries.captured_queries:
+                    self.assertNotIn('posts_post', query['sql'])
+                self.assertEqual(self.guest_client.get(
+                    url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+                ).status_code, 304)
+
+    def test_changes_and_user_change_etag(self):
+        """ETag меняется с новой записью, подпиской и пользователем"""
+        etag = self.user_authorized_client.get(PROFILE_URL)['ETag']
+        self.assertNotEqual(self.guest_client.get(PROFILE_URL)['ETag'], etag)
+        self.user_authorized_client.get(PROFILE_FOLLOW_URL)
+        response = self.user_authorized_client.get(
+            PROFILE_URL, HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 200)
+        etag = self.user_authorized_client.get(INDEX_URL)['ETag']
+        Post.objects.create(text=POST_TEXT_2, author=self.author)
+        response = self.user_authorized_client.get(
+            INDEX_URL, HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertContains(response, POST_TEXT_2)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class AnonymousPageCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(USERNAME)
+        cls.post = Post.objects.create(text=POST_TEXT, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.author_authorized_client = Client()
+        self.author_authorized_client.force_login(self.author)
+
+    def test_anonymous_page_is_served_from_cache(self):
+        """Повторная страница для анонима читается из кэша"""
+        # Для профиля остаётся только поиск автора по имени.
+        urls = {INDEX_URL: 0, reverse('about:author'): 0, PROFILE_URL: 1}
+        for url, queries in urls.items():
+            with self.subTest(url=url):
+                first = self.guest_client.get(url)
+                with self.assertNumQueries(queries):
+                    second = self.guest_client.get(url)
+                self.assertEqual(second.content, first.content)
+
+    @override_settings(ALLOWED_HOSTS=['testserver', 'localhost'])
+    def test_cache_key_uses_host_and_allowed_params(self):
+        """Кэш страниц различает хосты и кэширует только ?page и ?cursor"""
+        cases = [
+            (INDEX_URL, {'page': 1}, True),
+            (INDEX_URL, {'cursor': ''}, True),
+            (INDEX_URL, {'utm_source': 'mail'}, False),
+            (INDEX_URL, {'page': 1, 'utm_source': 'mail'}, False),
+            (SEARCH_URL, {'q': POST_TEXT}, False),
+        ]
+        for url, params, cached in cases:
+            with self.subTest(url=url, params=params):
+                self.guest_client.get(url, params)
+                with CaptureQueriesContext(connection) as queries:
+                    self.guest_client.get(url, params)
+                self.assertEqual(not queries.captured_queries, cached)
+        with CaptureQueriesContext(connection) as queries:
+            self.guest_client.get(INDEX_URL, HTTP_HOST='localhost')
+        self.assertTrue(queries.captured_queries)
+
+    def test_new_post_invalidates_cached_page(self):
+        """Новая запись сбрасывает кэш страницы"""
+        self.guest_client.get(INDEX_URL)
+        Post.objects.create(text=POST_TEXT_2, author=self.author)
+        self.assertContains(self.guest_client.get(INDEX_URL), POST_TEXT_2)
+
+    def test_authorized_page_is_not_cached(self):
+        """Страницы авторизованных пользователей не кэшируются целиком"""
+        self.author_authorized_client.get(INDEX_URL)
+        with CaptureQueriesContext(connection) as queries:
+            self.author_authorized_client.get(INDEX_URL)
+        self.assertTrue(queries.captured_queries)
+
+
+class SearchTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user('writer')
+        cls.group = Group.objects.create(
+            title='Садоводство', slug='garden', description='Описание'
+        )
+        cls.posts = [
+            Post.objects.create(
+                text=f'Помидоры сорт {i}', author=cls.author, group=cls.group
+            )
+            for i in range(5)
+        ]
+        cls.other = Post.objects.create(
+            text='Огурцы', author=User.objects.create_user('reader')
+        )
+
+    def setUp(self):
+        self.guest_client = Client()
+
+    def found(self, query):
+        ids, cursor = [], None
+        while True:
+            page = search(query, cursor, limit=2)
+            ids += [post.id for post in page]
+            cursor = page.next_cursor
+            if cursor is None:
+                return sorted(ids)
+
+    def test_search_text_group_and_author(self):
+        """Поиск по тексту, сообществу и автору, по префиксу и страницам"""
+        ids = sorted(post.id for post in self.posts)
+        for query in ['помидоры', 'Садоводство', 'writer', 'помид']:
+            with self.subTest(query=query):
+                self.assertEqual(self.found(query), ids)
+        self.assertEqual(self.found('огурцы'), [self.other.id])
+        self.assertEqual(self.found('помидоры огурцы'), [])
+
+    @override_settings(SEARCH_BACKEND='posts.search.LikeBackend')
+    def test_like_backend(self):
+        """Запасной движок ищет подстроки и листает страницы"""
+        # LIKE в SQLite не различает регистр только у латиницы
+        self.assertEqual(
+            self.found('writ'), sorted(post.id for post in self.posts)
+        )
+        self.assertEqual(self.found('reader'), [self.other.id])
+
+    def test_index_follows_changes(self):
+        """Индекс обновляется при правке, удалении и переименовании"""
+        post = Post.objects.get(id=self.other.id)
+        post.text = 'Кабачки'
+        post.save()
+        self.assertEqual(self.found('огурцы'), [])
+        self.assertEqual(self.found('кабачки'), [post.id])
+        Group.objects.filter(id=self.group.id).update(title='Огород')
+        self.assertEqual(len(self.found('огород')), len(self.posts))
+        post.delete()
+        self.assertEqual(self.found('кабачки'), [])
+
+    @override_settings(CACHES=LOCMEM_CACHES)
+    def test_pages_follow_snapshot(self):
+        """Страницы поиска листают снимок, даже если записи добавляются"""
+        ids = set(self.found('помидоры'))
+        for evict in [False, True]:
+            with self.subTest(evict=evict):
+                page = search('помидоры', limit=2)
+                found = [post.id for post in page]
+                Post.objects.create(text='Помидоры', author=self.author)
+                if evict:
+                    cache.clear()
+                while page.has_next():
+                    page = search('помидоры', page.next_cursor, limit=2)
+                    found += [post.id for post in page]
+                self.assertEqual(sorted(found), sorted(ids))
+                ids = set(self.found('помидоры'))
+
+    @override_settings(CACHES=LOCMEM_CACHES)
+    def test_rename_refreshes_search_page(self):
+        """Переименование сообщества и автора обновляет страницу поиска"""
+        group = Group.objects.get(id=self.group.id)
+        author = User.objects.get(id=self.author.id)
+        for instance, field, name in [
+            (group, 'title', 'Огород'), (author, 'username', 'гость')
+        ]:
+            with self.subTest(field=field):
+                response = self.guest_client.get(SEARCH_URL, {'q': name})
+                self.assertEqual(list(response.context['page']), [])
+                setattr(instance, field, name)
+                instance.save()
+                response = self.guest_client.get(SEARCH_URL, {'q': name})
+                self.assertEqual(
+                    len(response.context['page']), len(self.posts)
+                )
+
+    def test_search_page(self):
+        """Страница поиска показывает найденные записи"""
+        response = self.guest_client.get(SEARCH_URL, {'q': 'огурцы'})
+        self.assertEqual(list(response.context['page']), [self.other])
+        response = self.guest_client.get(
+            SEARCH_URL, {'q': 'огурцы', 'cursor': 'invalid'}
+        )
+        self.assertEqual(list(response.context['page']), [self.other])
+
+
+@override_settings(COMMENTS_PER_PAGE=2, PAGE_CACHE_TIMEOUT=0)
+class CommentPaginationTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user('commented')
+        cls.post = Post.objects.create(text='Обсуждаемая', author=cls.author)
+        cls.comments = [
+            Comment.objects.create(
+                text=f'Комментарий {i}', author=cls.author, post=cls.post
+            )
+            for i in range(5)
+        ]
+        cls.POST_URL = reverse('post', args=[cls.author, cls.post.id])
+
+    def setUp(self):
+        self.guest_client = Client()
+
+    def test_first_comments_and_load_more(self):
+        """Сначала выводятся первые комментарии, остальные — по ключу"""
+        response = self.guest_client.get(self.POST_URL)
+        page = response.context['comments']
+        self.assertEqual(list(page), self.comments[:2])
+        self.assertContains(response, 'id="more-comments"')
+        # Список комментариев в контексте — комментарии страницы
+        self.assertEqual(
+            list(response.context['comment_list']), self.comments[:2]
+        )
+        response = self.guest_client.get(
+            self.POST_URL, {'comments': page.next_cursor}
+        )
+        self.assertEqual(
+            list(response.context['comments']), self.comments[2:4]
+        )
+        self.assertEqual(
+            list(response.context['comment_list']), self.comments[2:4]
+        )
+        data = self.guest_client.get(
+            reverse('api:comments', args=[self.post.id]),
+            {'cursor': page.next_cursor, 'limit': 2},
+        ).json()
+        self.assertEqual(
+            [comment['id'] for comment in data['results']],
+            [comment.id for comment in self.comments[2:4]],
+        )
+
+    def test_queries_do_not_depend_on_comments(self):
+        """Число запросов страницы записи не зависит от комментариев"""
+        self.guest_client.get(self.POST_URL)
+        counts = []
+        for _ in range(2):
+            with CaptureQueriesContext(connection) as queries:
+                self.guest_client.get(self.POST_URL)
+            counts.append(len(queries))
+            Comment.objects.create(
+                text='Ещё', author=User.objects.create_user(
+                    f'reader{len(counts)}'
+                ), post=self.post,
+            )
+        self.assertEqual(counts[0], counts[1])
+
+
+@override_settings(CACHES=LOCMEM_CACHES, PAGE_CACHE_TIMEOUT=300)
+class MetricsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(USERNAME)
+        Post.objects.create(text=POST_TEXT, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        registry.reset()
+        self.guest_client = Client()
+
+    def test_metrics_by_view(self):
+        """Запросы, попадания в кэш и превышения бюджета по маршрутам"""
+        for _ in range(2):
+            self.guest_client.get(PROFILE_URL)
+        with self.settings(QUERY_BUDGETS={'index': 0}):
+            with self.assertLogs('yatube.queries', 'WARNING'):
+                self.guest_client.get(INDEX_URL)
+        metrics = registry.snapshot()
+        profile = metrics['profile']
+        self.assertEqual(profile['requests'], 2)
+        self.assertGreater(profile['queries'], 0)
+        self.assertGreater(profile['template_seconds'], 0)
+        # Второй показ — из кэша страниц
+        self.assertGreater(profile['cache_hits'], 0)
+        self.assertEqual(profile['over_budget'], 0)
+        self.assertEqual(metrics['index']['over_budget'], 1)
+
+    @override_settings(CACHES={'default': dict(zip(
+        ('BACKEND', 'LOCATION'), settings.CACHE_BACKENDS['db']
+    ))})
+    def test_database_cache_queries_are_not_budgeted(self):
+        """Запросы кэша в базе не входят в бюджет страницы"""
+        call_command('createcachetable')
+        with assert_query_budget() as observed:
+            self.guest_client.get(INDEX_URL)
+        index = registry.snapshot()['index']
+        self.assertGreater(index['cache_queries'], 0)
+        self.assertEqual(observed, [('index', index['queries'])])
+
+    def test_metrics_page(self):
+        """Страница метрик открыта сотрудникам и по токену"""
+        self.guest_client.get(INDEX_URL)
+        staff = User.objects.create_user('staff', is_staff=True)
+        staff_client = Client()
+        staff_client.force_login(staff)
+        with self.settings(METRICS_TOKEN='secret'):
+            responses = {
+                'staff': staff_client.get(reverse('metrics')),
+                'token': self.guest_client.get(
+                    reverse('metrics'), HTTP_AUTHORIZATION='Bearer secret'
+                ),
+            }
+            for name, response in responses.items():
+                with self.subTest(client=name):
+                    self.assertContains(
+                        response,
+                        'yatube_view_requests_total{view="index"} 1',
+                    )
+            for header in ('', 'Bearer wrong'):
+                with self.subTest(header=header):
+                    # Адрес прокси не даёт доступа
+                    response = self.guest_client.get(
+                        reverse('metrics'), HTTP_AUTHORIZATION=header,
+                        REMOTE_ADDR='127.0.0.1',
+                    )
+                    self.assertEqual(response.status_code, 404)
+        with self.settings(METRICS_TOKEN=''):
+            response = self.guest_client.get(
+                reverse('metrics'), HTTP_AUTHORIZATION='Bearer '
+            )
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(
+    CACHES=LOCMEM_CACHES, REPLICA_DATABASES=['replica'], REPLICA_LAG_SECONDS=0
+)
+class ReplicaRoutingTest(TestCase):
+    """Основная база — тестовая, реплика — её копия в отдельном файле"""
+    databases = {'default', 'replica'}
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.mkdtemp()
+        connections.databases['replica'] = {
+            **connections.databases['default'],
+            'NAME': os.path.join(cls.directory, 'replica.sqlite3'),
+        }
+        # Копия схемы до транзакции теста: в транзакции копирование ждёт
+        with override_settings(REPLICA_DATABASES=['replica']):
+            call_command('sync_replica', stdout=StringIO())
+        super().setUpClass()
+        cls.author = User.objects.create_user(USERNAME)
+        post = Post.objects.create(text=POST_TEXT, author=cls.author)
+        # Реплика получила первую запись, но не следующие
+        User.objects.using('replica').bulk_create([
+            User(id=cls.author.id, username=USERNAME)
+        ])
+        Post.objects.using('replica').bulk_create([Post(
+            id=post.id, text=POST_TEXT, author_id=cls.author.id,
+            pub_date=post.pub_date,
+        )])
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections['replica'].close()
+        del connections.databases['replica']
+        del connections._connections.replica
+        shutil.rmtree(cls.directory, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        Post.objects.create(text=POST_TEXT_2, author=self.author)
+        self.guest_client = Client()
+        self.author_authorized_client = Client()
+        self.author_authorized_client.force_login(self.author)
+
+    def test_feeds_are_read_from_replica(self):
+        """Ленты и профиль читают записи с реплики"""
+        for url in (INDEX_URL, PROFILE_URL):
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertContains(response, POST_TEXT)
+                self.assertNotContains(response, POST_TEXT_2)
+
+    def test_writer_is_pinned_to_primary(self):
+        """После записи автор читает основную базу"""
+        response = self.author_authorized_client.post(
+            NEW_POST_URL, {'text': 'Только что'}
+        )
+        self.assertIn(settings.REPLICA_PIN_COOKIE, response.cookies)
+        response = self.author_authorized_client.get(INDEX_URL)
+        self.assertContains(response, 'Только что')
+        self.assertContains(response, POST_TEXT_2)
+        # Чтение страницы не продлевает привязку
+        self.assertNotIn(settings.REPLICA_PIN_COOKIE, response.cookies)
+
+    def test_recently_changed_page_is_read_from_primary(self):
+        """Страницу, изменённую за время отставания, читает основная база"""
+        with self.settings(REPLICA_LAG_SECONDS=60):
+            response = self.guest_client.get(INDEX_URL)
+        self.assertContains(response, POST_TEXT_2)
+
+    def test_forms_use_primary(self):
+        """Формы читают основную базу"""
+        post = Post.objects.get(text=POST_TEXT_2)
+        response = self.author_authorized_client.get(
+            reverse('post_edit', args=[USERNAME, post.id])
+        )
+        self.assertContains(response, POST_TEXT_2)
@@ -0,0 +1,211 @@
+"""
+Миниатюры записей создаются заранее в фоновых потоках.
+
+Для каждого изображения строятся варианты всех ширин FEED_IMAGE_WIDTHS,
+их адреса сохраняются в Post.image_variants, и шаблон выводит srcset,
+не обращаясь к хранилищу ключей sorl-thumbnail. Пока вариантов нет,
+показывается готовая миниатюра или исходное изображение, а недостающие
+варианты ставятся в очередь: масштабирование не выполняется в запросе.
+"""
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import SuspiciousFileOperation
+from django.db import connection, transaction
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import EMPTY_VALUE
+from sorl.thumbnail.kvstores.cached_db_kvstore import KVStore as CachedDBStore
+from sorl.thumbnail.models import KVStore
+
+from . import feed_cache
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+FEED_GEOMETRY = '960x339'
+FEED_OPTIONS = {'crop': 'center', 'upscale': True}
+FEED_WIDTH, FEED_HEIGHT = 960, 339
+
+_executor = None
+_pending = set()
+_lock = threading.Lock()
+
+
+def thumbnail_file(image, geometry=FEED_GEOMETRY, **options):
+    """
+    Файл миниатюры с тем же именем, что построит sorl-thumbnail,
+    без чтения исходного изображения.
+    """
+    backend = default.backend
+    source = ImageFile(image)
+    options = {**FEED_OPTIONS, **options}
+    if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault('format', backend._get_format(source))
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(thumbnail_settings, attr)
+        if value != getattr(default_settings, attr):
+            options.setdefault(key, value)
+    name = backend._get_thumbnail_filename(source, geometry, options)
+    return ImageFile(name, default.storage)
+
+
+def feed_geometries():
+    """Геометрия sorl-thumbnail для каждой ширины варианта."""
+    return {
+        width: f'{width}x{round(width * FEED_HEIGHT / FEED_WIDTH)}'
+        for width in settings.FEED_IMAGE_WIDTHS
+    }
+
+
+def cached_thumbnail(image, geometry=FEED_GEOMETRY, **options):
+    """Готовая миниатюра или None, если она ещё не создана."""
+    if not image:
+        return None
+    return default.kvstore.get(thumbnail_file(image, geometry, **options))
+
+
+def cached_thumbnails(images, geometry=FEED_GEOMETRY, **options):
+    """
+    Готовые миниатюры сразу для нескольких изображений: имя → ImageFile
+    или None. С хранилищем cached_db это один get_many к кэшу и один
+    запрос к таблице хранилища для промахов вместо пары на изображение.
+    """
+    images = [image for image in images if image]
+    kvstore = default.kvstore
+    if not isinstance(kvstore, CachedDBStore):
+        return {
+            image.name: cached_thumbnail(image, geometry, **options)
+            for image in images
+        }
+    keys = {
+        add_prefix(thumbnail_file(image, geometry, **options).key):
+            image.name
+        for image in images
+    }
+    values = kvstore.cache.get_many(list(keys))
+    missing = [key for key in keys if key not in values]
+    if missing:
+        found = dict(KVStore.objects.filter(key__in=missing).values_list(
+            'key', 'value'
+        ))
+        misses = {key: found.get(key, EMPTY_VALUE) for key in missing}
+        kvstore.cache.set_many(
+            misses, thumbnail_settings.THUMBNAIL_CACHE_TIMEOUT
+        )
+        values.update(misses)
+    return {
+        name: (
+            deserialize_image_file(values[key])
+            if values[key] and values[key] != EMPTY_VALUE else None
+        )
+        for key, name in keys.items()
+    }
+
+
+def attach(posts):
+    """
+    Запоминает в каждой записи с изображением адрес для ленты
+    (`thumbnail_url`): самый крупный сохранённый вариант, иначе готовую
+    миниатюру или исходный файл. Хранилище ключей опрашивается один раз
+    на все записи без вариантов, их варианты ставятся в очередь.
+    """
+    posts = [post for post in posts if post.image]
+    pending = []
+    for post in posts:
+        variants = post.get_image_variants()
+        if variants:
+            post.thumbnail_url = variants[max(variants)]
+        else:
+            pending.append(post)
+    found = cached_thumbnails(post.image for post in pending)
+    schedule_missing(post.image for post in pending)
+    for post in pending:
+        thumbnail = found.get(post.image.name)
+        post.thumbnail_url = (
+            post.image.url if thumbnail is None else thumbnail.url
+        )
+
+
+def store(name, variants):
+    """Сохраняет адреса вариантов во всех записях с этим изображением."""
+    posts = Post.objects.filter(image=name)
+    posts.update(image_variants=json.dumps(variants))
+    for post in posts.only('author_id', 'group_id'):
+        feed_cache.bump(*feed_cache.post_scopes(post))
+
+
+def generate(name):
+    try:
+        store(name, {
+            width: get_thumbnail(name, geometry, **FEED_OPTIONS).url
+            for width, geometry in feed_geometries().items()
+        })
+        return True
+    except Exception:
+        logger.exception('Не удалось создать миниатюру %s', name)
+        return False
+    finally:
+        with _lock:
+            _pending.discard(name)
+        if threading.current_thread() is not threading.main_thread():
+            connection.close()
+
+
+def get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.THUMBNAIL_WORKERS,
+                thread_name_prefix='thumbnails',
+            )
+    return _executor
+
+
+def submit(name):
+    if not settings.THUMBNAIL_ASYNC:
+        return generate(name)
+    with _lock:
+        if name in _pending:
+            return
+        _pending.add(name)
+    get_executor().submit(generate, name)
+
+
+def source_exists(image):
+    try:
+        return image.storage.exists(image.name)
+    except SuspiciousFileOperation:
+        return False
+
+
+def schedule(image):
+    """Ставит миниатюру в очередь после фиксации транзакции."""
+    if image and source_exists(image):
+        name = image.name
+        transaction.on_commit(lambda: submit(name))
+
+
+def schedule_missing(images):
+    """
+    schedule() для изображений ленты без вариантов: каждое не чаще раза
+    в THUMBNAIL_RETRY_TIMEOUT секунд, чтобы отрисовка не проверяла
+    файл в хранилище и не ставила его в очередь заново.
+    """
+    keys = {f'thumbnail-queued:{image.name}': image for image in images}
+    queued = cache.get_many(list(keys))
+    missing = {key: True for key in keys if key not in queued}
+    for key in missing:
+        schedule(keys[key])
+    if missing:
+        cache.set_many(missing, settings.THUMBNAIL_RETRY_TIMEOUT)
@@ -0,0 +1,277 @@
+"""
+Лента подписок, материализованная при записи.
+
+Новая запись рассылается в TimelineEntry каждому подписчику автора.
+Если подписчиков больше TIMELINE_FANOUT_LIMIT, рассылка не выполняется:
+подписки на такого автора помечаются `pull`, и его записи читаются
+при показе ленты напрямую из индекса (author, pub_date, id).
+"""
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models import Count, Q
+from django.utils import timezone
+from django.utils.functional import cached_property
+
+from .models import Follow, Post, TimelineEntry
+from .paginators import NEXT, CursorPaginator, seek
+
+# Наибольшее число частей UNION ALL в одном запросе SQLite
+# (SQLITE_MAX_COMPOUND_SELECT)
+COMPOUND_LIMIT = 500
+
+
+def is_pulled(author):
+    return Follow.objects.filter(author=author, pull=True).exists()
+
+
+def fan_out(post):
+    followers = Follow.objects.filter(author=post.author_id)
+    if followers.filter(pull=True).exists():
+        return
+    if followers.count() > settings.TIMELINE_FANOUT_LIMIT:
+        followers.update(pull=True)
+        return
+    TimelineEntry.objects.bulk_create(
+        [
+            TimelineEntry(
+                user_id=user_id,
+                post=post,
+                author_id=post.author_id,
+                pub_date=post.pub_date,
+            )
+            for user_id in followers.values_list('user_id', flat=True)
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def backfill(follow):
+    if is_pulled(follow.author_id):
+        Follow.objects.filter(pk=follow.pk).update(pull=True)
+        return
+    posts = Post.objects.filter(author=follow.author_id).values_list(
+        'id', 'pub_date'
+    )[:settings.TIMELINE_BACKFILL]
+    TimelineEntry.objects.bulk_create(
+        [
+            TimelineEntry(
+                user_id=follow.user_id,
+                post_id=post_id,
+                author_id=follow.author_id,
+                pub_date=pub_date,
+            )
+            for post_id, pub_date in posts
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def prune(follow):
+    TimelineEntry.objects.filter(
+        user=follow.user_id, author=follow.author_id
+    ).delete()
+
+
+# Строки идут в порядке индексов ленты (по подписчику): вставка
+# в B-деревья так вдвое быстрее, чем в порядке подписок
+BACKFILL_SQL = """
+    {insert} {timeline} (user_id, post_id, author_id, pub_date)
+    SELECT follow.user_id, post.id, post.author_id, post.pub_date
+    FROM {follow} follow JOIN (
+        SELECT id, author_id, pub_date, ROW_NUMBER() OVER (
+            PARTITION BY author_id ORDER BY pub_date DESC, id DESC
+        ) AS position
+        FROM {post}
+    ) post ON post.author_id = follow.author_id
+    WHERE follow.pull = %s AND post.position <= %s
+    ORDER BY follow.user_id, post.pub_date, post.id {suffix}
+"""
+
+
+def rebuild(apps=None, using=DEFAULT_DB_ALIAS):
+    """
+    Восстанавливает ленты подписок после загрузки без сигналов:
+    помечает `pull` подписки на популярных авторов и дополняет ленты
+    остальных подписок последними записями авторов — одним INSERT ...
+    SELECT вместо backfill каждой подписки. Миграция передаёт свой
+    реестр моделей `apps` и базу `using`.
+    """
+    follow_model, post_model, timeline_model = (
+        (Follow, Post, TimelineEntry) if apps is None else (
+            apps.get_model('posts', 'Follow'),
+            apps.get_model('posts', 'Post'),
+            apps.get_model('posts', 'TimelineEntry'),
+        )
+    )
+    follows = follow_model.objects.using(using)
+    popular = follows.values('author').annotate(
+        followers=Count('id')
+    ).filter(followers__gt=settings.TIMELINE_FANOUT_LIMIT).values('author')
+    follows.filter(author__in=popular).update(pull=True)
+    ops = connections[using].ops
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            BACKFILL_SQL.format(
+                insert=ops.insert_statement(ignore_conflicts=True),
+                timeline=ops.quote_name(timeline_model._meta.db_table),
+                follow=ops.quote_name(follow_model._meta.db_table),
+                post=ops.quote_name(post_model._meta.db_table),
+                suffix=ops.ignore_conflicts_suffix_sql(ignore_conflicts=True),
+            ),
+            [False, settings.TIMELINE_BACKFILL],
+        )
+
+
+def pulled_authors(user):
+    return list(
+        Follow.objects.filter(user=user, pull=True).values_list(
+            'author_id', flat=True
+        )
+    )
+
+
+def aware(value):
+    # Без ORM SQLite возвращает даты без часового пояса
+    if settings.USE_TZ and timezone.is_naive(value):
+        return timezone.make_aware(value, timezone.utc)
+    return value
+
+
+def follow_feed(user):
+    """
+    Все записи ленты подписок одним запросом. Страницы читают
+    TimelinePaginator и NumberedTimelinePaginator, а запрос остаётся
+    их object_list.
+    """
+    return Post.objects.feed().filter(
+        Q(id__in=TimelineEntry.objects.filter(user=user).values('post'))
+        | Q(author__in=Follow.objects.filter(user=user, pull=True).values(
+            'author'
+        ))
+    )
+
+
+class TimelinePaginator(CursorPaginator):
+    """
+    Страницы ленты подписок по ключу: записи из TimelineEntry и последние
+    записи авторов с `pull`, слитые по (pub_date, id).
+    """
+
+    def __init__(self, object_list, per_page, user=None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.user = user
+
+    def get_queryset(self, cursor=None):
+        direction, pub_date, post_id = self.position(cursor)
+        return seek(
+            TimelineEntry.objects.filter(user=self.user),
+            direction, pub_date, post_id,
+            keys=('pub_date', 'post_id'),
+        ).values_list('post_id', flat=True)[:self.per_page + 1]
+
+    def get_author_queryset(self, author, cursor=None, limit=None):
+        """Записи страницы одного автора с `pull` по его индексу."""
+        direction, pub_date, post_id = self.position(cursor)
+        return seek(
+            Post.objects.filter(author=author),
+            direction, pub_date, post_id,
+        ).values_list('pub_date', 'id')[:limit or self.per_page + 1]
+
+    def get_pulled_rows(self, authors, cursor=None, limit=None):
+        """
+        (pub_date, id) первых `limit` записей всех авторов с `pull`
+        одним запросом. author IN (...) прочитал бы все записи этих
+        авторов и сортировал бы их во временном B-дереве, поэтому
+        страницы авторов по индексу сливаются через UNION ALL и
+        ограничиваются ещё раз.
+        """
+        direction = self.position(cursor)[0]
+        order = 'DESC' if direction == NEXT else 'ASC'
+        limit = limit or self.per_page + 1
+        rows = []
+        for start in range(0, len(authors), COMPOUND_LIMIT):
+            parts, params = [], []
+            for author in authors[start:start + COMPOUND_LIMIT]:
+                sql, part_params = self.get_author_queryset(
+                    author, cursor, limit
+                ).query.sql_with_params()
+                parts.append(f'SELECT * FROM ({sql}) AS part{len(parts)}')
+                params.extend(part_params)
+            # Чтение ленты может идти с реплики (posts/replicas.py)
+            with connections[Post.objects.db].cursor() as db_cursor:
+                db_cursor.execute(
+                    ' UNION ALL '.join(parts)
+                    + f' ORDER BY 1 {order}, 2 {order} LIMIT {limit}',
+                    params,
+                )
+                rows.extend(
+                    (aware(pub_date), post_id)
+                    for pub_date, post_id in db_cursor.fetchall()
+                )
+        return rows
+
+    def get_posts(self, cursor):
+        direction = self.position(cursor)[0]
+        post_ids = set(self.get_queryset(cursor))
+        authors = pulled_authors(self.user)
+        if authors:
+            post_ids.update(
+                post_id for _, post_id in self.get_pulled_rows(authors, cursor)
+            )
+        posts = Post.objects.feed().filter(id__in=post_ids).order_by()
+        return sorted(
+            posts,
+            key=lambda post: (post.pub_date, post.id),
+            reverse=direction == NEXT,
+        )[:self.per_page + 1]
+
+
+class NumberedTimelinePaginator(Paginator):
+    """
+    Нумерованные страницы ленты подписок (?page=N) без follow_feed:
+    запрос id IN (лента) OR author IN (авторы с `pull`) со своим COUNT(*)
+    обходил бы всю таблицу записей. Число записей складывается из двух
+    подсчётов по индексам, а страница N сливает первые N страниц ленты
+    и авторов с `pull` — как OFFSET, но по индексам ленты и авторов.
+    """
+
+    def __init__(self, object_list, per_page, user=None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.user = user
+        self.timeline = TimelinePaginator(object_list, per_page, user=user)
+
+    @cached_property
+    def authors(self):
+        return pulled_authors(self.user)
+
+    def entries(self):
+        # Записи авторов, ставших популярными, могли остаться в ленте
+        return TimelineEntry.objects.filter(user=self.user).exclude(
+            author__in=self.authors
+        )
+
+    @cached_property
+    def count(self):
+        count = self.entries().count()
+        if self.authors:
+            count += Post.objects.filter(author__in=self.authors).count()
+        return count
+
+    def page(self, number):
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        top = bottom + self.per_page
+        rows = list(self.entries().order_by(
+            '-pub_date', '-post_id'
+        ).values_list('pub_date', 'post_id')[:top])
+        if self.authors:
+            rows += self.timeline.get_pulled_rows(self.authors, limit=top)
+        rows.sort(reverse=True)
+        post_ids = [post_id for _, post_id in rows[bottom:top]]
+        posts = sorted(
+            Post.objects.feed().filter(id__in=post_ids).order_by(),
+            key=lambda post: (post.pub_date, post.id),
+            reverse=True,
+        )
+        return self._get_page(posts, number, self)
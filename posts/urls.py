@@ -9,6 +9,12 @@ urlpatterns = [
     path('group/<slug:slug>/',
          views.group_posts,
          name='group_posts'),
+    path('search/',
+         views.search,
+         name='search'),
+    path('metrics/',
+         views.metrics,
+         name='metrics'),
     path('new/',
          views.new_post,
          name='new_post'),
@@ -1,32 +1,60 @@
+import hmac
+
 from django.conf import settings
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.db import transaction
+from django.http import Http404, HttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
 
+from . import feed_cache
+from .conditional import (conditional, follow_scopes, group_scopes,
+                          index_scopes, profile_scopes)
 from .forms import CommentForm, PostForm
+from .metrics import prometheus
 from .models import Follow, Group, Post, User
+from .paginators import CommentPaginator, paginate
+from .search import InvalidSearchCursor
+from .search import search as search_posts
+from .timeline import (NumberedTimelinePaginator, TimelinePaginator,
+                       follow_feed)
 
 
+@conditional(index_scopes)
 def index(request):
-    post_list = Post.objects.select_related('group')
-    paginator = Paginator(post_list, settings.POSTS_PER_PAGE)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
-    return render(request, 'index.html', {'page': page})
+    post_list = Post.objects.feed()
+    page = paginate(request, post_list)
+    return render(request, 'index.html', {
+        'page': page,
+        **feed_cache.feed_cache(request, 'index', feed_cache.INDEX),
+    })
 
 
+@conditional(group_scopes)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    post_list = group.posts.all()
-    paginator = Paginator(post_list, settings.POSTS_PER_PAGE)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    post_list = group.posts.feed()
+    page = paginate(request, post_list)
     return render(request, 'group.html', {
         'group': group,
         'page': page,
+        **feed_cache.feed_cache(
+            request, 'group', feed_cache.group_scope(group.id)
+        ),
     })
 
 
+# Каждый запрос поиска — своя страница: в кэше страниц они вытесняли бы
+# ленты
+@conditional(index_scopes, cache_pages=False)
+def search(request):
+    query = request.GET.get('q', '').strip()
+    try:
+        page = search_posts(query, request.GET.get('cursor'))
+    except InvalidSearchCursor:
+        page = search_posts(query)
+    return render(request, 'search.html', {'query': query, 'page': page})
+
+
 @login_required
 def new_post(request):
     form = PostForm(
@@ -37,16 +65,18 @@ def new_post(request):
         return render(request, 'new.html', {'form': form})
     post = form.save(commit=False)
     post.author = request.user
-    post.save()
+    with transaction.atomic():
+        post.save()
     return redirect('index')
 
 
+@conditional(profile_scopes)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    post_list = author.posts.all()
-    paginator = Paginator(post_list, settings.POSTS_PER_PAGE)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    author = get_object_or_404(
+        User.objects.select_related('counters'), username=username
+    )
+    post_list = author.posts.feed()
+    page = paginate(request, post_list)
     following = (
         request.user.is_authenticated and request.user != author
         and Follow.objects.filter(
@@ -57,16 +87,34 @@ def profile(request, username):
         'page': page,
         'author': author,
         'following': following,
+        **feed_cache.feed_cache(
+            request, 'profile', feed_cache.author_scope(author.id)
+        ),
     })
 
 
+@conditional(profile_scopes)
 def post_view(request, username, post_id):
     form = CommentForm()
-    post = get_object_or_404(Post, author__username=username, id=post_id)
-    comments = post.comments.all()
+    post = get_object_or_404(
+        Post.objects.feed().select_related('author__counters'),
+        author__username=username,
+        id=post_id,
+    )
+    # Сначала не больше COMMENTS_PER_PAGE комментариев; следующие
+    # подгружаются из JSON API (или страницей ?comments=<cursor>)
+    comment_list = post.comments.select_related('author')
+    comments = CommentPaginator(
+        comment_list, settings.COMMENTS_PER_PAGE
+    ).get_page(request.GET.get('comments'))
     return render(request, 'post.html', {
         'post': post,
         'author': post.author,
+        # Те же комментарии, что на странице, а не все комментарии записи;
+        # запрос ленивый и выполняется, только если его читают
+        'comment_list': comment_list.filter(
+            pk__in=[comment.pk for comment in comments]
+        ).order_by('created', 'id'),
         'comments': comments,
         'form': form,
     })
@@ -86,7 +134,15 @@ def post_edit(request, username, post_id):
             'form': form,
             'post': post,
         })
-    form.save()
+    post = form.save(commit=False)
+    # Полный UPDATE вернул бы comments_count и image_variants, прочитанные
+    # до правки, и затёр бы комментарии и миниатюры, добавленные за это
+    # время. Варианты пишутся, только когда их сбрасывает новое
+    # изображение (signals.remember_previous).
+    fields = list(form.Meta.fields)
+    if 'image' in form.changed_data:
+        fields.append('image_variants')
+    post.save(update_fields=fields)
     return redirect('post', username, post_id)
 
 
@@ -98,18 +154,25 @@ def add_comment(request, username, post_id):
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
-        comment.save()
+        with transaction.atomic():
+            comment.save()
     return redirect('post', username, post_id)
 
 
 @login_required
+@conditional(follow_scopes)
 def follow_index(request):
-    posts = Post.objects.filter(author__following__user=request.user)
-    paginator = Paginator(posts, settings.POSTS_PER_PAGE)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    posts = follow_feed(request.user)
+    page = paginate(
+        request, posts, TimelinePaginator, NumberedTimelinePaginator,
+        user=request.user,
+    )
     return render(request, "follow.html", {
         'page': page,
+        **feed_cache.feed_cache(
+            request, 'follow',
+            feed_cache.INDEX, feed_cache.follow_scope(request.user.id)
+        ),
     })
 
 
@@ -117,22 +180,45 @@ def follow_index(request):
 def profile_follow(request, username):
     if request.user.username != username:
         author = get_object_or_404(User, username=username)
-        Follow.objects.get_or_create(
-            user=request.user, author=author
-        )
+        with transaction.atomic():
+            Follow.objects.get_or_create(
+                user=request.user, author=author
+            )
     return redirect('profile', username)
 
 
 @login_required
 def profile_unfollow(request, username):
-    get_object_or_404(
+    follow = get_object_or_404(
         Follow,
         user=request.user,
         author__username=username,
-    ).delete()
+    )
+    with transaction.atomic():
+        follow.delete()
     return redirect('profile', username=username)
 
 
+def has_metrics_token(request):
+    token = settings.METRICS_TOKEN
+    header = request.META.get('HTTP_AUTHORIZATION', '')
+    return bool(token) and hmac.compare_digest(
+        header.encode(), f'Bearer {token}'.encode()
+    )
+
+
+def metrics(request):
+    """
+    Метрики процесса для Prometheus: для сотрудников и для сборщика
+    с заголовком «Authorization: Bearer <METRICS_TOKEN>».
+    """
+    if not (request.user.is_staff or has_metrics_token(request)):
+        raise Http404
+    return HttpResponse(
+        prometheus(), content_type='text/plain; version=0.0.4'
+    )
+
+
 def page_not_found(request, exception):
     return render(request, 'misc/404.html', {
         'path': request.path
@@ -0,0 +1,15 @@
+from django.contrib import admin
+from django.contrib.auth.admin import UserAdmin
+
+from .forms import AdminChangeForm, AdminCreationForm, User
+
+
+class ReservedUsernameUserAdmin(UserAdmin):
+    add_form = AdminCreationForm
+    form = AdminChangeForm
+
+
+# users стоит в INSTALLED_APPS раньше django.contrib.auth: импорт
+# UserAdmin выше уже зарегистрировал стандартную админку пользователей
+admin.site.unregister(User)
+admin.site.register(User, ReservedUsernameUserAdmin)
@@ -1,10 +1,29 @@
 from django.contrib.auth import get_user_model
-from django.contrib.auth.forms import UserCreationForm
+from django.contrib.auth.forms import UserChangeForm, UserCreationForm
+
+from .validators import validate_username
 
 User = get_user_model()
 
 
-class CreationForm(UserCreationForm):
+class ReservedUsernameMixin:
+    def clean_username(self):
+        username = self.cleaned_data["username"]
+        # Уже существующие имена не мешают править другие поля
+        if "username" in self.changed_data:
+            validate_username(username)
+        return username
+
+
+class CreationForm(ReservedUsernameMixin, UserCreationForm):
     class Meta(UserCreationForm.Meta):
         model = User
         fields = ("first_name", "last_name", "username", "email")
+
+
+class AdminCreationForm(ReservedUsernameMixin, UserCreationForm):
+    pass
+
+
+class AdminChangeForm(ReservedUsernameMixin, UserChangeForm):
+    pass
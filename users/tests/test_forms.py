@@ -0,0 +1,73 @@
+from django.test import Client, TestCase
+from django.urls import get_resolver, reverse
+
+from api import urls as api_urls
+from posts import urls as posts_urls
+from posts.models import User
+from users.validators import RESERVED_USERNAMES
+
+RESERVED_ERROR = 'Это имя занято адресом сайта, выберите другое.'
+PASSWORD = 'Pa55-word-long'
+
+
+class ReservedUsernameTests(TestCase):
+    def test_signup_rejects_reserved_usernames(self):
+        """Имена, совпадающие с адресами сайта, не регистрируются"""
+        for username in ['search', 'Metrics', 'api']:
+            with self.subTest(username=username):
+                response = Client().post(reverse('signup'), {
+                    'username': username,
+                    'password1': PASSWORD,
+                    'password2': PASSWORD,
+                })
+                self.assertFormError(
+                    response, 'form', 'username', RESERVED_ERROR
+                )
+                self.assertFalse(User.objects.filter(
+                    username=username
+                ).exists())
+
+    def test_admin_rejects_reserved_usernames(self):
+        """Админка не создаёт и не переименовывает в занятые имена"""
+        admin = User.objects.create_superuser('root', 'root@example.com',
+                                              PASSWORD)
+        client = Client()
+        client.force_login(admin)
+        response = client.post(reverse('admin:auth_user_add'), {
+            'username': 'metrics',
+            'password1': PASSWORD,
+            'password2': PASSWORD,
+        })
+        self.assertFormError(
+            response, 'adminform', 'username', RESERVED_ERROR
+        )
+        self.assertFalse(User.objects.filter(username='metrics').exists())
+        response = client.get(
+            reverse('admin:auth_user_change', args=[admin.id])
+        )
+        form = response.context['adminform'].form
+        data = {**form.initial, 'username': 'search'}
+        data = {
+            key: value for key, value in data.items()
+            if value is not None and key not in ('groups', 'user_permissions')
+        }
+        response = client.post(
+            reverse('admin:auth_user_change', args=[admin.id]), data
+        )
+        self.assertFormError(
+            response, 'adminform', 'username', RESERVED_ERROR
+        )
+
+    def test_reserved_usernames_cover_routes(self):
+        """Каждый постоянный адрес перед /<username>/ зарезервирован"""
+        patterns = [
+            *get_resolver().url_patterns,
+            *posts_urls.urlpatterns,
+            *api_urls.urlpatterns,
+        ]
+        for pattern in patterns:
+            segment = str(pattern.pattern).split('/')[0].lstrip('^')
+            if not segment or '<' in segment or '(' in segment:
+                continue
+            with self.subTest(segment=segment):
+                self.assertIn(segment, RESERVED_USERNAMES)
@@ -0,0 +1,21 @@
+from django.core.exceptions import ValidationError
+
+# Первые сегменты адресов сайта и API (posts/urls.py, api/urls.py,
+# yatube/urls.py): профиль пользователя с таким именем перекрыли бы
+# страницы /<name>/ и /api/<name>/.
+RESERVED_USERNAMES = frozenset({
+    "__debug__", "about", "adm", "api", "auth", "follow", "group", "media",
+    "metrics", "new", "posts", "search", "static",
+})
+
+
+def is_reserved(username):
+    return username.lower() in RESERVED_USERNAMES
+
+
+def validate_username(username):
+    if is_reserved(username):
+        raise ValidationError(
+            "Это имя занято адресом сайта, выберите другое.",
+            code="reserved",
+        )
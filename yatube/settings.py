@@ -11,11 +11,15 @@ https://docs.djangoproject.com/en/2.2/ref/settings/
 """
 
 import os
+import sys
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 print(BASE_DIR)
 
+# Запуск тестов: manage.py test или pytest
+TESTING = sys.argv[1:2] == ['test'] or 'pytest' in sys.modules
+
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/2.2/howto/deployment/checklist/
 
@@ -39,6 +43,7 @@ INSTALLED_APPS = [
     'about.apps.AboutConfig',
     'users.apps.UsersConfig',
     'posts.apps.PostsConfig',
+    'api.apps.ApiConfig',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -50,11 +55,14 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'posts.metrics.QueryMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'posts.middleware.AnonymousPageCacheMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'posts.replicas.ReplicaMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'debug_toolbar.middleware.DebugToolbarMiddleware',
@@ -65,7 +73,8 @@ ROOT_URLCONF = 'yatube.urls'
 TEMPLATES_DIR = os.path.join(BASE_DIR, "templates")
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates с замером времени отрисовки (posts/metrics.py)
+        'BACKEND': 'posts.metrics.InstrumentedDjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -86,11 +95,61 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
+# Движки posts.backends — обёртки стандартных (sqlite3, postgresql) с
+# проверкой постоянных соединений и пулом (posts/db.py). Соединение
+# живёт CONN_MAX_AGE секунд и перед первым запросом страницы
+# проверяется, если CONN_HEALTH_CHECKS. POOL_SIZE > 0 включает пул
+# процесса для многопоточного сервера: тогда CONN_MAX_AGE = 0, и
+# соединение после каждого запроса возвращается в пул, где живёт до
+# POOL_MAX_AGE секунд.
+DATABASE_POOL_SIZE = int(os.environ.get('YATUBE_DB_POOL_SIZE', 0))
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'posts.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'CONN_MAX_AGE': 0 if DATABASE_POOL_SIZE else int(
+            os.environ.get('YATUBE_CONN_MAX_AGE', 60)
+        ),
+        'CONN_HEALTH_CHECKS': True,
+        'POOL_SIZE': DATABASE_POOL_SIZE,
+        'POOL_MAX_AGE': 600,
+    }
+}
+
+# Реплики только для чтения (posts/replicas.py): ленты и страницы
+# записей из REPLICA_VIEWS читают модели REPLICA_APPS с реплики, запись
+# и остальные страницы идут в основную базу. Реплика может отставать
+# на REPLICA_LAG_SECONDS: столько после записи её автор и страницы,
+# которые она изменила, читают основную базу. YATUBE_DB_REPLICA — файл
+# реплики SQLite; копию основной базы в него кладёт sync_replica.
+REPLICA_DATABASES = []
+if os.environ.get('YATUBE_DB_REPLICA'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME': os.environ['YATUBE_DB_REPLICA'],
+        'TEST': {'MIRROR': 'default'},
     }
+    REPLICA_DATABASES.append('replica')
+DATABASE_ROUTERS = ['posts.replicas.ReplicaRouter']
+REPLICA_APPS = ['posts', 'auth']
+REPLICA_VIEWS = ['index', 'group_posts', 'profile', 'post', 'follow_index']
+REPLICA_LAG_SECONDS = int(os.environ.get('YATUBE_DB_REPLICA_LAG', 10))
+REPLICA_PIN_COOKIE = 'primary_db'
+
+# Прагмы каждого нового соединения с SQLite (posts/db.py); пустой словарь
+# оставляет настройки SQLite по умолчанию. WAL: читатели не ждут
+# писателя, а писатели ждут друг друга до busy_timeout мс вместо
+# «database is locked». synchronous = NORMAL в режиме WAL не портит базу
+# при сбое питания, но может потерять последние транзакции. cache_size
+# в КиБ (со знаком минус) — на каждое соединение; mmap_size — байты
+# файла базы, которые читаются через отображение в память.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'cache_size': -20000,
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'MEMORY',
 }
 
 
@@ -147,15 +206,134 @@ EMAIL_BACKEND = "django.core.mail.backends.filebased.EmailBackend"
 # указываем директорию, в которую будут складываться файлы писем
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, "sent_emails")
 
+# Кэш общий для всех процессов сервера: иначе сброс версий лент
+# (posts/feed_cache.py) доходил бы только до одного процесса. Движок
+# выбирается переменной окружения YATUBE_CACHE, адрес (таблица, каталог,
+# сервер) — YATUBE_CACHE_LOCATION. Для 'db' нужна команда
+# createcachetable, для 'redis' — пакет django-redis, для 'memcached' —
+# python-memcached; 'locmem' годится только для одного процесса.
+CACHE_BACKENDS = {
+    'db': ('django.core.cache.backends.db.DatabaseCache', 'yatube_cache'),
+    'file': (
+        'django.core.cache.backends.filebased.FileBasedCache',
+        os.path.join(BASE_DIR, 'cache'),
+    ),
+    'redis': ('django_redis.cache.RedisCache', 'redis://127.0.0.1:6379/1'),
+    'memcached': (
+        'django.core.cache.backends.memcached.MemcachedCache',
+        '127.0.0.1:11211',
+    ),
+    'locmem': ('django.core.cache.backends.locmem.LocMemCache', 'yatube'),
+}
+CACHE_BACKEND = os.environ.get('YATUBE_CACHE', 'db')
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': CACHE_BACKENDS[CACHE_BACKEND][0],
+        'LOCATION': os.environ.get(
+            'YATUBE_CACHE_LOCATION', CACHE_BACKENDS[CACHE_BACKEND][1]
+        ),
     }
 }
 
 POSTS_PER_PAGE = 10
+# Комментариев на странице записи сразу и за одно нажатие «Показать ещё»
+COMMENTS_PER_PAGE = 50
+# Движок поиска записей (posts/search.py): SQLiteFTSBackend — индекс
+# FTS5, LikeBackend — LIKE по таблице для баз без FTS5.
+SEARCH_BACKEND = 'posts.search.SQLiteFTSBackend'
+# Поиск запоминает id не более SEARCH_RESULTS_LIMIT лучших результатов
+# на SEARCH_SNAPSHOT_TIMEOUT секунд, и следующие страницы листают этот
+# снимок (posts/search.py).
+SEARCH_RESULTS_LIMIT = 1000
+SEARCH_SNAPSHOT_TIMEOUT = 600
+# В админке таблица с большим числом строк (по оценке) не считается
+# через COUNT(*) на каждой странице списка (posts/paginators.py).
+ADMIN_EXACT_COUNT_LIMIT = 100000
+# Сколько запросов к базе может сделать одна страница: QUERY_BUDGETS по
+# имени маршрута, иначе QUERY_BUDGET. Запросы самого кэша в базе
+# (YATUBE_CACHE=db) в бюджет не входят и считаются отдельно. Бюджеты —
+# замеренное тестами число запросов (в скобках) с запасом в 2-3 запроса.
+# Превышения пишутся в журнал yatube.queries; итоги по маршрутам — на
+# /metrics/ (posts/metrics.py).
+QUERY_BUDGET = 20
+QUERY_BUDGETS = {
+    'index': 8,  # (5)
+    'group_posts': 9,  # (7)
+    'profile': 10,  # (8)
+    'post': 8,  # (6)
+    'follow_index': 8,  # (6)
+    'search': 4,  # (2)
+    'api:posts': 4,  # (1)
+    'api:comments': 5,  # (3)
+    'api:group_posts': 5,  # (3)
+    'api:profile': 5,  # (3)
+    'api:follow_index': 7,  # (5)
+}
+# /metrics/ открыт сотрудникам и запросам с заголовком
+# «Authorization: Bearer <METRICS_TOKEN>»; без токена — только сотрудникам.
+METRICS_TOKEN = os.environ.get('YATUBE_METRICS_TOKEN', '')
+# Наибольший размер страницы JSON API (?limit=)
+API_MAX_LIMIT = 100
+# Потоки, которые заранее создают миниатюры изображений записей.
+# При THUMBNAIL_ASYNC = False миниатюра создаётся сразу после фиксации
+# транзакции в том же потоке — так в тестах: фоновые потоки мешали бы
+# тестовой базе в памяти.
+THUMBNAIL_ASYNC = not TESTING
+THUMBNAIL_WORKERS = 2
+# Изображение ленты без вариантов снова ставится в очередь не раньше чем
+# через столько секунд (posts/thumbnails.py).
+THUMBNAIL_RETRY_TIMEOUT = 300
+# Ширины вариантов миниатюры в ленте (srcset), пиксели
+FEED_IMAGE_WIDTHS = (320, 640, 960)
+# Время жизни фрагментов лент в кэше, с. Новые записи и комментарии
+# сбрасывают фрагменты сразу через версии ключей (posts/feed_cache.py).
+FEED_CACHE_TIMEOUT = 300
+# Время жизни целых страниц для анонимных посетителей, с; 0 отключает
+# кэш страниц (posts/middleware.py).
+PAGE_CACHE_TIMEOUT = 300
+# 'numbered' — страницы по номеру (?page=N), 'cursor' — навигация по ключу
+# (pub_date, id) без COUNT(*) и OFFSET. Параметр ?cursor= работает всегда.
+FEED_PAGINATION = 'numbered'
+# Лента подписок: запись рассылается подписчикам автора, пока их не больше
+# TIMELINE_FANOUT_LIMIT, иначе записи автора читаются при показе ленты.
+TIMELINE_FANOUT_LIMIT = 1000
+# Сколько последних записей автора добавить в ленту при подписке
+TIMELINE_BACKFILL = 1000
+# Сколько соседних страниц показывать в нумерованной навигации
+PAGINATOR_NEARBY_PAGES = 2
 UPLOAD_FOLDER = 'posts/'
+# Приём изображений записей (posts/images.py): файлы больше
+# IMAGE_MAX_UPLOAD_SIZE байт отклоняются, остальные уменьшаются до
+# IMAGE_MAX_DIMENSION пикселей по большей стороне и перекодируются
+# в IMAGE_FORMAT ('JPEG' или 'WEBP'); JPEG с прозрачностью — в PNG.
+IMAGE_MAX_UPLOAD_SIZE = 10 * 1024 * 1024
+# Приём файла больше IMAGE_MAX_UPLOAD_SIZE прерывается на первом лишнем
+# куске, до записи на диск
+FILE_UPLOAD_HANDLERS = [
+    'posts.images.SizeLimitUploadHandler',
+    'django.core.files.uploadhandler.MemoryFileUploadHandler',
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+IMAGE_MAX_DIMENSION = 1920
+IMAGE_FORMAT = 'JPEG'
+IMAGE_QUALITY = 85
 
 INTERNAL_IPS = [
     "127.0.0.1",
 ]
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        "yatube": {"handlers": ["console"], "level": "WARNING"},
+    },
+}
+if TESTING:
+    # Превышения бюджета проверяет assert_query_budget, а не вывод тестов
+    LOGGING["loggers"]["yatube.queries"] = {
+        "handlers": [], "level": "ERROR", "propagate": False,
+    }
@@ -25,6 +25,7 @@ handler500 = "posts.views.server_error"  # noqa
 
 urlpatterns = [
     path("about/", include("about.urls", namespace="about")),
+    path("api/", include("api.urls", namespace="api")),
     path("auth/", include("users.urls")),
     path("auth/", include("django.contrib.auth.urls")),
     path("adm/", admin.site.urls),